@@ -0,0 +1,325 @@
+# autoajuste.py
+"""
+Calibración de la resolución de la cuadrícula y de la espera por punto.
+
+Los escaneos de tooltips (GridSearch, scrape_tooltips_mapa y
+extraer_areas_habilitadas) dependen de dos parámetros que se oponen:
+cuántos puntos visitar y cuánto esperar en cada uno. La calibración se hace
+una vez por nivel del mapa y consta de tres pasos:
+
+1. Escaneos geométricos: para cada paso candidato (píxeles entre puntos) se
+   comprueba con `document.elementFromPoint`, en un solo script y sin
+   esperar tooltips, qué regiones caen bajo algún punto de la cuadrícula. Se
+   elige el paso más grande que alcanza todas las regiones que alcanza el
+   escaneo de referencia, mucho más fino. De ese escaneo sale también el
+   tamaño de la región más pequeña.
+2. Latencia del tooltip: se mide en la página, con un script asíncrono,
+   cuánto tarda en aparecer el tooltip de una región tras el hover.
+3. Espera: se prueban esperas candidatas (percentiles de la latencia), de
+   menor a mayor, con el mismo hover y la misma lectura que el escaneo real.
+   Se elige la menor con la que todas las regiones de muestra se leen bien.
+
+El resultado se guarda por nivel en `.siea/autoajuste.json`. El paso se
+guarda en píxeles para que cada método calcule su propia resolución según
+el tamaño de la zona que recorre (ver `completar_parametros`).
+"""
+
+import math
+import time
+
+from estado import ruta_estado, cargar_json, guardar_json
+from trazas import span
+
+# Pasos candidatos (píxeles entre puntos), del más barato al más caro
+PASOS = (80, 64, 48, 40, 32, 24, 20, 16, 12, 10, 8, 6)
+PASO_REFERENCIA = 3
+
+# Esperas: margen sobre la latencia medida y límites (segundos)
+MARGEN_ESPERA = 1.2
+ESPERA_MINIMA = 0.02
+ESPERA_MAXIMA = 2.0
+
+# Asocia cada elemento SVG del mapa con el nombre de su región
+_JS_REGIONES_MAPA = """
+    const nombres = new Map();
+    if (window.Highcharts) {
+        for (const chart of Highcharts.charts) {
+            if (!chart || !chart.series) continue;
+            for (const serie of chart.series) {
+                if (serie.type !== 'map') continue;
+                for (const p of (serie.points || [])) {
+                    const el = p.graphic && p.graphic.element;
+                    if (el && p.name) nombres.set(el, p.name);
+                }
+            }
+        }
+    }
+"""
+
+# Regiones del mapa con su rectángulo en pantalla
+_JS_REGIONES = _JS_REGIONES_MAPA + """
+    return Array.from(nombres, ([el, nombre]) => {
+        const r = el.getBoundingClientRect();
+        return {nombre: nombre, x: r.left, y: r.top, ancho: r.width, alto: r.height};
+    });
+"""
+
+# Regiones bajo los puntos de una cuadrícula (misma disposición que
+# scrape_tooltips_mapa): nombre → [puntos, x, y del primer punto]
+_JS_COBERTURA = _JS_REGIONES_MAPA + """
+    const [x0, y0, x1, y1, filas, columnas] = arguments;
+    const ancho = (x1 - x0) / columnas, alto = (y1 - y0) / filas;
+    const vistos = {};
+    for (let f = 0; f <= filas; f++) {
+        for (let c = 0; c <= columnas; c++) {
+            const x = Math.trunc(x0 + c * ancho), y = Math.trunc(y0 + f * alto);
+            const nombre = nombres.get(document.elementFromPoint(x, y));
+            if (!nombre) continue;
+            if (vistos[nombre]) vistos[nombre][0]++;
+            else vistos[nombre] = [1, x, y];
+        }
+    }
+    return vistos;
+"""
+
+# Milisegundos desde el hover hasta que el tooltip muestra la región (-1 si no aparece)
+_JS_LATENCIA = """
+    const [x, y, nombre, maximo] = arguments;
+    const listo = arguments[arguments.length - 1];
+    const elemento = document.elementFromPoint(x, y);
+    if (!elemento) { listo(-1); return; }
+    const inicio = performance.now();
+    ['mousemove', 'mouseover', 'mouseenter'].forEach(tipo => elemento.dispatchEvent(
+        new MouseEvent(tipo, {view: window, bubbles: true, cancelable: true, clientX: x, clientY: y})));
+    function revisar() {
+        const tooltip = document.querySelector('.highcharts-tooltip');
+        const texto = tooltip ? tooltip.textContent.trim() : '';
+        const transcurrido = performance.now() - inicio;
+        if (texto.startsWith(nombre)) listo(transcurrido);
+        else if (transcurrido > maximo) listo(-1);
+        else setTimeout(revisar, 5);
+    }
+    revisar();
+"""
+
+
+def resolucion(ancho, alto, paso):
+    """
+    Número de divisiones de una zona para que los puntos no disten más de `paso`.
+
+    Args:
+        ancho, alto: Tamaño de la zona en píxeles
+        paso: Distancia máxima entre puntos en píxeles
+
+    Returns:
+        tuple: (filas, columnas)
+    """
+    return max(1, math.ceil(alto / paso)), max(1, math.ceil(ancho / paso))
+
+
+def cobertura_geometrica(driver, zona, paso):
+    """
+    Regiones que caen bajo algún punto de la cuadrícula de un paso dado.
+
+    Args:
+        driver: WebDriver con el mapa visible
+        zona (dict): x_min, y_min, x_max, y_max
+        paso (float): Píxeles entre puntos
+
+    Returns:
+        dict: nombre → (puntos que caen en la región, x, y de uno de ellos)
+    """
+    filas, columnas = resolucion(zona['x_max'] - zona['x_min'], zona['y_max'] - zona['y_min'], paso)
+    vistos = driver.execute_script(_JS_COBERTURA, zona['x_min'], zona['y_min'],
+                                   zona['x_max'], zona['y_max'], filas, columnas)
+    return {nombre: tuple(valores) for nombre, valores in (vistos or {}).items()}
+
+
+def medir_latencias(driver, muestras, maximo=3.0):
+    """
+    Mide en la página cuánto tarda el tooltip en mostrar cada región.
+
+    Args:
+        driver: WebDriver con el mapa visible
+        muestras (list): (nombre, x, y) de las regiones a medir
+        maximo (float): Segundos tras los que se da el tooltip por no aparecido
+
+    Returns:
+        list: Latencias en segundos de los tooltips que aparecieron
+    """
+    latencias = []
+    for nombre, x, y in muestras:
+        milisegundos = driver.execute_async_script(_JS_LATENCIA, x, y, nombre, maximo * 1000)
+        if milisegundos is not None and milisegundos >= 0:
+            latencias.append(milisegundos / 1000)
+    return latencias
+
+
+def esperas_candidatas(latencias, margen=MARGEN_ESPERA):
+    """
+    Esperas a probar, de menor a mayor, a partir de las latencias medidas.
+
+    Args:
+        latencias (list): Latencias en segundos
+        margen (float): Factor de seguridad sobre cada percentil
+
+    Returns:
+        list: Esperas en segundos
+    """
+    import numpy as np
+
+    if latencias:
+        percentiles = np.percentile(latencias, [50, 90, 95, 100])
+        candidatas = {round(min(ESPERA_MAXIMA, max(ESPERA_MINIMA, float(v) * margen)), 3) for v in percentiles}
+    else:
+        candidatas = {0.25}
+    # Si ninguna basta, seguir duplicando hasta la espera máxima
+    espera = max(candidatas)
+    while espera < ESPERA_MAXIMA:
+        espera = min(ESPERA_MAXIMA, espera * 2)
+        candidatas.add(round(espera, 3))
+    return sorted(candidatas)
+
+
+def validar_espera(driver, muestras, espera):
+    """
+    Recorre las regiones de muestra como lo hace el escaneo real (hover,
+    espera, lectura del tooltip) y cuenta cuántas se leen bien.
+
+    Args:
+        driver: WebDriver con el mapa visible
+        muestras (list): (nombre, x, y) de las regiones
+        espera (float): Segundos de espera tras el hover
+
+    Returns:
+        tuple: (aciertos, segundos medios por punto sin contar la espera)
+    """
+    from tooltip_scraper import simular_hover, leer_tooltip
+    from tiempos import dormir
+
+    aciertos = 0
+    inicio = time.perf_counter()
+    for nombre, x, y in muestras:
+        simular_hover(driver, x, y)
+        dormir(espera)
+        texto = leer_tooltip(driver)
+        if texto and texto.splitlines()[0].strip() == nombre:
+            aciertos += 1
+    sobrecosto = (time.perf_counter() - inicio) / max(1, len(muestras)) - espera
+    return aciertos, max(0.0, sobrecosto)
+
+
+def calibrar(driver, zona=None, nivel='departamento', muestras=20, pasos=PASOS, guardar=True):
+    """
+    Calibra el paso de la cuadrícula y la espera por punto para el mapa visible.
+
+    Args:
+        driver: WebDriver con el mapa del nivel visible
+        zona (dict, opcional): x_min, y_min, x_max, y_max de la zona a escanear
+                               (si es None, se detecta, ver zonas.py)
+        nivel (str): Nivel del mapa ('departamento', 'provincia', 'distrito')
+        muestras (int): Regiones con las que medir la latencia y validar la espera
+        pasos (tuple): Pasos candidatos en píxeles
+        guardar (bool): Guardar el resultado en `.siea/autoajuste.json`
+
+    Returns:
+        dict: Parámetros calibrados (paso_px, espera, filas, columnas, costo estimado, ...)
+    """
+    from zonas import zona_del_mapa
+
+    zona = zona_del_mapa(driver, zona)
+    with span('escanear', metodo='calibracion', nivel=nivel) as atributos:
+        regiones = driver.execute_script(_JS_REGIONES) or []
+        if not regiones:
+            raise ValueError("No se encontraron regiones de mapa en la página")
+
+        # Referencia: lo que alcanza una cuadrícula muy fina
+        referencia = cobertura_geometrica(driver, zona, PASO_REFERENCIA)
+        alcanzables = set(referencia)
+        fuera = sorted({r['nombre'] for r in regiones} - alcanzables)
+        region_minima = math.sqrt(min(v[0] for v in referencia.values())) * PASO_REFERENCIA if referencia else 0
+        print(f"{len(regiones)} regiones en el mapa, {len(alcanzables)} dentro de la zona; "
+              f"región más pequeña ≈ {region_minima:.0f} px")
+
+        # Resolución: el paso más grande que alcanza todas las regiones
+        paso, cubiertas = PASO_REFERENCIA, referencia
+        for candidato in sorted(pasos, reverse=True):
+            vistos = cobertura_geometrica(driver, zona, candidato)
+            print(f"  paso {candidato:>3} px: {len(vistos)}/{len(alcanzables)} regiones")
+            if alcanzables <= set(vistos):
+                paso, cubiertas = candidato, vistos
+                break
+
+        # Un punto por región (las de menos puntos primero: son las más difíciles)
+        puntos = sorted(cubiertas.items(), key=lambda item: item[1][0])[:muestras]
+        puntos = [(nombre, x, y) for nombre, (_, x, y) in puntos]
+
+        # Espera: la menor candidata con la que se leen todas las muestras
+        latencias = medir_latencias(driver, puntos)
+        espera, sobrecosto = ESPERA_MAXIMA, 0.0
+        for candidata in esperas_candidatas(latencias):
+            aciertos, sobrecosto = validar_espera(driver, puntos, candidata)
+            print(f"  espera {candidata:.3f} s: {aciertos}/{len(puntos)} tooltips correctos")
+            if aciertos == len(puntos):
+                espera = candidata
+                break
+
+        filas, columnas = resolucion(zona['x_max'] - zona['x_min'], zona['y_max'] - zona['y_min'], paso)
+        total_puntos = (filas + 1) * (columnas + 1)
+        ordenadas = sorted(latencias)
+        ajuste = {
+            'paso_px': paso,
+            'espera': espera,
+            'filas': filas,
+            'columnas': columnas,
+            'costo_estimado_s': round(total_puntos * (espera + sobrecosto), 1),
+            'latencia_p50': round(ordenadas[len(ordenadas) // 2], 4) if ordenadas else None,
+            'latencia_max': round(ordenadas[-1], 4) if ordenadas else None,
+            'region_minima_px': round(region_minima, 1),
+            'regiones': len(alcanzables),
+            'fuera_de_zona': fuera,
+            'zona': zona,
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        atributos.update(paso_px=paso, espera=espera, puntos=total_puntos)
+
+        if guardar:
+            ajustes = cargar_json(ruta_estado('autoajuste.json'), {})
+            ajustes[nivel] = ajuste
+            guardar_json(ruta_estado('autoajuste.json'), ajustes)
+        return ajuste
+
+
+def ajuste_calibrado(nivel='departamento'):
+    """
+    Returns:
+        dict: Parámetros calibrados del nivel, o None si no se calibró
+    """
+    return cargar_json(ruta_estado('autoajuste.json'), {}).get(nivel or 'departamento')
+
+
+def completar_parametros(nivel, ancho, alto, filas=None, columnas=None, espera=None,
+                         por_defecto=(20, 20, 1.0)):
+    """
+    Completa los parámetros de escaneo que no se indicaron con los calibrados
+    para el nivel o, si no hay calibración, con los valores por defecto.
+
+    Args:
+        nivel (str): Nivel del mapa (None = 'departamento')
+        ancho, alto: Tamaño en píxeles de la zona que recorre el método
+        filas, columnas, espera: Valores indicados por el usuario (None = sin indicar)
+        por_defecto (tuple): (filas, columnas, espera) del método sin calibración
+
+    Returns:
+        tuple: (filas, columnas, espera)
+    """
+    if None not in (filas, columnas, espera):
+        return filas, columnas, espera
+
+    ajuste = ajuste_calibrado(nivel)
+    if ajuste:
+        calibrado = resolucion(ancho, alto, ajuste['paso_px']) + (ajuste['espera'],)
+    else:
+        calibrado = por_defecto
+    return tuple(valor if valor is not None else respaldo
+                 for valor, respaldo in zip((filas, columnas, espera), calibrado))
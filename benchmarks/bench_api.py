@@ -0,0 +1,163 @@
+# benchmarks/bench_api.py
+"""
+Mide la latencia de la API de solo lectura (servidor_api.py) sobre CSV
+simulados: levanta el servidor en un puerto libre, lanza peticiones desde
+varios hilos con conexiones persistentes y muestra p50 y p99 por tipo de
+consulta (precalculada, GET condicional con 304 y calculada con `mes`).
+
+Comprueba además que el cuerpo gzip coincide con el JSON sin comprimir,
+que If-None-Match devuelve 304 y que al cambiar un CSV cambia el ETag sin
+que las peticiones esperen a la recarga.
+
+Uso:
+    python benchmarks/bench_api.py [peticiones_por_hilo] [hilos]
+"""
+
+import csv
+import gzip
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from servidor_api import crear_servidor  # noqa: E402
+
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Set', 'Oct', 'Nov', 'Dic']
+CULTIVOS = ['Papa', 'Maiz Amarillo Duro', 'Aceituna', 'Arroz Cascara', 'Cafe']
+DEPARTAMENTOS = ['Amazonas', 'Áncash', 'Apurímac', 'Arequipa', 'Ayacucho', 'Cajamarca', 'Cusco',
+                 'Huancavelica', 'Huánuco', 'Ica', 'Junín', 'La Libertad', 'Lambayeque', 'Lima',
+                 'Loreto', 'Madre De Dios', 'Moquegua', 'Pasco', 'Piura', 'Puno', 'San Martín',
+                 'Tacna', 'Tumbes', 'Ucayali']
+
+
+def escribir_csv(directorio, semilla=0):
+    """Un CSV de calendario y uno de resumen por cultivo con valores al azar."""
+    azar = random.Random(semilla)
+    for cultivo in CULTIVOS:
+        sufijo = cultivo.replace(' ', '_')
+        with open(os.path.join(directorio, f"calendario_{sufijo}.csv"), 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['departamento', 'cultivo', 'mes', 'porcentaje', 'tm'])
+            for departamento in DEPARTAMENTOS:
+                for mes in MESES:
+                    escritor.writerow([departamento, cultivo, mes, round(azar.uniform(0, 20), 1),
+                                       round(azar.uniform(0, 5000), 1)])
+        with open(os.path.join(directorio, f"resumen_{sufijo}.csv"), 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['cultivo', 'provincia', 'superficie_ha', 'rendimiento_tha',
+                               'produccion_tm', 'participacion_porcentaje'])
+            for departamento in DEPARTAMENTOS:
+                escritor.writerow([cultivo, departamento, round(azar.uniform(10, 9000)),
+                                   round(azar.uniform(1, 30), 2), round(azar.uniform(10, 90000)),
+                                   round(azar.uniform(0, 10), 1)])
+
+
+def pedir(conexion, url, cabeceras=None):
+    """GET con una conexión persistente: (estado, cabeceras, cuerpo, segundos)."""
+    inicio = time.perf_counter()
+    conexion.request('GET', url, headers=cabeceras or {})
+    respuesta = conexion.getresponse()
+    cuerpo = respuesta.read()
+    return respuesta.status, dict(respuesta.getheaders()), cuerpo, time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def ejecutar(peticiones=300, hilos=8):
+    """
+    Returns:
+        bool: True si las comprobaciones pasan
+    """
+    directorio = tempfile.mkdtemp(prefix='siea_api_')
+    escribir_csv(directorio)
+    servidor = crear_servidor(directorio, puerto=0, intervalo_revision=0.5)
+    host, puerto = servidor.server_address[:2]
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        conexion = http.client.HTTPConnection(host, puerto)
+        url = '/calendario?cultivo=Papa&region=Ancash'
+        estado, cabeceras, plano, _ = pedir(conexion, url)
+        _, cabeceras_gzip, comprimido, _ = pedir(conexion, url, {'Accept-Encoding': 'gzip'})
+        iguales = (estado == 200 and cabeceras_gzip.get('Content-Encoding') == 'gzip'
+                   and gzip.decompress(comprimido) == plano and len(json.loads(plano)) == len(MESES))
+        por_ubigeo = pedir(conexion, '/calendario?cultivo=papa&region=02')[2] == plano
+        estado_304 = pedir(conexion, url, {'If-None-Match': cabeceras['ETag']})[0]
+        print(f"Respuesta: {len(plano)} bytes, {len(comprimido)} con gzip; "
+              f"región por ubigeo {'ok' if por_ubigeo else 'ERROR'}; "
+              f"GET condicional: {estado_304}")
+
+        consultas = {
+            'precalculada': lambda azar: ('/calendario?' + urlencode(
+                {'cultivo': azar.choice(CULTIVOS), 'region': azar.choice(DEPARTAMENTOS)}), {}),
+            'condicional (304)': lambda azar: (url, {'If-None-Match': cabeceras['ETag']}),
+            'calculada (mes)': lambda azar: ('/calendario?cultivo=Papa&mes=' + azar.choice(MESES), {}),
+        }
+        tiempos = {nombre: [] for nombre in consultas}
+        bloqueo = threading.Lock()
+
+        def cliente(semilla):
+            azar = random.Random(semilla)
+            propia = http.client.HTTPConnection(host, puerto)
+            locales = {nombre: [] for nombre in consultas}
+            for i in range(peticiones):
+                nombre = list(consultas)[i % len(consultas)]
+                ruta, extra = consultas[nombre](azar)
+                locales[nombre].append(pedir(propia, ruta, {'Accept-Encoding': 'gzip', **extra})[3])
+            propia.close()
+            with bloqueo:
+                for nombre, valores in locales.items():
+                    tiempos[nombre].extend(valores)
+
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=cliente, args=(i,)) for i in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        total = time.perf_counter() - inicio
+
+        print(f"\n{peticiones * hilos} peticiones desde {hilos} hilos en {total:.2f} s "
+              f"({peticiones * hilos / total:,.0f} por segundo)")
+        for nombre, valores in tiempos.items():
+            print(f"{nombre:<20} p50 {percentil(valores, 50) * 1000:6.2f} ms   "
+                  f"p99 {percentil(valores, 99) * 1000:6.2f} ms")
+
+        # Cambiar un CSV: el ETag de esa consulta debe cambiar. La recarga es
+        # de fondo, así que mientras tanto se responde con los datos anteriores
+        escribir_csv(directorio, semilla=1)
+        time.sleep(0.6)
+        recargado, lentas, limite = False, 0, time.monotonic() + 10
+        while not recargado and time.monotonic() < limite:
+            _, cabeceras_nuevas, _, segundos = pedir(conexion, url)
+            recargado = cabeceras_nuevas.get('ETag') != cabeceras['ETag']
+            lentas += segundos > 0.05
+            time.sleep(0.01)
+        print(f"\nETag tras modificar los CSV: {'cambió' if recargado else 'ERROR: no cambió'}; "
+              f"{lentas} peticiones de más de 50 ms durante la recarga")
+        conexion.close()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    p99 = max(percentil(valores, 99) for valores in tiempos.values())
+    correcto = iguales and por_ubigeo and estado_304 == 304 and recargado
+    print("API correcta" if correcto else "ERROR: las respuestas de la API no coinciden")
+    print(f"p99 máximo: {p99 * 1000:.2f} ms")
+    return correcto
+
+
+if __name__ == '__main__':
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    sys.exit(0 if ejecutar(*argumentos) else 1)
@@ -0,0 +1,98 @@
+# benchmarks/bench_cola.py
+"""
+Prueba la cola de tareas (cola_tareas.py) con varios procesos locales que
+hacen de nodos: reclaman tareas simuladas, fallan a veces y uno de ellos
+muere a mitad de una tarea para que su arriendo venza y otro la recupere.
+
+Verifica que al terminar cada tarea esté hecha una sola vez o muerta, y
+muestra el rendimiento de la cola.
+
+Uso:
+    python benchmarks/bench_cola.py [procesos] [tareas]
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from cola_tareas import ColaTareas, ejecutar_trabajador  # noqa: E402
+
+# Probabilidad de que una tarea simulada falle
+PROBABILIDAD_FALLO = 0.1
+ARRIENDO = 1.0
+
+
+def trabajador(ruta, numero, morir_en):
+    """
+    Proceso trabajador. Si `morir_en` no es None, termina de golpe (sin
+    liberar el arriendo) al empezar esa tarea.
+    """
+    random.seed(numero)
+    cola = ColaTareas(ruta, espera_base=0.01, espera_tope=0.1)
+    procesadas = [0]
+
+    def procesar(carga):
+        procesadas[0] += 1
+        if morir_en is not None and procesadas[0] == morir_en:
+            os._exit(1)
+        time.sleep(random.uniform(0.005, 0.03))
+        if random.random() < PROBABILIDAD_FALLO:
+            raise ConnectionError("fallo simulado")
+        return {'tarea': carga['n'], 'trabajador': numero}
+
+    # Salida silenciosa: solo interesa el estado final de la cola
+    sys.stdout = open(os.devnull, 'w')
+    ejecutar_trabajador(cola, procesar, trabajador=f"nodo-{numero}", arriendo=ARRIENDO, espera_vacia=0.1)
+
+
+def ejecutar(procesos=4, tareas=200):
+    """
+    Encola tareas, lanza los procesos y comprueba el estado final.
+
+    Returns:
+        bool: True si todas las tareas terminaron como se esperaba
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'cola.sqlite')
+        cola = ColaTareas(ruta)
+        cola.encolar_varias(({'n': i} for i in range(tareas)), max_intentos=3)
+
+        inicio = time.perf_counter()
+        hijos = [
+            multiprocessing.Process(target=trabajador, args=(ruta, i, 3 if i == 0 else None))
+            for i in range(procesos)
+        ]
+        for hijo in hijos:
+            hijo.start()
+        for hijo in hijos:
+            hijo.join()
+        duracion = time.perf_counter() - inicio
+
+        conteo = cola.estadisticas()
+        hechas = cola.tareas('hecha')
+        unicas = {t['resultado']['tarea'] for t in hechas}
+
+        print(f"{procesos} procesos, {tareas} tareas en {duracion:.2f} s "
+              f"({tareas / duracion:.0f} tareas/s)")
+        print(' | '.join(f"{estado}: {n}" for estado, n in conteo.items()))
+        print(f"Códigos de salida: {[hijo.exitcode for hijo in hijos]}")
+
+        correcto = (
+            conteo['pendiente'] == 0 and conteo['en_curso'] == 0
+            and conteo['hecha'] + conteo['muerta'] == tareas
+            and len(unicas) == len(hechas)
+        )
+        print("Cola consistente" if correcto else "Cola inconsistente")
+        return correcto
+
+
+if __name__ == "__main__":
+    procesos = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    tareas = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    sys.exit(0 if ejecutar(procesos, tareas) else 1)
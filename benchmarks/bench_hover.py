@@ -0,0 +1,137 @@
+# benchmarks/bench_hover.py
+"""
+Compara el costo por movimiento del ratón de tres formas de hacer hover
+sobre una página local con una cuadrícula SVG de regiones (como los puntos
+de Highcharts, cada región tiene `element.point`):
+
+- ActionChains.move_to_element_with_offset (acciones W3C, lo que usaban
+  extraer_areas_habilitadas y los extractores)
+- simular_hover (MouseEvent sintético con la biblioteca de la página)
+- entrada_cdp.mover (Input.dispatchMouseEvent por CDP) y mover_lote (todos
+  los movimientos en una sola secuencia de acciones W3C)
+
+Comprueba además que los movimientos por CDP son eventos reales (isTrusted)
+y que mover_lote devuelve la región correcta de cada punto.
+
+Necesita Chrome y chromedriver.
+
+Uso:
+    python benchmarks/bench_hover.py [puntos] [--visible]
+"""
+
+import os
+import random
+import sys
+import time
+from urllib.parse import quote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from entrada_cdp import mover, mover_lote  # noqa: E402
+from navegador import crear_driver  # noqa: E402
+from tooltip_scraper import simular_hover  # noqa: E402
+
+CELDAS = 20
+TAMANO = 30
+ORIGEN = 40
+
+# Cuadrícula de CELDAS × CELDAS regiones de TAMANO px a partir de (ORIGEN, ORIGEN)
+PAGINA = """
+<html><body style="margin:0">
+<svg id="mapa" width="%(lado)d" height="%(lado)d" style="position:absolute; left:%(origen)dpx; top:%(origen)dpx"></svg>
+<script>
+    window.contador = {reales: 0, sinteticos: 0};
+    const svg = document.getElementById('mapa');
+    for (let f = 0; f < %(celdas)d; f++) {
+        for (let c = 0; c < %(celdas)d; c++) {
+            const r = document.createElementNS('http://www.w3.org/2000/svg', 'rect');
+            r.setAttribute('x', c * %(tamano)d); r.setAttribute('y', f * %(tamano)d);
+            r.setAttribute('width', %(tamano)d); r.setAttribute('height', %(tamano)d);
+            r.setAttribute('fill', (f + c) %% 2 ? '#ddd' : '#bbb');
+            r.point = {name: 'R' + f + '_' + c};
+            svg.appendChild(r);
+        }
+    }
+    document.addEventListener('mousemove', e => {
+        if (e.isTrusted) contador.reales++; else contador.sinteticos++;
+    }, true);
+</script>
+</body></html>
+""" % {'lado': CELDAS * TAMANO, 'origen': ORIGEN, 'celdas': CELDAS, 'tamano': TAMANO}
+
+
+def puntos_aleatorios(n, semilla=0):
+    """Centros de celdas al azar: (x, y) en la ventana y la región esperada."""
+    azar = random.Random(semilla)
+    puntos = []
+    for _ in range(n):
+        f, c = azar.randrange(CELDAS), azar.randrange(CELDAS)
+        x = ORIGEN + c * TAMANO + TAMANO // 2
+        y = ORIGEN + f * TAMANO + TAMANO // 2
+        puntos.append((x, y, f"R{f}_{c}"))
+    return puntos
+
+
+def medir(nombre, funcion, puntos):
+    """Ejecuta funcion(x, y) en cada punto y muestra los ms por movimiento."""
+    inicio = time.perf_counter()
+    for x, y, _ in puntos:
+        funcion(x, y)
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<34} {total / len(puntos) * 1000:8.2f} ms/movimiento")
+    return total
+
+
+def ejecutar(n=200, headless=True):
+    """
+    Mide los métodos de hover y comprueba los resultados.
+
+    Returns:
+        bool: True si los eventos CDP son reales y las regiones coinciden
+    """
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.common.by import By
+
+    driver = crear_driver(headless=headless)
+    try:
+        driver.get("data:text/html;charset=utf-8," + quote(PAGINA))
+        svg = driver.find_element(By.ID, 'mapa')
+        centro = ORIGEN + CELDAS * TAMANO / 2
+        puntos = puntos_aleatorios(n)
+        acciones = ActionChains(driver)
+
+        print(f"{n} movimientos sobre una cuadrícula de {CELDAS}x{CELDAS} regiones\n")
+        tiempos = {
+            'acciones': medir("ActionChains (W3C)", lambda x, y: acciones.move_to_element_with_offset(
+                svg, int(x - centro), int(y - centro)).perform(), puntos),
+            'sintetico': medir("simular_hover (MouseEvent sintético)",
+                               lambda x, y: simular_hover(driver, x, y), puntos),
+        }
+
+        driver.execute_script("contador.reales = 0; contador.sinteticos = 0;")
+        tiempos['cdp'] = medir("entrada_cdp.mover (CDP)", lambda x, y: mover(driver, x, y), puntos)
+        contador = driver.execute_script("return contador;")
+
+        inicio = time.perf_counter()
+        regiones = mover_lote(driver, [(x, y) for x, y, _ in puntos])
+        tiempos['lote'] = time.perf_counter() - inicio
+        print(f"{'entrada_cdp.mover_lote (en lote)':<34} {tiempos['lote'] / n * 1000:8.2f} ms/movimiento "
+              f"(con la región de cada punto)")
+    finally:
+        driver.quit()
+
+    aciertos = sum(region == esperada for region, (_, _, esperada) in zip(regiones, puntos))
+    print(f"\nCDP frente a ActionChains: {tiempos['acciones'] / tiempos['cdp']:.1f}x más rápido")
+    print(f"Eventos reales con CDP: {contador['reales']}, sintéticos: {contador['sinteticos']}")
+    print(f"Regiones correctas en mover_lote: {aciertos}/{n}")
+
+    correcto = contador['reales'] > 0 and contador['sinteticos'] == 0 and aciertos == n
+    print("Hover por CDP correcto" if correcto else "ERROR: los resultados del hover por CDP no coinciden")
+    return correcto
+
+
+if __name__ == '__main__':
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    puntos = int(argumentos[0]) if argumentos else 200
+    sys.exit(0 if ejecutar(puntos, headless='--visible' not in sys.argv) else 1)
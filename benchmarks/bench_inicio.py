@@ -0,0 +1,69 @@
+# benchmarks/bench_inicio.py
+"""
+Mide el tiempo de arranque del CLI (siea) hasta el primer comando y verifica
+que no se carguen dependencias pesadas al parsear los argumentos.
+
+Uso:
+    python benchmarks/bench_inicio.py [repeticiones]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse antes de elegir el subcomando
+MODULOS_PESADOS = ['selenium', 'pandas', 'numpy', 'cv2', 'matplotlib', 'PIL']
+
+
+def medir_arranque(repeticiones=10):
+    """
+    Ejecuta `main.py --help` varias veces en un proceso nuevo y mide el tiempo.
+
+    Args:
+        repeticiones (int): Número de ejecuciones
+
+    Returns:
+        list: Tiempos de cada ejecución en milisegundos
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(RAIZ, 'main.py'), '--help'],
+                       cwd=RAIZ, stdout=subprocess.DEVNULL, check=True)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def modulos_cargados():
+    """
+    Importa el CLI y construye el parser en un proceso nuevo.
+
+    Returns:
+        list: Módulos pesados que quedaron cargados (debería estar vacía)
+    """
+    codigo = (
+        "import sys, main; main.crear_parser(); "
+        f"print(','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))"
+    )
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    return [m for m in salida.split(',') if m]
+
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    tiempos = medir_arranque(repeticiones)
+    print(f"Arranque de main.py --help ({repeticiones} ejecuciones):")
+    print(f"  mediana: {statistics.median(tiempos):.1f} ms")
+    print(f"  mínimo:  {min(tiempos):.1f} ms")
+    print(f"  máximo:  {max(tiempos):.1f} ms")
+
+    pesados = modulos_cargados()
+    if pesados:
+        print(f"Módulos pesados cargados al iniciar: {', '.join(pesados)}")
+        sys.exit(1)
+    print("Ningún módulo pesado se carga al iniciar")
@@ -0,0 +1,88 @@
+# benchmarks/bench_nomenclator.py
+"""
+Mide el costo de resolver nombres a ubigeos con el nomenclátor
+(nomenclator.py): búsqueda exacta, aproximada por trigramas y repetida
+(en memoria), frente a recorrer la lista comparando con `nombre in texto`.
+Comprueba además algunos casos que la comparación por subcadena resolvía mal.
+
+Uso:
+    python benchmarks/bench_nomenclator.py [repeticiones]
+"""
+
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from nomenclator import Nomenclator, cargar_lugares, ALIAS  # noqa: E402
+
+# (texto, nivel, ubigeo esperado)
+CASOS = [
+    ("Áncash", None, '02'),
+    ("ANCASH", None, '02'),
+    ("Apurimak", 'departamento', '03'),
+    ("Cuzco", 'departamento', '08'),
+    ("DIST.: Huacho", 'distrito', '150801'),
+    ("Huaura\nProducción: 1 234", 'provincia', '1508'),
+    ("Lima", 'provincia', '1501'),
+]
+
+
+def con_errata(nombre, azar):
+    """Cambia una letra del nombre (errata simulada)."""
+    i = azar.randrange(len(nombre))
+    return nombre[:i] + azar.choice('aeiourstn') + nombre[i + 1:]
+
+
+def medir(nombre, funcion, textos, repeticiones):
+    """Ejecuta funcion(texto) sobre todos los textos y muestra los µs por búsqueda."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto in textos:
+            funcion(texto)
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<36} {total / (len(textos) * repeticiones) * 1e6:9.2f} µs/búsqueda")
+
+
+def ejecutar(repeticiones=3):
+    """
+    Returns:
+        bool: True si todos los casos se resuelven al ubigeo esperado
+    """
+    inicio = time.perf_counter()
+    nomenclator = Nomenclator(cargar_lugares(), ALIAS)
+    print(f"{len(nomenclator)} lugares, índice construido en {(time.perf_counter() - inicio) * 1000:.1f} ms\n")
+
+    azar = random.Random(0)
+    nombres = [lugar.nombre for lugar in nomenclator.lugares.values()]
+    erratas = [con_errata(nombre, azar) for nombre in nombres]
+
+    medir("exacto", nomenclator.buscar, nombres, repeticiones)
+    medir("aproximado (trigramas)", nomenclator.buscar, erratas, repeticiones)
+    for texto in erratas:
+        nomenclator.resolver(texto)
+    medir("resolver repetido (en memoria)", nomenclator.resolver, erratas, repeticiones)
+    medir("subcadena sobre la lista", lambda texto: next(
+        (n for n in nombres if n.lower() in texto.lower()), None), azar.sample(nombres, 200), 1)
+
+    correctos = 0
+    print()
+    for texto, nivel, esperado in CASOS:
+        obtenido = nomenclator.ubigeo(texto, nivel)
+        correctos += obtenido == esperado
+        print(f"{texto!r:<32} → {obtenido} {'ok' if obtenido == esperado else f'(esperado {esperado})'}")
+
+    # La subcadena confunde un distrito con otro que contiene su nombre
+    confunde = not nomenclator.coincide("San Juan", "DIST.: SAN JUAN BAUTISTA", nivel='distrito')
+    print(f"'San Juan' distinto de 'San Juan Bautista': {'ok' if confunde else 'ERROR'}")
+
+    correcto = correctos == len(CASOS) and confunde
+    print("Nomenclátor correcto" if correcto else "ERROR: hay casos mal resueltos")
+    return correcto
+
+
+if __name__ == '__main__':
+    sys.exit(0 if ejecutar(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
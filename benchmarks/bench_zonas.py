@@ -0,0 +1,80 @@
+# benchmarks/bench_zonas.py
+"""
+Mide el filtrado por zonas de zonas.py sobre rectángulos simulados (sin
+navegador): cuánto tarda el cálculo con NumPy para n elementos y varias
+zonas con nombre, y comprueba que coincide con el filtrado elemento a
+elemento de zone_a_utils.
+
+Uso:
+    python benchmarks/bench_zonas.py [elementos] [repeticiones]
+"""
+
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from zonas import indices_en_zonas  # noqa: E402
+
+ZONAS = {
+    'A': {'x_min': 102, 'y_min': 182, 'x_max': 651, 'y_max': 839},
+    'norte': {'x_min': 102, 'y_min': 182, 'x_max': 651, 'y_max': 400},
+    'sur': {'x_min': 102, 'y_min': 600, 'x_max': 651, 'y_max': 839},
+    'leyenda': {'x_min': 700, 'y_min': 182, 'x_max': 900, 'y_max': 400},
+}
+
+
+def rectangulos_simulados(n, semilla=0):
+    """Rectángulos aleatorios en una ventana de 1000 × 900 px."""
+    azar = random.Random(semilla)
+    filas = []
+    for _ in range(n):
+        x, y = azar.uniform(0, 1000), azar.uniform(0, 900)
+        filas.append([x, y, x + azar.uniform(0, 60), y + azar.uniform(0, 60)])
+    return np.array(filas)
+
+
+def por_elemento(rectangulos, zona):
+    """Filtrado uno a uno con el criterio de is_element_in_zone_a (centro en la zona)."""
+    indices = []
+    for i, (x0, y0, x1, y1) in enumerate(rectangulos.tolist()):
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if (x1 > x0 or y1 > y0) and zona['x_min'] <= cx <= zona['x_max'] and zona['y_min'] <= cy <= zona['y_max']:
+            indices.append(i)
+    return indices
+
+
+def ejecutar(n=1000, repeticiones=1000):
+    """
+    Returns:
+        bool: True si el filtrado vectorizado coincide con el de referencia
+    """
+    rectangulos = rectangulos_simulados(n)
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = indices_en_zonas(rectangulos, ZONAS)
+    vectorizado = (time.perf_counter() - inicio) / repeticiones
+
+    inicio = time.perf_counter()
+    referencia = {nombre: por_elemento(rectangulos, zona) for nombre, zona in ZONAS.items()}
+    bucle = time.perf_counter() - inicio
+
+    print(f"{n} elementos × {len(ZONAS)} zonas: NumPy {vectorizado * 1e6:.0f} µs, "
+          f"bucle Python {bucle * 1e6:.0f} µs")
+    print(' | '.join(f"{nombre}: {len(indices)}" for nombre, indices in resultado.items()))
+
+    correcto = all(resultado[nombre].tolist() == referencia[nombre] for nombre in ZONAS)
+    print("Filtrado correcto" if correcto else "El filtrado no coincide con la referencia")
+    return correcto
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    sys.exit(0 if ejecutar(n, repeticiones) else 1)
@@ -0,0 +1,303 @@
+# cambios.py
+"""
+Detección de cambios entre recorridos.
+
+Cada página (cultivo, región) se resume en una huella: un hash de los datos
+de las series de Highcharts (gráfico de calendario y mapa) y de los valores
+del cuadro de resumen, leídos con un solo script. Si la huella coincide con
+la del recorrido anterior, se reutilizan los datos guardados en lugar de
+volver a pasar el cursor por cada barra y bajar a los niveles inferiores.
+
+Para no tener que entrar en una región solo para calcular su huella, la de
+un departamento se toma de su punto en el mapa del nivel superior (nombre,
+valor y opciones del punto, ver huella_region): si no cambió, ni siquiera
+se entra ni se regresa.
+
+Las huellas y los últimos datos extraídos se guardan en `.siea/huellas.json`
+y cada recorrido deja un informe de lo que cambió en `.siea/ejecuciones/`.
+Varios trabajadores de la cola comparten el archivo: cada uno guarda solo
+las páginas que actualizó u olvidó, mezclándolas con lo que hay en disco
+bajo un FileLock.
+"""
+
+import hashlib
+import json
+import time
+
+from estado import ruta_estado, cargar_json, guardar_json
+from normalizacion import normalizar_nombre
+from trazas import contar, span
+
+# Lee los datos que definen la página: series de todos los gráficos y cuadro de resumen
+_JS_DATOS_PAGINA = """
+    const series = [];
+    if (window.Highcharts) {
+        for (const chart of Highcharts.charts) {
+            if (!chart || !chart.series) continue;
+            for (const serie of chart.series) {
+                series.push({
+                    nombre: serie.name || '',
+                    tipo: serie.type || '',
+                    puntos: (serie.points || []).map(p => [
+                        p.name ?? p.category ?? null,
+                        p.y ?? null,
+                        p.value ?? null
+                    ])
+                });
+            }
+        }
+    }
+    const resumen = Array.from(document.querySelectorAll('.titulo_celda_resumen, .valor_celda_resumen'))
+        .map(e => e.textContent.trim());
+    return {series: series, resumen: resumen};
+"""
+
+
+# Lee los puntos de las series de mapa visibles: [nombre, serie, valor, opciones en JSON]
+_JS_PUNTOS_MAPA = """
+    const puntos = [];
+    if (window.Highcharts) {
+        for (const chart of Highcharts.charts) {
+            if (!chart || !chart.series) continue;
+            for (const serie of chart.series) {
+                if (!serie.visible || !/map/.test(serie.type || '')) continue;
+                for (const p of serie.points || []) {
+                    let opciones = null;
+                    try { opciones = JSON.stringify(p.options); } catch (e) {}
+                    puntos.push([p.name ?? null, serie.name || '', p.value ?? null, opciones]);
+                }
+            }
+        }
+    }
+    return puntos;
+"""
+
+
+def calcular_huella(datos):
+    """
+    Calcula la huella de unos datos serializables a JSON.
+
+    Args:
+        datos: Datos de la página (dict, list, ...)
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal de la forma canónica de los datos
+    """
+    canonico = json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+def huella_pagina(driver):
+    """
+    Calcula la huella de la página actual con un solo script.
+
+    Args:
+        driver: WebDriver de Selenium con la página cargada
+
+    Returns:
+        str: Huella de la página, o None si no había datos que leer
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from tiempos import ESPERAS, esperar_hasta, reportar_error
+
+    try:
+        esperar_hasta(driver, EC.presence_of_element_located(
+            (By.CSS_SELECTOR, ".celda_resumen")), ESPERAS['elemento'])
+        datos = driver.execute_script(_JS_DATOS_PAGINA)
+    except Exception as e:
+        reportar_error(e, "calcular la huella de la página")
+        return None
+
+    if not datos or not (datos.get('series') or datos.get('resumen')):
+        return None
+    return calcular_huella(datos)
+
+
+def _olvidar(huellas, cultivo, region):
+    """Quita los datos de una página de un dict de huellas (ver RegistroHuellas.olvidar)."""
+    for nombre_cultivo, regiones in huellas.items():
+        if normalizar_nombre(nombre_cultivo) != normalizar_nombre(cultivo):
+            continue
+        for nombre_region, entrada in regiones.items():
+            if normalizar_nombre(nombre_region) == normalizar_nombre(region) and 'datos' in entrada:
+                del entrada['datos']
+                return True
+    return False
+
+
+def huella_region(driver, nombre_region):
+    """
+    Calcula la huella de una región a partir de su punto en el mapa que se
+    está viendo (p. ej. un departamento en el mapa nacional), sin entrar en ella.
+
+    Args:
+        driver: WebDriver de Selenium con el mapa que contiene la región
+        nombre_region (str): Nombre de la región
+
+    Returns:
+        str: Huella de la región, o None si no está en el mapa
+    """
+    from tiempos import reportar_error
+
+    try:
+        puntos = driver.execute_script(_JS_PUNTOS_MAPA)
+    except Exception as e:
+        reportar_error(e, f"calcular la huella de {nombre_region}")
+        return None
+
+    clave = normalizar_nombre(nombre_region)
+    datos = [punto for punto in puntos or [] if punto[0] and normalizar_nombre(punto[0]) == clave]
+    return calcular_huella(datos) if datos else None
+
+
+class RegistroHuellas:
+    """
+    Huellas y últimos datos extraídos por (cultivo, región), con el informe
+    de cambios del recorrido en curso.
+    """
+
+    def __init__(self, ruta=None):
+        """
+        Args:
+            ruta (str, opcional): Archivo JSON de huellas.
+                                  Si es None, usa `.siea/huellas.json`
+        """
+        self.ruta = ruta or ruta_estado('huellas.json')
+        self.huellas = cargar_json(self.ruta, {})
+        # Cambios pendientes de guardar: (cultivo, región) actualizados y olvidados
+        self._actualizadas = set()
+        self._olvidadas = []
+        self.inicio = time.time()
+        self.informe = {'nuevo': [], 'cambiado': [], 'sin_cambios': [], 'sin_huella': []}
+
+    def anterior(self, cultivo, region):
+        """
+        Returns:
+            dict: Entrada guardada ({'huella', 'fecha', 'datos'}) o None
+        """
+        return self.huellas.get(cultivo, {}).get(region)
+
+    def comparar(self, cultivo, region, huella):
+        """
+        Compara una huella con la del recorrido anterior y lo anota en el informe.
+
+        Args:
+            cultivo (str): Cultivo
+            region (str): Región (p. ej. 'Lima' o 'Lima/Huaura'; '' para el nivel nacional)
+            huella (str): Huella actual (None si no se pudo calcular)
+
+        Returns:
+            str: 'nuevo', 'cambiado', 'sin_cambios' o 'sin_huella'
+        """
+        previa = self.anterior(cultivo, region)
+        if huella is None:
+            estado = 'sin_huella'
+        elif previa is None or 'datos' not in previa:
+            estado = 'nuevo'
+        elif previa['huella'] != huella:
+            estado = 'cambiado'
+        else:
+            estado = 'sin_cambios'
+
+        self.informe[estado].append(f"{cultivo}: {region or 'nacional'}")
+        contar('siea_cache', tipo='huella', resultado='acierto' if estado == 'sin_cambios' else 'fallo')
+        return estado
+
+    def sin_cambios(self, cultivo, region, huella):
+        """
+        Returns:
+            bool: True si la huella coincide con la anterior y hay datos guardados
+        """
+        return self.comparar(cultivo, region, huella) == 'sin_cambios'
+
+    def datos(self, cultivo, region):
+        """
+        Returns:
+            Datos guardados en el recorrido anterior, o None
+        """
+        return (self.anterior(cultivo, region) or {}).get('datos')
+
+    def actualizar(self, cultivo, region, huella, datos=None):
+        """
+        Guarda la huella actual y, si se indican, los datos extraídos.
+
+        Args:
+            cultivo (str): Cultivo
+            region (str): Región
+            huella (str): Huella actual
+            datos (opcional): Datos extraídos (serializables a JSON)
+        """
+        if huella is None:
+            return
+        entrada = self.huellas.setdefault(cultivo, {}).setdefault(region, {})
+        entrada['huella'] = huella
+        entrada['fecha'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        if datos is not None:
+            entrada['datos'] = datos
+        self._actualizadas.add((cultivo, region))
+
+    def olvidar(self, cultivo, region):
+        """
+        Descarta los datos guardados de una página (sin distinguir mayúsculas
+        ni tildes), para que el próximo recorrido la vuelva a extraer aunque
+        su huella no cambie.
+
+        Args:
+            cultivo (str): Cultivo
+            region (str): Región
+
+        Returns:
+            bool: True si había datos guardados
+        """
+        self._olvidadas.append((cultivo, region))
+        return _olvidar(self.huellas, cultivo, region)
+
+    def guardar(self):
+        """
+        Guarda en disco las páginas actualizadas u olvidadas desde el último
+        guardado. Con el archivo bloqueado, se vuelve a leer y se mezclan solo
+        esas entradas, para no pisar lo que guardaron otros procesos (otros
+        trabajadores, o `validar` al olvidar datos); lo leído pasa a ser el
+        estado en memoria.
+        """
+        from filelock import FileLock
+
+        with span('guardar', destino='huellas'), FileLock(f"{self.ruta}.lock"):
+            en_disco = cargar_json(self.ruta, {})
+            for cultivo, region in self._actualizadas:
+                entrada = self.huellas.get(cultivo, {}).get(region)
+                if entrada is not None:
+                    en_disco.setdefault(cultivo, {})[region] = entrada
+            for cultivo, region in self._olvidadas:
+                _olvidar(en_disco, cultivo, region)
+            guardar_json(self.ruta, en_disco)
+            self.huellas = en_disco
+            self._actualizadas.clear()
+            self._olvidadas.clear()
+
+    def guardar_informe(self):
+        """
+        Guarda el informe de cambios del recorrido en `.siea/ejecuciones/`.
+
+        Returns:
+            str: Ruta del informe
+        """
+        informe = {
+            'inicio': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.inicio)),
+            'duracion_s': round(time.time() - self.inicio, 1),
+            **self.informe,
+        }
+        ruta = ruta_estado('ejecuciones', time.strftime('%Y%m%d_%H%M%S', time.localtime(self.inicio)) + '.json')
+        guardar_json(ruta, informe)
+        return ruta
+
+    def imprimir_informe(self):
+        """Muestra un resumen de lo que cambió en el recorrido."""
+        print(f"\nCambios: {len(self.informe['nuevo'])} nuevos, "
+              f"{len(self.informe['cambiado'])} cambiados, "
+              f"{len(self.informe['sin_cambios'])} sin cambios, "
+              f"{len(self.informe['sin_huella'])} sin huella")
+        for estado in ('nuevo', 'cambiado'):
+            for pagina in self.informe[estado]:
+                print(f"- [{estado}] {pagina}")
@@ -0,0 +1,213 @@
+# catalogo_cultivos.py
+"""
+Catálogo de cultivos del portal y cambio de cultivo sin recargar la página.
+
+El buscador de cultivos es un select2 montado sobre un <select>: todas sus
+opciones (o, si el select2 usa datos propios, su lista `data`) se leen con
+un solo script. Para cambiar de cultivo se elige la opción en el <select>,
+se disparan los eventos que escucha select2 y se pulsa "Cosecha": el mapa
+se vuelve a pedir al servidor pero la página no se recarga.
+
+El catálogo leído se guarda en `.siea/cultivos.json` para poder encolar o
+recorrer todos los cultivos sin abrir el navegador.
+"""
+
+import time
+
+from estado import ruta_estado, cargar_json, guardar_json
+from normalizacion import normalizar_nombre
+from trazas import span, progreso
+
+# Localiza el <select> del buscador de cultivos (el primero con select2)
+_JS_SELECT = """
+    const select = Array.from(document.querySelectorAll('select')).find(s =>
+        s.classList.contains('select2-hidden-accessible') || (window.jQuery && jQuery(s).data('select2')));
+"""
+
+# Opciones del select: [{valor, nombre, seleccionado}] (null si no hay buscador)
+_JS_CATALOGO = _JS_SELECT + """
+    if (!select) return null;
+    const opciones = [];
+    for (const opcion of select.options) {
+        const texto = (opcion.text || '').trim();
+        if (opcion.value !== '' && texto) {
+            opciones.push({valor: opcion.value, nombre: texto, seleccionado: opcion.selected});
+        }
+    }
+    // select2 con datos propios en lugar de <option>
+    if (!opciones.length && window.jQuery) {
+        const select2 = jQuery(select).data('select2');
+        const datos = (select2 && select2.options && select2.options.get('data')) || [];
+        for (const d of datos) {
+            if (d.id !== '' && d.text) opciones.push({valor: String(d.id), nombre: String(d.text).trim(), seleccionado: false});
+        }
+    }
+    return opciones;
+"""
+
+# Elige una opción y avisa a select2 y a la página (true si se pudo)
+_JS_ELEGIR = _JS_SELECT + """
+    const [valor, nombre] = arguments;
+    if (!select) return false;
+    let opcion = Array.from(select.options).find(o => o.value === valor);
+    if (!opcion) {
+        opcion = new Option(nombre, valor, false, false);
+        select.appendChild(opcion);
+    }
+    select.value = valor;
+    if (window.jQuery) {
+        jQuery(select).trigger('change');
+        jQuery(select).trigger({type: 'select2:select', params: {data: {id: valor, text: nombre}}});
+    } else {
+        select.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+    return select.value === valor;
+"""
+
+# Texto de la opción seleccionada
+_JS_ACTUAL = _JS_SELECT + """
+    if (!select || select.selectedIndex < 0) return null;
+    return (select.options[select.selectedIndex].text || '').trim() || null;
+"""
+
+
+def leer_catalogo(driver, guardar=True):
+    """
+    Lee todas las opciones del buscador de cultivos con un solo script.
+
+    Args:
+        driver: WebDriver con el portal abierto
+        guardar (bool): Guardar el catálogo en `.siea/cultivos.json`
+
+    Returns:
+        list: Diccionarios {'valor', 'nombre', 'seleccionado'} (vacía si no se encontró el buscador)
+    """
+    opciones = driver.execute_script(_JS_CATALOGO) or []
+    if opciones and guardar:
+        guardar_json(ruta_estado('cultivos.json'), {
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'cultivos': [{'valor': o['valor'], 'nombre': o['nombre']} for o in opciones],
+        })
+    return opciones
+
+
+def cargar_catalogo():
+    """
+    Returns:
+        list: Nombres de los cultivos del último catálogo guardado (vacía si no hay)
+    """
+    return [c['nombre'] for c in cargar_json(ruta_estado('cultivos.json'), {}).get('cultivos', [])]
+
+
+def buscar_cultivo(catalogo, cultivo):
+    """
+    Busca un cultivo en el catálogo sin distinguir mayúsculas ni tildes.
+
+    Args:
+        catalogo (list): Opciones de leer_catalogo
+        cultivo (str): Nombre buscado
+
+    Returns:
+        dict: Opción del catálogo, o None si no está
+    """
+    buscado = normalizar_nombre(cultivo)
+    for opcion in catalogo:
+        if normalizar_nombre(opcion['nombre']) == buscado:
+            return opcion
+    return None
+
+
+def cultivo_actual(driver):
+    """
+    Returns:
+        str: Cultivo seleccionado en el buscador, o None si no se puede leer
+    """
+    try:
+        return driver.execute_script(_JS_ACTUAL)
+    except Exception as e:
+        from tiempos import reportar_error
+
+        reportar_error(e, "leer el cultivo seleccionado")
+        return None
+
+
+def cambiar_cultivo(driver, cultivo, catalogo=None):
+    """
+    Cambia de cultivo sin recargar la página y espera a que cambien los datos
+    del mapa. Si no se encuentra el buscador, escribe el cultivo en el select2
+    como seleccionar_cultivo.
+
+    Args:
+        driver: WebDriver con el portal abierto (en el mapa nacional)
+        cultivo (str): Nombre del cultivo
+        catalogo (list, opcional): Opciones ya leídas con leer_catalogo
+
+    Returns:
+        str: Nombre del cultivo tal como aparece en el portal
+
+    Raises:
+        ValueError: Si el cultivo no está en el catálogo
+    """
+    from cambios import huella_pagina
+    from navegador import mostrar_cosecha, seleccionar_cultivo
+    from tiempos import ESPERAS, dormir, reintentar
+
+    catalogo = catalogo if catalogo is not None else leer_catalogo(driver, guardar=False)
+    if not catalogo:
+        seleccionar_cultivo(driver, cultivo)
+        return cultivo
+
+    opcion = buscar_cultivo(catalogo, cultivo)
+    if opcion is None:
+        raise ValueError(f"El cultivo '{cultivo}' no está en el catálogo del portal")
+
+    with span('navegar', accion='cambiar_cultivo', cultivo=opcion['nombre']) as atributos:
+        anterior = huella_pagina(driver)
+
+        def elegir():
+            if not driver.execute_script(_JS_ELEGIR, opcion['valor'], opcion['nombre']):
+                raise RuntimeError(f"No se pudo elegir '{opcion['nombre']}' en el buscador")
+
+        reintentar(elegir, descripcion=f"elegir el cultivo {opcion['nombre']}")
+        mostrar_cosecha(driver)
+
+        # Esperar a que el mapa muestre los datos del nuevo cultivo
+        limite = time.monotonic() + ESPERAS['carga_mapa']
+        huella = huella_pagina(driver)
+        while anterior is not None and huella == anterior and time.monotonic() < limite:
+            dormir(ESPERAS['estabilizar_mapa'])
+            huella = huella_pagina(driver)
+        atributos['datos_cambiaron'] = huella != anterior
+        if anterior is not None and huella == anterior:
+            print(f"Aviso: los datos del mapa no cambiaron al elegir '{opcion['nombre']}'")
+
+    return opcion['nombre']
+
+
+def recorrer_cultivos(driver, procesar, cultivos=None):
+    """
+    Recorre varios cultivos en la misma sesión del navegador, cambiando de
+    cultivo sin recargar la página.
+
+    Args:
+        driver: WebDriver con el portal abierto
+        procesar (callable): Función procesar(driver, cultivo) para cada cultivo
+        cultivos (list, opcional): Cultivos a recorrer (por defecto, todo el catálogo)
+
+    Yields:
+        tuple: (cultivo tal como aparece en el portal, resultado de procesar o None si falló)
+    """
+    from tiempos import reportar_error
+
+    catalogo = leer_catalogo(driver)
+    nombres = cultivos or [opcion['nombre'] for opcion in catalogo]
+
+    for i, cultivo in enumerate(nombres, 1):
+        try:
+            real = cambiar_cultivo(driver, cultivo, catalogo)
+            resultado = procesar(driver, real)
+        except Exception as e:
+            reportar_error(e, f"procesar el cultivo {cultivo}")
+            real, resultado = cultivo, None
+        progreso('navegar.cultivos', i, len(nombres), cultivo=real)
+        yield real, resultado
@@ -0,0 +1,288 @@
+# cobertura.py
+"""
+Búsqueda guiada por cobertura para los escaneos por cuadrícula.
+
+Cuando se conocen los nombres que deberían aparecer en el mapa (por ejemplo
+los departamentos, o las provincias de un departamento según
+Lista_departamentos.xlsx), las celdas se visitan en orden de rendimiento
+esperado en vez de fila por fila:
+
+- Si hay centroides aproximados (datos/centroides_departamentos.csv), se
+  visita primero la celda más cercana al centroide de alguna región que
+  todavía falta.
+- Si no, se recorre la cuadrícula de grueso a fino, de modo que las
+  primeras celdas quedan repartidas por todo el mapa.
+
+El escaneo termina en cuanto se encuentran todos los nombres esperados y
+se informa cuáles no aparecieron.
+"""
+
+import csv
+import os
+import re
+
+from normalizacion import normalizar_nombre, nombre_de_tooltip
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+RUTA_LISTA_DEPARTAMENTOS = os.path.join(RAIZ, 'Lista_departamentos.xlsx')
+RUTA_CENTROIDES = os.path.join(RAIZ, 'datos', 'centroides_departamentos.csv')
+
+# Extensión aproximada del mapa del Perú (longitud, latitud)
+LIMITES_PERU = {'lon_min': -81.4, 'lon_max': -68.6, 'lat_min': -18.4, 'lat_max': -0.0}
+
+
+def nivel_desde_ruta(ruta):
+    """
+    Deduce el nivel del mapa a partir de las regiones en las que se entró.
+
+    Args:
+        ruta (list): Regiones visitadas, p. ej. [] o ['Lima'] o ['Lima', 'Huaura']
+
+    Returns:
+        str: 'departamento', 'provincia' o 'distrito'
+    """
+    return ['departamento', 'provincia', 'distrito'][min(len(ruta or []), 2)]
+
+
+def cargar_esperados(nivel='departamento', departamento=None, provincia=None,
+                     ruta=RUTA_LISTA_DEPARTAMENTOS):
+    """
+    Carga los nombres esperados en el mapa para un nivel desde la lista de ubigeos.
+
+    Args:
+        nivel (str): 'departamento', 'provincia' o 'distrito'
+        departamento (str, opcional): Departamento padre (niveles provincia y distrito)
+        provincia (str, opcional): Provincia padre (nivel distrito)
+        ruta (str): Ruta de Lista_departamentos.xlsx
+
+    Returns:
+        list: Nombres esperados (sin duplicados, en orden alfabético)
+    """
+    import pandas as pd
+
+    df = pd.read_excel(ruta, dtype=str)
+    columnas = {'departamento': 'NOMBDEP', 'provincia': 'NOMBPROV', 'distrito': 'NOMBDIST'}
+
+    if departamento:
+        df = df[df['NOMBDEP'].map(normalizar_nombre) == normalizar_nombre(departamento)]
+    if provincia:
+        df = df[df['NOMBPROV'].map(normalizar_nombre) == normalizar_nombre(provincia)]
+
+    return sorted(set(df[columnas[nivel]].dropna().str.strip()))
+
+
+def cargar_centroides(ruta=RUTA_CENTROIDES):
+    """
+    Carga los centroides aproximados de los departamentos.
+
+    Args:
+        ruta (str): Archivo CSV con columnas departamento, latitud, longitud
+
+    Returns:
+        dict: nombre normalizado → (longitud, latitud)
+    """
+    with open(ruta, encoding='utf-8') as f:
+        return {
+            normalizar_nombre(fila['departamento']): (float(fila['longitud']), float(fila['latitud']))
+            for fila in csv.DictReader(f)
+        }
+
+
+def proyectar_centroides(centroides, zona, limites=LIMITES_PERU):
+    """
+    Convierte coordenadas geográficas a píxeles de la zona del mapa,
+    manteniendo la proporción como lo hace Highcharts.
+
+    Args:
+        centroides (dict): nombre → (longitud, latitud)
+        zona (dict): Coordenadas x_min, y_min, x_max, y_max de la zona
+        limites (dict): Extensión geográfica que ocupa el mapa
+
+    Returns:
+        dict: nombre → (x, y) en píxeles
+    """
+    ancho_geo = limites['lon_max'] - limites['lon_min']
+    alto_geo = limites['lat_max'] - limites['lat_min']
+    ancho = zona['x_max'] - zona['x_min']
+    alto = zona['y_max'] - zona['y_min']
+
+    escala = min(ancho / ancho_geo, alto / alto_geo)
+    margen_x = zona['x_min'] + (ancho - ancho_geo * escala) / 2
+    margen_y = zona['y_min'] + (alto - alto_geo * escala) / 2
+
+    return {
+        nombre: (margen_x + (lon - limites['lon_min']) * escala,
+                 margen_y + (limites['lat_max'] - lat) * escala)
+        for nombre, (lon, lat) in centroides.items()
+    }
+
+
+def posiciones_departamentos(zona):
+    """
+    Posiciones aproximadas en pantalla de cada departamento para una zona del mapa.
+
+    Args:
+        zona (dict): Coordenadas x_min, y_min, x_max, y_max de la zona
+
+    Returns:
+        dict: nombre normalizado → (x, y)
+    """
+    return proyectar_centroides(cargar_centroides(), zona)
+
+
+def orden_grueso_a_fino(filas, columnas):
+    """
+    Ordena las celdas de una cuadrícula de grueso a fino: primero una celda
+    cada 2^k, luego las intermedias, hasta completar todas.
+
+    Args:
+        filas (int): Número de filas
+        columnas (int): Número de columnas
+
+    Returns:
+        list: Tuplas (fila, columna) en orden de visita
+    """
+    paso = 1
+    while paso < max(filas, columnas):
+        paso *= 2
+
+    orden = []
+    vistas = set()
+    while paso >= 1:
+        inicio = paso // 2
+        for fila in range(inicio, filas, paso):
+            for columna in range(inicio, columnas, paso):
+                if (fila, columna) not in vistas:
+                    vistas.add((fila, columna))
+                    orden.append((fila, columna))
+        paso //= 2
+    return orden
+
+
+class PlanCobertura:
+    """
+    Decide la siguiente celda a visitar según los nombres que faltan por encontrar.
+    """
+
+    def __init__(self, puntos, esperados, posiciones_esperadas=None):
+        """
+        Args:
+            puntos (dict): (fila, columna) → (x, y) de cada celda a visitar
+            esperados (iterable): Nombres que deberían aparecer
+            posiciones_esperadas (dict, opcional): nombre normalizado → (x, y)
+                                                   aproximado en pantalla
+        """
+        import numpy as np
+
+        self.esperados = {normalizar_nombre(n): n for n in esperados}
+        self.pendientes = set(self.esperados)
+        self.encontrados = {}
+
+        self.celdas = list(puntos)
+        self.visitadas = np.zeros(len(self.celdas), dtype=bool)
+
+        filas = max(f for f, _ in self.celdas) + 1
+        columnas = max(c for _, c in self.celdas) + 1
+        self._posiciones = {celda: i for i, celda in enumerate(self.celdas)}
+        self.orden_base = [self._posiciones[c] for c in orden_grueso_a_fino(filas, columnas)
+                           if c in self._posiciones]
+
+        # Distancias celda × región esperada (solo regiones con posición conocida)
+        posiciones = {n: p for n, p in (posiciones_esperadas or {}).items() if n in self.esperados}
+        self.nombres_posicion = list(posiciones)
+        if self.nombres_posicion:
+            centros = np.array([puntos[c] for c in self.celdas], dtype=float)
+            objetivos = np.array([posiciones[n] for n in self.nombres_posicion], dtype=float)
+            self.distancias = np.linalg.norm(centros[:, None, :] - objetivos[None, :, :], axis=2)
+        else:
+            self.distancias = None
+
+    @property
+    def completo(self):
+        """True si ya se encontraron todos los nombres esperados."""
+        return not self.pendientes
+
+    def siguiente(self):
+        """
+        Returns:
+            tuple: Próxima celda (fila, columna) a visitar, o None si terminó
+        """
+        import numpy as np
+
+        if self.completo or self.visitadas.all():
+            return None
+
+        indice = None
+        if self.distancias is not None:
+            columnas = [j for j, n in enumerate(self.nombres_posicion) if n in self.pendientes]
+            if columnas:
+                cercania = self.distancias[:, columnas].min(axis=1)
+                cercania[self.visitadas] = np.inf
+                indice = int(np.argmin(cercania))
+
+        if indice is None:
+            indice = next(i for i in self.orden_base if not self.visitadas[i])
+
+        self.visitadas[indice] = True
+        return self.celdas[indice]
+
+    def marcar_visitada(self, celda):
+        """
+        Marca una celda como visitada sin devolverla en `siguiente` (p. ej. al
+        reanudar un escaneo interrumpido).
+
+        Args:
+            celda (tuple): (fila, columna)
+        """
+        if celda in self._posiciones:
+            self.visitadas[self._posiciones[celda]] = True
+
+    def registrar(self, texto):
+        """
+        Registra el texto de un tooltip y lo asocia a un nombre esperado.
+
+        Args:
+            texto (str): Texto del tooltip
+
+        Returns:
+            str: Nombre esperado que corresponde al texto, o None
+        """
+        clave = nombre_de_tooltip(texto)
+        if clave not in self.esperados:
+            # El nombre como palabras completas ('ica' no está en 'huancavelica');
+            # si hay varios, el más largo ('san martin' antes que 'martin')
+            completo = normalizar_nombre(texto)
+            coincidencias = [n for n in self.esperados
+                             if n and re.search(rf"\b{re.escape(n)}\b", completo)]
+            clave = max(coincidencias, key=len) if coincidencias else None
+        if clave is None:
+            return None
+
+        self.pendientes.discard(clave)
+        self.encontrados.setdefault(clave, texto)
+        return self.esperados[clave]
+
+    def informe(self):
+        """
+        Returns:
+            dict: Celdas visitadas, nombres encontrados, faltantes y cobertura
+        """
+        total = len(self.esperados)
+        return {
+            'celdas_visitadas': int(self.visitadas.sum()),
+            'celdas_totales': len(self.celdas),
+            'encontrados': sorted(self.esperados[n] for n in self.encontrados),
+            'faltantes': sorted(self.esperados[n] for n in self.pendientes),
+            'cobertura': (total - len(self.pendientes)) / total if total else 1.0,
+        }
+
+
+def imprimir_informe(informe):
+    """Muestra un resumen del informe de cobertura."""
+    print(f"\nCobertura: {informe['cobertura'] * 100:.0f}% "
+          f"({len(informe['encontrados'])} encontrados, "
+          f"{informe['celdas_visitadas']}/{informe['celdas_totales']} celdas visitadas)")
+    if informe['faltantes']:
+        print("Nombres no encontrados:")
+        for nombre in informe['faltantes']:
+            print(f"- {nombre}")
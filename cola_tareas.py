@@ -0,0 +1,442 @@
+# cola_tareas.py
+"""
+Cola de tareas duradera sobre SQLite, para repartir un recorrido entre
+varios procesos o máquinas sin un broker externo.
+
+Cada tarea (p. ej. un par cultivo/departamento) se reclama con un
+arriendo: mientras el trabajador la procesa envía latidos que extienden el
+arriendo. Si el trabajador muere, el arriendo vence y la tarea vuelve a
+ser visible para otro trabajador. Los fallos se reintentan con backoff
+exponencial hasta `max_intentos`; después la tarea pasa a 'muerta' (cola
+de tareas fallidas) y se puede reencolar a mano.
+
+Estados: pendiente → en_curso → hecha | pendiente (reintento) | muerta
+
+Sobre un sistema de archivos compartido (NFS, SMB) conviene usar
+`modo_diario='DELETE'`: el modo WAL necesita memoria compartida entre
+procesos de la misma máquina.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from estado import ruta_estado
+from tiempos import espera_backoff
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave           TEXT UNIQUE,
+    carga           TEXT NOT NULL,
+    estado          TEXT NOT NULL DEFAULT 'pendiente',
+    intentos        INTEGER NOT NULL DEFAULT 0,
+    max_intentos    INTEGER NOT NULL DEFAULT 5,
+    visible_desde   REAL NOT NULL,
+    trabajador      TEXT,
+    arriendo_hasta  REAL,
+    resultado       TEXT,
+    ultimo_error    TEXT,
+    creada          REAL NOT NULL,
+    actualizada     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tareas_estado ON tareas (estado, visible_desde);
+"""
+
+ESTADOS = ('pendiente', 'en_curso', 'hecha', 'muerta')
+
+
+def nombre_trabajador():
+    """Identificador del trabajador: máquina y proceso."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ArriendoPerdido(RuntimeError):
+    """El arriendo de la tarea venció y otro trabajador puede haberla tomado."""
+
+
+class ColaTareas:
+    """
+    Cola de tareas con arriendos, latidos, reintentos y tareas muertas.
+    """
+
+    def __init__(self, ruta=None, modo_diario='WAL', espera_bloqueo=30.0, espera_base=5.0, espera_tope=300.0):
+        """
+        Args:
+            ruta (str, opcional): Base de datos SQLite. Si es None, usa `.siea/cola.sqlite`
+            modo_diario (str): journal_mode de SQLite ('WAL' local, 'DELETE' en red)
+            espera_bloqueo (float): Segundos de espera si la base está bloqueada
+            espera_base (float): Espera base del backoff antes de reintentar una tarea
+            espera_tope (float): Espera máxima del backoff
+        """
+        self.ruta = ruta or ruta_estado('cola.sqlite')
+        self.modo_diario = modo_diario
+        self.espera_bloqueo = espera_bloqueo
+        self.espera_base = espera_base
+        self.espera_tope = espera_tope
+        self._local = threading.local()
+        self._conexion().executescript(_ESQUEMA)
+
+    def _conexion(self):
+        """Conexión propia de cada hilo (sqlite3 no comparte conexiones entre hilos)."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=self.espera_bloqueo, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute(f"PRAGMA journal_mode={self.modo_diario}")
+            conexion.execute(f"PRAGMA busy_timeout={int(self.espera_bloqueo * 1000)}")
+            self._local.conexion = conexion
+        return conexion
+
+    def _transaccion(self):
+        """Transacción con bloqueo de escritura desde el inicio (BEGIN IMMEDIATE)."""
+        return _Transaccion(self._conexion())
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is not None:
+            conexion.close()
+            self._local.conexion = None
+
+    # --- Productor -----------------------------------------------------
+
+    def encolar(self, carga, clave=None, max_intentos=5):
+        """
+        Añade una tarea. Si ya existe una con la misma clave, no se duplica.
+
+        Args:
+            carga (dict): Datos de la tarea (serializables a JSON)
+            clave (str, opcional): Clave única; por defecto la carga serializada
+            max_intentos (int): Intentos antes de pasar a tareas muertas
+
+        Returns:
+            bool: True si la tarea se añadió
+        """
+        texto = json.dumps(carga, sort_keys=True, ensure_ascii=False)
+        ahora = time.time()
+        with self._transaccion() as conexion:
+            cursor = conexion.execute(
+                "INSERT OR IGNORE INTO tareas (clave, carga, max_intentos, visible_desde, creada, actualizada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave or texto, texto, max_intentos, ahora, ahora, ahora),
+            )
+            return cursor.rowcount == 1
+
+    def encolar_varias(self, cargas, max_intentos=5):
+        """
+        Añade varias tareas en una sola transacción.
+
+        Args:
+            cargas (iterable): Datos de cada tarea
+            max_intentos (int): Intentos antes de pasar a tareas muertas
+
+        Returns:
+            int: Tareas nuevas añadidas
+        """
+        ahora = time.time()
+        filas = []
+        for carga in cargas:
+            texto = json.dumps(carga, sort_keys=True, ensure_ascii=False)
+            filas.append((texto, texto, max_intentos, ahora, ahora, ahora))
+
+        with self._transaccion() as conexion:
+            antes = conexion.total_changes
+            conexion.executemany(
+                "INSERT OR IGNORE INTO tareas (clave, carga, max_intentos, visible_desde, creada, actualizada) "
+                "VALUES (?, ?, ?, ?, ?, ?)", filas,
+            )
+            return conexion.total_changes - antes
+
+    def reabrir_varias(self, cargas, clave=None, max_intentos=5):
+        """
+        Añade varias tareas o, si ya existen, las devuelve a pendiente con la
+        nueva carga y los intentos a cero (p. ej. para volver a extraer
+        registros que no pasaron la validación). Las tareas en curso no se tocan.
+
+        Args:
+            cargas (iterable): Datos de cada tarea
+            clave (callable, opcional): Función carga → clave; por defecto la carga serializada
+            max_intentos (int): Intentos antes de pasar a tareas muertas
+
+        Returns:
+            int: Tareas añadidas o reabiertas
+        """
+        ahora = time.time()
+        filas = []
+        for carga in cargas:
+            texto = json.dumps(carga, sort_keys=True, ensure_ascii=False)
+            filas.append((clave(carga) if clave else texto, texto, max_intentos, ahora, ahora, ahora))
+
+        with self._transaccion() as conexion:
+            antes = conexion.total_changes
+            conexion.executemany(
+                "INSERT INTO tareas (clave, carga, max_intentos, visible_desde, creada, actualizada) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET carga = excluded.carga, estado = 'pendiente', intentos = 0, "
+                "max_intentos = excluded.max_intentos, visible_desde = excluded.visible_desde, "
+                "ultimo_error = NULL, actualizada = excluded.actualizada "
+                "WHERE tareas.estado != 'en_curso'", filas,
+            )
+            return conexion.total_changes - antes
+
+    # --- Trabajador ----------------------------------------------------
+
+    def reclamar(self, trabajador=None, arriendo=120.0):
+        """
+        Reclama la siguiente tarea visible: una pendiente cuya espera terminó
+        o una en curso cuyo arriendo venció (su trabajador murió).
+
+        Args:
+            trabajador (str, opcional): Identificador del trabajador
+            arriendo (float): Segundos de arriendo (se extienden con `latido`)
+
+        Returns:
+            dict: Tarea ('id', 'carga', 'intentos', ...) o None si no hay ninguna
+        """
+        trabajador = trabajador or nombre_trabajador()
+        while True:
+            ahora = time.time()
+            with self._transaccion() as conexion:
+                fila = conexion.execute(
+                    "SELECT * FROM tareas "
+                    "WHERE (estado = 'pendiente' AND visible_desde <= ?) "
+                    "   OR (estado = 'en_curso' AND arriendo_hasta < ?) "
+                    "ORDER BY visible_desde, id LIMIT 1",
+                    (ahora, ahora),
+                ).fetchone()
+                if fila is None:
+                    return None
+
+                # Un arriendo vencido cuenta como intento fallido
+                if fila['estado'] == 'en_curso' and fila['intentos'] >= fila['max_intentos']:
+                    conexion.execute(
+                        "UPDATE tareas SET estado = 'muerta', trabajador = NULL, arriendo_hasta = NULL, "
+                        "ultimo_error = ?, actualizada = ? WHERE id = ?",
+                        (f"arriendo vencido ({fila['trabajador']})", ahora, fila['id']),
+                    )
+                    continue
+
+                conexion.execute(
+                    "UPDATE tareas SET estado = 'en_curso', intentos = intentos + 1, trabajador = ?, "
+                    "arriendo_hasta = ?, actualizada = ? WHERE id = ?",
+                    (trabajador, ahora + arriendo, ahora, fila['id']),
+                )
+
+            tarea = dict(fila)
+            tarea['carga'] = json.loads(tarea['carga'])
+            tarea['intentos'] += 1
+            tarea['trabajador'] = trabajador
+            return tarea
+
+    def latido(self, id_tarea, trabajador, arriendo=120.0):
+        """
+        Extiende el arriendo de una tarea en curso.
+
+        Returns:
+            bool: False si el trabajador ya no tiene el arriendo
+        """
+        ahora = time.time()
+        with self._transaccion() as conexion:
+            cursor = conexion.execute(
+                "UPDATE tareas SET arriendo_hasta = ?, actualizada = ? "
+                "WHERE id = ? AND trabajador = ? AND estado = 'en_curso'",
+                (ahora + arriendo, ahora, id_tarea, trabajador),
+            )
+            return cursor.rowcount == 1
+
+    def completar(self, id_tarea, trabajador, resultado=None):
+        """
+        Marca una tarea como hecha y guarda su resultado.
+
+        Raises:
+            ArriendoPerdido: Si el trabajador ya no tenía el arriendo
+        """
+        ahora = time.time()
+        with self._transaccion() as conexion:
+            cursor = conexion.execute(
+                "UPDATE tareas SET estado = 'hecha', resultado = ?, trabajador = NULL, "
+                "arriendo_hasta = NULL, actualizada = ? "
+                "WHERE id = ? AND trabajador = ? AND estado = 'en_curso'",
+                (json.dumps(resultado, ensure_ascii=False), ahora, id_tarea, trabajador),
+            )
+            if cursor.rowcount != 1:
+                raise ArriendoPerdido(f"La tarea {id_tarea} ya no pertenece a {trabajador}")
+
+    def fallar(self, id_tarea, trabajador, error, reintentar=True):
+        """
+        Registra un fallo: la tarea vuelve a la cola tras un backoff, o pasa a
+        'muerta' si agotó sus intentos o el error no se debe reintentar.
+
+        Args:
+            id_tarea (int): Id de la tarea
+            trabajador (str): Trabajador que tenía el arriendo
+            error (str): Descripción del error
+            reintentar (bool): False para errores permanentes
+
+        Returns:
+            str: Nuevo estado ('pendiente' o 'muerta'), o None si no tenía el arriendo
+        """
+        ahora = time.time()
+        with self._transaccion() as conexion:
+            fila = conexion.execute(
+                "SELECT intentos, max_intentos FROM tareas "
+                "WHERE id = ? AND trabajador = ? AND estado = 'en_curso'",
+                (id_tarea, trabajador),
+            ).fetchone()
+            if fila is None:
+                return None
+
+            estado = 'pendiente' if reintentar and fila['intentos'] < fila['max_intentos'] else 'muerta'
+            espera = espera_backoff(fila['intentos'] - 1, self.espera_base, self.espera_tope) if estado == 'pendiente' else 0
+            conexion.execute(
+                "UPDATE tareas SET estado = ?, visible_desde = ?, trabajador = NULL, arriendo_hasta = NULL, "
+                "ultimo_error = ?, actualizada = ? WHERE id = ?",
+                (estado, ahora + espera, str(error)[:2000], ahora, id_tarea),
+            )
+            return estado
+
+    # --- Administración ------------------------------------------------
+
+    def reencolar_muertas(self):
+        """
+        Devuelve las tareas muertas a la cola con los intentos a cero.
+
+        Returns:
+            int: Tareas reencoladas
+        """
+        ahora = time.time()
+        with self._transaccion() as conexion:
+            return conexion.execute(
+                "UPDATE tareas SET estado = 'pendiente', intentos = 0, visible_desde = ?, actualizada = ? "
+                "WHERE estado = 'muerta'", (ahora, ahora),
+            ).rowcount
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Número de tareas por estado
+        """
+        conteo = dict.fromkeys(ESTADOS, 0)
+        for fila in self._conexion().execute("SELECT estado, COUNT(*) AS n FROM tareas GROUP BY estado"):
+            conteo[fila['estado']] = fila['n']
+        return conteo
+
+    def tareas(self, estado=None):
+        """
+        Args:
+            estado (str, opcional): Filtrar por estado
+
+        Returns:
+            list: Tareas con su carga y resultado deserializados
+        """
+        consulta = "SELECT * FROM tareas" + (" WHERE estado = ?" if estado else "") + " ORDER BY id"
+        filas = self._conexion().execute(consulta, (estado,) if estado else ()).fetchall()
+        tareas = []
+        for fila in filas:
+            tarea = dict(fila)
+            tarea['carga'] = json.loads(tarea['carga'])
+            tarea['resultado'] = json.loads(tarea['resultado']) if tarea['resultado'] else None
+            tareas.append(tarea)
+        return tareas
+
+
+class _Transaccion:
+    """Context manager BEGIN IMMEDIATE / COMMIT / ROLLBACK sobre una conexión."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def __enter__(self):
+        self.conexion.execute("BEGIN IMMEDIATE")
+        return self.conexion
+
+    def __exit__(self, tipo, valor, traza):
+        self.conexion.execute("ROLLBACK" if tipo else "COMMIT")
+        return False
+
+
+class _Latidos:
+    """Hilo que extiende el arriendo de una tarea mientras se procesa."""
+
+    def __init__(self, cola, tarea, arriendo, intervalo):
+        self.cola = cola
+        self.tarea = tarea
+        self.arriendo = arriendo
+        self.intervalo = intervalo
+        self.perdido = False
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._latir, daemon=True)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        return False
+
+    def _latir(self):
+        try:
+            while not self._detener.wait(self.intervalo):
+                if not self.cola.latido(self.tarea['id'], self.tarea['trabajador'], self.arriendo):
+                    self.perdido = True
+                    return
+        finally:
+            # La conexión del hilo de latidos no se reutiliza
+            self.cola.cerrar()
+
+
+def ejecutar_trabajador(cola, procesar, trabajador=None, arriendo=120.0, max_tareas=None,
+                        espera_vacia=5.0, salir_si_vacia=True):
+    """
+    Bucle de un trabajador: reclama tareas, las procesa enviando latidos y
+    registra el resultado o el fallo.
+
+    Args:
+        cola (ColaTareas): Cola de tareas
+        procesar (callable): Función que recibe la carga y devuelve el resultado
+        trabajador (str, opcional): Identificador del trabajador
+        arriendo (float): Segundos de arriendo; los latidos se envían cada tercio
+        max_tareas (int, opcional): Terminar tras procesar este número de tareas
+        espera_vacia (float): Espera cuando no hay tareas visibles
+        salir_si_vacia (bool): Terminar cuando no quedan tareas pendientes ni en curso
+
+    Returns:
+        dict: Tareas hechas y fallidas por este trabajador
+    """
+    trabajador = trabajador or nombre_trabajador()
+    resumen = {'hechas': 0, 'fallidas': 0}
+
+    while max_tareas is None or resumen['hechas'] + resumen['fallidas'] < max_tareas:
+        tarea = cola.reclamar(trabajador, arriendo)
+        if tarea is None:
+            conteo = cola.estadisticas()
+            if salir_si_vacia and conteo['pendiente'] == 0 and conteo['en_curso'] == 0:
+                break
+            time.sleep(espera_vacia)
+            continue
+
+        print(f"[{trabajador}] tarea {tarea['id']} (intento {tarea['intentos']}): {tarea['carga']}")
+        try:
+            with _Latidos(cola, tarea, arriendo, arriendo / 3) as latidos:
+                resultado = procesar(tarea['carga'])
+            if latidos.perdido:
+                raise ArriendoPerdido(f"Se perdió el arriendo de la tarea {tarea['id']}")
+            cola.completar(tarea['id'], trabajador, resultado)
+            resumen['hechas'] += 1
+        except ArriendoPerdido as e:
+            # Otro trabajador ya tiene la tarea: no se registra nada
+            print(f"[{trabajador}] {e}")
+        except Exception as e:
+            # Se reintenta cualquier error: otro nodo u otro navegador puede
+            # tener éxito; tras max_intentos la tarea pasa a tareas muertas
+            estado = cola.fallar(tarea['id'], trabajador, f"{type(e).__name__}: {e}")
+            print(f"[{trabajador}] tarea {tarea['id']} falló ({estado}): {e}")
+            resumen['fallidas'] += 1
+
+    return resumen
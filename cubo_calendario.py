@@ -0,0 +1,371 @@
+# cubo_calendario.py
+"""
+Cubo denso del calendario de cosechas: cultivo × región × mes × medida.
+
+Los resultados del gráfico de calendario (`datos_mensuales`) se guardan en
+un arreglo float32 de forma (cultivos, regiones, 12, 2) mapeado en memoria
+(np.memmap), con las medidas porcentaje y tm. Los nombres de cultivos y
+regiones se traducen a índices con dos diccionarios guardados junto al
+cubo. Las consultas (top-k por mes, ventanas de cosecha, comparación entre
+cultivos) operan sobre cortes del arreglo sin cargar los CSV uno por uno.
+
+Los valores que faltan se guardan como NaN.
+
+Archivos del cubo (dentro de su carpeta):
+    cubo.dat      Datos float32 en orden C
+    indices.json  Nombres de cultivos y regiones y capacidad reservada
+"""
+
+import csv
+import os
+
+import numpy as np
+
+from estado import cargar_json, guardar_json
+from normalizacion import normalizar_nombre
+from trazas import span
+
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Set', 'Oct', 'Nov', 'Dic']
+MEDIDAS = ['porcentaje', 'tm']
+
+_INDICE_MES = {normalizar_nombre(mes): i for i, mes in enumerate(MESES)}
+_INDICE_MES['sep'] = MESES.index('Set')
+
+
+def indice_mes(mes):
+    """
+    Args:
+        mes (str | int): Abreviatura del mes ('Ene', 'set', ...) o índice 0-11
+
+    Returns:
+        int: Índice del mes (0 = enero)
+    """
+    if isinstance(mes, (int, np.integer)):
+        return int(mes)
+    return _INDICE_MES[normalizar_nombre(mes)[:3]]
+
+
+class CuboCalendario:
+    """
+    Cubo cultivo × región × mes × medida guardado como np.memmap.
+    """
+
+    def __init__(self, directorio, modo='r+', capacidad_cultivos=16, capacidad_regiones=256):
+        """
+        Args:
+            directorio (str): Carpeta del cubo (se crea si no existe y modo != 'r')
+            modo (str): 'r' para solo lectura, 'r+' para lectura y escritura
+            capacidad_cultivos (int): Cultivos reservados al crear el cubo
+            capacidad_regiones (int): Regiones reservadas al crear el cubo
+        """
+        self.directorio = directorio
+        self.modo = modo
+        self.ruta_datos = os.path.join(directorio, 'cubo.dat')
+        self.ruta_indices = os.path.join(directorio, 'indices.json')
+
+        indices = cargar_json(self.ruta_indices)
+        if indices is None:
+            if modo == 'r':
+                raise FileNotFoundError(f"No existe un cubo en {directorio}")
+            os.makedirs(directorio, exist_ok=True)
+            indices = {'cultivos': [], 'regiones': [],
+                       'capacidad': [capacidad_cultivos, capacidad_regiones]}
+            self._crear_memmap(tuple(indices['capacidad']))
+            guardar_json(self.ruta_indices, indices)
+
+        self.cultivos = list(indices['cultivos'])
+        self.regiones = list(indices['regiones'])
+        self.capacidad = tuple(indices['capacidad'])
+        self._id_cultivo = {normalizar_nombre(n): i for i, n in enumerate(self.cultivos)}
+        self._id_region = {normalizar_nombre(n): i for i, n in enumerate(self.regiones)}
+
+        self._memmap = np.memmap(self.ruta_datos, dtype=np.float32, mode=modo,
+                                 shape=self.capacidad + (len(MESES), len(MEDIDAS)))
+
+    def _crear_memmap(self, capacidad):
+        """Crea el archivo de datos lleno de NaN con la capacidad indicada."""
+        datos = np.memmap(self.ruta_datos, dtype=np.float32, mode='w+',
+                          shape=capacidad + (len(MESES), len(MEDIDAS)))
+        datos[:] = np.nan
+        datos.flush()
+        del datos
+
+    @property
+    def datos(self):
+        """Vista (cultivos, regiones, 12, 2) de la parte ocupada del cubo."""
+        return self._memmap[:len(self.cultivos), :len(self.regiones)]
+
+    # --- Índices -------------------------------------------------------
+
+    def id_cultivo(self, cultivo, crear=False):
+        """
+        Args:
+            cultivo (str): Nombre del cultivo
+            crear (bool): Asignar un índice nuevo si no existe
+
+        Returns:
+            int: Índice del cultivo
+
+        Raises:
+            KeyError: Si el cultivo no existe y crear es False
+        """
+        clave = normalizar_nombre(cultivo)
+        if clave not in self._id_cultivo:
+            if not crear:
+                raise KeyError(f"Cultivo desconocido: {cultivo}")
+            if len(self.cultivos) == self.capacidad[0]:
+                self._redimensionar(self.capacidad[0] * 2, self.capacidad[1])
+            self._id_cultivo[clave] = len(self.cultivos)
+            self.cultivos.append(cultivo)
+        return self._id_cultivo[clave]
+
+    def id_region(self, region, crear=False):
+        """
+        Args:
+            region (str): Nombre de la región
+            crear (bool): Asignar un índice nuevo si no existe
+
+        Returns:
+            int: Índice de la región
+
+        Raises:
+            KeyError: Si la región no existe y crear es False
+        """
+        clave = normalizar_nombre(region)
+        if clave not in self._id_region:
+            if not crear:
+                raise KeyError(f"Región desconocida: {region}")
+            if len(self.regiones) == self.capacidad[1]:
+                self._redimensionar(self.capacidad[0], self.capacidad[1] * 2)
+            self._id_region[clave] = len(self.regiones)
+            self.regiones.append(region)
+        return self._id_region[clave]
+
+    def _redimensionar(self, cultivos, regiones):
+        """Copia el cubo a un archivo con más capacidad y lo reemplaza."""
+        anterior = self._memmap
+        self._memmap = None
+
+        ruta_final = self.ruta_datos
+        self.ruta_datos = f"{ruta_final}.{os.getpid()}.tmp"
+        self._crear_memmap((cultivos, regiones))
+        nuevo = np.memmap(self.ruta_datos, dtype=np.float32, mode='r+',
+                          shape=(cultivos, regiones, len(MESES), len(MEDIDAS)))
+        nuevo[:self.capacidad[0], :self.capacidad[1]] = anterior
+        nuevo.flush()
+        del nuevo, anterior
+
+        os.replace(self.ruta_datos, ruta_final)
+        self.ruta_datos = ruta_final
+        self.capacidad = (cultivos, regiones)
+        self._memmap = np.memmap(self.ruta_datos, dtype=np.float32, mode='r+',
+                                 shape=self.capacidad + (len(MESES), len(MEDIDAS)))
+        self._guardar_indices()
+
+    def _guardar_indices(self):
+        guardar_json(self.ruta_indices, {
+            'cultivos': self.cultivos,
+            'regiones': self.regiones,
+            'capacidad': list(self.capacidad),
+        })
+
+    # --- Carga de datos ------------------------------------------------
+
+    def agregar(self, cultivo, region, datos_mensuales):
+        """
+        Guarda los datos mensuales de un cultivo en una región.
+
+        Args:
+            cultivo (str): Nombre del cultivo
+            region (str): Nombre de la región
+            datos_mensuales (list): Diccionarios con 'mes', 'porcentaje' y 'tm'
+                                    (formato de extraer_datos_grafico_calendario)
+        """
+        c = self.id_cultivo(cultivo, crear=True)
+        r = self.id_region(region, crear=True)
+        for dato in datos_mensuales:
+            m = indice_mes(dato['mes'])
+            for k, medida in enumerate(MEDIDAS):
+                valor = dato.get(medida)
+                self._memmap[c, r, m, k] = np.nan if valor in (None, '') else float(valor)
+
+    def agregar_filas(self, filas, cultivo=None, region=None):
+        """
+        Guarda filas con columnas cultivo, departamento, mes, porcentaje y tm
+        (formato de los CSV de `siea crawl`).
+
+        Args:
+            filas (iterable): Diccionarios por fila
+            cultivo (str, opcional): Cultivo si las filas no lo incluyen
+            region (str, opcional): Región si las filas no la incluyen
+
+        Returns:
+            int: Filas guardadas
+        """
+        with span('normalizar', destino='cubo') as atributos:
+            grupos = {}
+            for fila in filas:
+                clave = (fila.get('cultivo') or cultivo, fila.get('departamento') or fila.get('region') or region)
+                if None in clave:
+                    raise ValueError("Las filas no indican cultivo o región; páselos como argumento")
+                grupos.setdefault(clave, []).append(fila)
+
+            for (c, r), datos in grupos.items():
+                self.agregar(c, r, datos)
+            atributos['filas'] = sum(len(datos) for datos in grupos.values())
+            return atributos['filas']
+
+    def importar_csv(self, ruta, cultivo=None, region=None):
+        """
+        Importa un CSV de calendario (p. ej. calendario_<cultivo>.csv o
+        cosecha_maiz_Departamento.csv).
+
+        Args:
+            ruta (str): Archivo CSV
+            cultivo (str, opcional): Cultivo si el CSV no tiene esa columna
+            region (str, opcional): Región si el CSV no tiene esa columna
+
+        Returns:
+            int: Filas importadas
+        """
+        with open(ruta, newline='', encoding='utf-8') as f:
+            return self.agregar_filas(csv.DictReader(f), cultivo, region)
+
+    def guardar(self):
+        """Escribe los datos pendientes al disco y guarda los índices."""
+        with span('guardar', destino='cubo'):
+            self._memmap.flush()
+            self._guardar_indices()
+
+    # --- Consultas -----------------------------------------------------
+
+    def serie(self, cultivo, region, medida='tm'):
+        """
+        Returns:
+            np.ndarray: Valores de los 12 meses de un cultivo en una región
+        """
+        return np.array(self._memmap[self.id_cultivo(cultivo), self.id_region(region), :, MEDIDAS.index(medida)])
+
+    def top_k(self, cultivo, mes, k=5, medida='tm'):
+        """
+        Regiones con mayor valor de un cultivo en un mes.
+
+        Args:
+            cultivo (str): Nombre del cultivo
+            mes (str | int): Mes ('Ene', ..., o índice 0-11)
+            k (int): Número de regiones
+            medida (str): 'tm' o 'porcentaje'
+
+        Returns:
+            list: Tuplas (región, valor) de mayor a menor
+        """
+        valores = np.array(self.datos[self.id_cultivo(cultivo), :, indice_mes(mes), MEDIDAS.index(medida)])
+        validos = np.flatnonzero(~np.isnan(valores))
+        k = min(k, validos.size)
+        if k == 0:
+            return []
+
+        candidatos = validos[np.argpartition(-valores[validos], k - 1)[:k]]
+        candidatos = candidatos[np.argsort(-valores[candidatos])]
+        return [(self.regiones[i], float(valores[i])) for i in candidatos]
+
+    def top_k_por_mes(self, cultivo, k=5, medida='tm'):
+        """
+        Top-k de regiones para cada uno de los 12 meses en una sola operación.
+
+        Returns:
+            dict: mes → lista de tuplas (región, valor)
+        """
+        valores = np.array(self.datos[self.id_cultivo(cultivo), :, :, MEDIDAS.index(medida)]).T  # (12, regiones)
+        k = min(k, valores.shape[1])
+        if k == 0:
+            return {mes: [] for mes in MESES}
+
+        relleno = np.where(np.isnan(valores), -np.inf, valores)
+        orden = np.argsort(-relleno, axis=1)[:, :k]
+        return {
+            mes: [(self.regiones[i], float(valores[m, i])) for i in orden[m] if np.isfinite(relleno[m, i])]
+            for m, mes in enumerate(MESES)
+        }
+
+    def ventanas_cosecha(self, cultivo, umbral=5.0):
+        """
+        Detecta la ventana de cosecha de cada región: los meses consecutivos
+        (contando el paso de diciembre a enero) alrededor del mes de mayor
+        porcentaje en los que el porcentaje es al menos `umbral`.
+
+        Args:
+            cultivo (str): Nombre del cultivo
+            umbral (float): Porcentaje mínimo para considerar que hay cosecha
+
+        Returns:
+            dict: región → {'pico', 'inicio', 'fin', 'meses', 'porcentaje'},
+                  solo para las regiones con datos
+        """
+        porcentajes = np.array(self.datos[self.id_cultivo(cultivo), :, :, MEDIDAS.index('porcentaje')])
+        con_datos = ~np.isnan(porcentajes).all(axis=1)
+        porcentajes = np.nan_to_num(porcentajes[con_datos], nan=0.0)
+        regiones = np.flatnonzero(con_datos)
+        if regiones.size == 0:
+            return {}
+
+        activos = porcentajes >= umbral
+        pico = np.argmax(porcentajes, axis=1)
+        filas = np.arange(len(regiones))
+
+        # Extender la ventana hacia ambos lados del pico, todas las regiones a la vez
+        inicio = pico.copy()
+        fin = pico.copy()
+        sigue_izq = activos[filas, pico].copy()
+        sigue_der = sigue_izq.copy()
+        largo = sigue_izq.astype(int)
+        for _ in range(len(MESES) - 1):
+            sigue_izq &= activos[filas, (inicio - 1) % 12] & (largo < 12)
+            inicio = np.where(sigue_izq, (inicio - 1) % 12, inicio)
+            largo += sigue_izq
+            sigue_der &= activos[filas, (fin + 1) % 12] & (largo < 12)
+            fin = np.where(sigue_der, (fin + 1) % 12, fin)
+            largo += sigue_der
+
+        ventanas = {}
+        for j, i in enumerate(regiones):
+            if largo[j] == 0:
+                continue
+            meses = [(int(inicio[j]) + d) % 12 for d in range(int(largo[j]))]
+            ventanas[self.regiones[i]] = {
+                'pico': MESES[pico[j]],
+                'inicio': MESES[inicio[j]],
+                'fin': MESES[fin[j]],
+                'meses': [MESES[m] for m in meses],
+                'porcentaje': float(porcentajes[j, meses].sum()),
+            }
+        return ventanas
+
+    def comparar_cultivos(self, cultivos, medida='tm', regiones=None):
+        """
+        Compara el perfil mensual de varios cultivos (suma de las regiones).
+
+        Args:
+            cultivos (list): Nombres de los cultivos
+            medida (str): 'tm' o 'porcentaje'
+            regiones (list, opcional): Limitar a estas regiones
+
+        Returns:
+            dict: 'totales' (cultivos × 12), 'pico' (mes de mayor valor por cultivo)
+                  y 'correlacion' (cultivos × cultivos entre perfiles mensuales)
+        """
+        ids_c = [self.id_cultivo(c) for c in cultivos]
+        ids_r = [self.id_region(r) for r in regiones] if regiones else slice(len(self.regiones))
+
+        corte = np.array(self._memmap[ids_c][:, ids_r, :, MEDIDAS.index(medida)])
+        totales = np.nansum(corte, axis=1)  # (cultivos, 12)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlacion = np.corrcoef(totales) if len(cultivos) > 1 else np.ones((1, 1))
+
+        return {
+            'cultivos': list(cultivos),
+            'totales': totales,
+            'pico': {c: MESES[int(np.argmax(t))] for c, t in zip(cultivos, totales)},
+            'correlacion': correlacion,
+        }
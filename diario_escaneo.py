@@ -0,0 +1,167 @@
+# diario_escaneo.py
+"""
+Diario de solo anexado para los escaneos por cuadrícula.
+
+Un escaneo de cientos o miles de puntos guardaba todo su avance en memoria:
+si el navegador se caía, se perdía el escaneo entero. El diario anota cada
+punto visitado y su resultado en un archivo JSON Lines dentro de
+`.siea/diarios/`, escribiéndolos por lotes pequeños (cada `lote` puntos o
+cada `intervalo` segundos, lo que ocurra antes).
+
+El archivo se identifica por el tipo de escaneo y sus parámetros
+(cuadrícula, zona, ventana, página). Al repetir el escaneo con los mismos
+parámetros, los puntos anotados se dan por visitados y el escaneo continúa
+donde se quedó. Cuando el escaneo termina, el diario se borra.
+
+Formato (una línea JSON por registro):
+    {"tipo": ..., "parametros": {...}, "inicio": ...}   cabecera
+    {"p": [fila, columna], "r": "texto del tooltip"}    punto con resultado
+    {"p": [fila, columna], "r": null}                   punto sin resultado
+
+Una línea cortada por una caída a mitad de escritura se descarta al
+reanudar.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from estado import ruta_estado
+from trazas import evento
+
+
+def ruta_diario(tipo, parametros):
+    """
+    Args:
+        tipo (str): Tipo de escaneo, p. ej. 'tooltips' o 'areas'
+        parametros (dict): Parámetros que identifican el escaneo (serializables a JSON)
+
+    Returns:
+        str: Ruta del diario del escaneo
+    """
+    texto = json.dumps(parametros, sort_keys=True, ensure_ascii=False)
+    resumen = hashlib.sha1(texto.encode('utf-8')).hexdigest()[:12]
+    return ruta_estado('diarios', f"{tipo}_{resumen}.jsonl")
+
+
+class DiarioEscaneo:
+    """
+    Puntos visitados de un escaneo y su resultado, anotados por lotes en disco.
+    """
+
+    def __init__(self, tipo, parametros, lote=20, intervalo=2.0, vigencia=12 * 3600):
+        """
+        Args:
+            tipo (str): Tipo de escaneo, p. ej. 'tooltips' o 'areas'
+            parametros (dict): Parámetros del escaneo; solo se reanuda un diario
+                               con los mismos parámetros
+            lote (int): Puntos que se acumulan antes de escribir
+            intervalo (float): Segundos máximos entre escrituras
+            vigencia (float): Antigüedad máxima en segundos de un diario para
+                              reanudarlo (la página puede haber cambiado)
+        """
+        self.tipo = tipo
+        self.parametros = parametros
+        self.lote = lote
+        self.intervalo = intervalo
+        self.ruta = ruta_diario(tipo, parametros)
+
+        self.puntos = {}  # (punto) → resultado, en orden de visita
+        self._pendientes = []
+        self._ultima_escritura = time.monotonic()
+        self._archivo = None
+
+        self._abrir(vigencia)
+
+    def _abrir(self, vigencia):
+        """Carga el diario anterior si sigue vigente o empieza uno nuevo."""
+        cabecera = None
+        lineas = []
+        if os.path.exists(self.ruta):
+            with open(self.ruta, 'rb') as f:
+                contenido = f.read()
+            # Descartar una última línea incompleta
+            contenido = contenido[:contenido.rfind(b'\n') + 1]
+            lineas = contenido.decode('utf-8').splitlines()
+            try:
+                cabecera = json.loads(lineas[0]) if lineas else None
+            except ValueError:
+                cabecera = None
+
+        vigente = (cabecera is not None and cabecera.get('parametros') == self.parametros
+                   and time.time() - cabecera.get('inicio', 0) <= vigencia)
+        if vigente:
+            for linea in lineas[1:]:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue
+                self.puntos[tuple(registro['p'])] = registro['r']
+            # Reescribir sin la línea incompleta antes de seguir anotando
+            with open(self.ruta, 'wb') as f:
+                f.write(contenido)
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+            if self.puntos:
+                print(f"Reanudando escaneo '{self.tipo}': {len(self.puntos)} puntos ya visitados")
+                evento('diario_reanudado', tipo=self.tipo, puntos=len(self.puntos), ruta=self.ruta)
+        else:
+            self._archivo = open(self.ruta, 'w', encoding='utf-8')
+            self._archivo.write(json.dumps({'tipo': self.tipo, 'parametros': self.parametros,
+                                            'inicio': time.time()}, ensure_ascii=False) + '\n')
+            self._escribir()
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def visitado(self, punto):
+        """
+        Returns:
+            bool: True si el punto ya está anotado
+        """
+        return tuple(punto) in self.puntos
+
+    def anotar(self, punto, resultado=None):
+        """
+        Anota un punto visitado; se escribe en disco con el lote.
+
+        Args:
+            punto (tuple): Identificador del punto, p. ej. (fila, columna)
+            resultado (str, opcional): Resultado del punto (None si no hubo)
+        """
+        punto = tuple(punto)
+        self.puntos[punto] = resultado
+        self._pendientes.append(json.dumps({'p': list(punto), 'r': resultado}, ensure_ascii=False))
+        if (len(self._pendientes) >= self.lote
+                or time.monotonic() - self._ultima_escritura >= self.intervalo):
+            self._escribir()
+
+    def _escribir(self):
+        """Escribe los puntos pendientes y los lleva al disco."""
+        if self._pendientes:
+            self._archivo.write('\n'.join(self._pendientes) + '\n')
+            self._pendientes = []
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._ultima_escritura = time.monotonic()
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra el archivo (el diario se conserva para reanudar)."""
+        if self._archivo is not None and not self._archivo.closed:
+            self._escribir()
+            self._archivo.close()
+
+    def terminar(self):
+        """Cierra y borra el diario: el escaneo terminó y no hay nada que reanudar."""
+        self.cerrar()
+        try:
+            os.remove(self.ruta)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
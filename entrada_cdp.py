@@ -0,0 +1,129 @@
+# entrada_cdp.py
+"""
+Movimientos del ratón con el protocolo de DevTools de Chrome.
+
+`ActionChains(...).perform()` hace un recorrido completo de acciones W3C por
+cada movimiento (chromedriver construye la secuencia, calcula la posición
+del elemento y espera a que se procese). `Input.dispatchMouseEvent`, enviado
+con `execute_cdp_cmd`, mueve el ratón con un solo comando. Los eventos son
+reales (isTrusted, activan :hover), así que Highcharts reacciona igual que
+con un usuario, a diferencia del MouseEvent sintético de simular_hover.
+
+`mover_lote` envía muchos movimientos en un solo comando (una secuencia de
+acciones W3C, que chromedriver despacha como eventos de ratón reales por
+DevTools, uno tras otro) y lee de una sola vez, con la biblioteca de la
+página (runtime_pagina.py), la región que había bajo el cursor en cada uno.
+Todas las coordenadas se redondean igual (`_punto`) al moverse y al buscar
+lo registrado.
+
+Los escaneos por celda (GridSearch.move_to_cell, simular_hover) siguen
+usando el `hover` sintético de runtime_pagina.py: mueve y devuelve la región
+bajo el cursor en un solo comando, que es lo que necesita la espera
+adaptativa antes de sondear el tooltip; con CDP harían falta dos (mover y
+leer la región), y Highcharts muestra el tooltip igual con ambos eventos.
+
+Si el driver no es de Chrome (o es remoto sin CDP), se usa ActionBuilder con
+coordenadas de la ventana.
+"""
+
+import weakref
+
+from runtime_pagina import llamar
+from trazas import contar
+
+# Drivers en los que CDP falló: usan ActionBuilder
+_SIN_CDP = weakref.WeakSet()
+
+
+def cdp_disponible(driver):
+    """
+    Returns:
+        bool: True si el driver acepta comandos de DevTools
+    """
+    return hasattr(driver, 'execute_cdp_cmd') and driver not in _SIN_CDP
+
+
+def _punto(x, y):
+    """Coordenadas enteras de un punto: las mismas al moverse y al buscar lo registrado."""
+    return round(x), round(y)
+
+
+def _mover_acciones(driver, puntos):
+    """
+    Movimientos con acciones W3C a coordenadas de la ventana, todos en un
+    solo comando y sin duración (Selenium anima cada movimiento 250 ms por
+    defecto y trunca las coordenadas, por eso se redondean antes).
+    """
+    from selenium.webdriver.common.actions.action_builder import ActionBuilder
+
+    acciones = ActionBuilder(driver, duration=0)
+    for x, y in puntos:
+        acciones.pointer_action.move_to_location(*_punto(x, y))
+    acciones.perform()
+
+
+def mover(driver, x, y):
+    """
+    Mueve el ratón a un punto de la ventana.
+
+    Args:
+        driver: WebDriver de Selenium
+        x (float): Coordenada X en píxeles CSS de la ventana
+        y (float): Coordenada Y en píxeles CSS de la ventana
+    """
+    if cdp_disponible(driver):
+        try:
+            driver.execute_cdp_cmd('Input.dispatchMouseEvent', {'type': 'mouseMoved', 'x': x, 'y': y})
+            return
+        except Exception as e:
+            from tiempos import es_fatal, reportar_error
+
+            if es_fatal(e):
+                raise
+            reportar_error(e, "mover el ratón con CDP; se usarán acciones W3C")
+            _SIN_CDP.add(driver)
+    contar('siea_hover_sin_cdp')
+    _mover_acciones(driver, [(x, y)])
+
+
+def mover_a_elemento(driver, elemento):
+    """
+    Mueve el ratón al centro de un elemento (desplazándolo a la vista si
+    hace falta), como ActionChains.move_to_element.
+
+    Args:
+        driver: WebDriver de Selenium
+        elemento: WebElement de destino
+    """
+    x, y = llamar(driver, 'centro', elemento)
+    mover(driver, x, y)
+
+
+def mover_lote(driver, puntos):
+    """
+    Mueve el ratón por varios puntos seguidos con un solo comando y devuelve
+    la región de Highcharts que había bajo el cursor en cada uno, leídas con
+    una sola llamada a la página.
+
+    Args:
+        driver: WebDriver de Selenium
+        puntos (list): Coordenadas (x, y) en píxeles CSS de la ventana
+
+    Returns:
+        list: Región bajo el cursor en cada punto (None si no había ninguna)
+    """
+    if not puntos:
+        return []
+    llamar(driver, 'registrar')
+    _mover_acciones(driver, puntos)
+    registrados = llamar(driver, 'movimientos') or []
+
+    # Chrome no emite mousemove si el cursor no cambia de posición: ese
+    # punto tiene la misma región que el anterior
+    por_posicion = {_punto(x, y): region for x, y, region in registrados}
+    regiones = []
+    anterior = None
+    for x, y in puntos:
+        anterior = por_posicion.get(_punto(x, y), anterior)
+        regiones.append(anterior)
+    return regiones
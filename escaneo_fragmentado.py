@@ -0,0 +1,289 @@
+# escaneo_fragmentado.py
+"""
+Escaneo por cuadrícula repartido entre varios navegadores.
+
+Aun con la espera adaptativa y la biblioteca de la página, un escaneo de
+GridSearch queda limitado por el bucle de eventos de una sola página: cada
+celda es un hover y una lectura del tooltip, una detrás de otra. Aquí la
+cuadrícula se divide en franjas de filas contiguas (fragmentos) que se
+recorren en paralelo, cada una en su propio navegador abierto en la misma
+vista del mapa (mismo cultivo y ruta). Todos usan la misma zona y la misma
+resolución, detectadas en el primer navegador, para que las celdas
+coincidan exactamente.
+
+Los resultados se fusionan en un solo conjunto de elementos encontrados y
+un mapa de posiciones. Una región que cruza el borde entre dos franjas
+aparece en ambas: se conserva una sola vez, con la primera celda en orden
+de filas donde se vio.
+
+Cada fragmento usa un navegador aparte y no una pestaña del mismo: un
+WebDriver ejecuta sus comandos de uno en uno y Chrome solo despacha con
+fluidez los eventos de la pestaña visible.
+
+Cada hilo vuelve a entrar en el plazo de la tarea (`--plazo`) y cuelga sus
+spans del span del escaneo, que son propios de cada hilo. Un fragmento que
+falla se reintenta en un navegador nuevo; si vuelve a fallar, el resultado
+se marca como incompleto (`completo` es False) en lugar de fusionarse
+como si la cuadrícula estuviera entera.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from grid_search import GridSearch
+from normalizacion import nombre_de_tooltip, normalizar_nombre
+from tiempos import PlazoVencido, clasificar_error, en_plazo, plazo_actual, reportar_error
+from trazas import contar, dentro_de, evento, span, span_actual
+
+
+def dividir_cuadricula(grid_size, fragmentos):
+    """
+    Divide la cuadrícula en franjas de filas contiguas de tamaño parecido.
+
+    Args:
+        grid_size (int): Divisiones de cada eje de la cuadrícula
+        fragmentos (int): Número de franjas (como mucho una por fila)
+
+    Returns:
+        list: Por franja, lista de celdas (fila, columna) en orden de filas
+    """
+    fragmentos = max(1, min(int(fragmentos), grid_size))
+    limites = [round(i * grid_size / fragmentos) for i in range(fragmentos + 1)]
+    return [
+        [(fila, columna) for fila in range(limites[i], limites[i + 1]) for columna in range(grid_size)]
+        for i in range(fragmentos)
+    ]
+
+
+def repartir_esperados(buscador, franjas, expected_items, expected_positions=None):
+    """
+    Asigna cada elemento esperado a la franja que contiene su posición
+    aproximada. Los elementos sin posición se buscan en todas.
+
+    Args:
+        buscador (GridSearch): Buscador con la zona y la resolución comunes
+        franjas (list): Celdas de cada franja (ver dividir_cuadricula)
+        expected_items (iterable): Nombres esperados
+        expected_positions (dict, opcional): nombre normalizado → (x, y) aproximado
+
+    Returns:
+        list: Por franja, conjunto de nombres esperados
+    """
+    filas = [{fila for fila, _ in celdas} for celdas in franjas]
+    repartidos = [set() for _ in franjas]
+    for nombre in expected_items:
+        posicion = (expected_positions or {}).get(normalizar_nombre(nombre))
+        if posicion is None:
+            for esperados in repartidos:
+                esperados.add(nombre)
+            continue
+        fila = int((posicion[1] - buscador.y_min) // buscador.cell_height)
+        fila = min(max(fila, 0), buscador.grid_size - 1)
+        for esperados, filas_franja in zip(repartidos, filas):
+            if fila in filas_franja:
+                esperados.add(nombre)
+    return repartidos
+
+
+def fusionar(resultados):
+    """
+    Une los elementos encontrados por varios fragmentos, sin duplicados.
+
+    Dos textos se consideran el mismo elemento si su nombre de región (ver
+    normalizacion.nombre_de_tooltip) coincide; se conserva el visto en la
+    primera celda en orden de filas.
+
+    Args:
+        resultados (list): Pares (found_items, found_positions) de cada fragmento
+
+    Returns:
+        tuple: (conjunto de elementos, dict elemento → (fila, columna))
+    """
+    por_nombre = {}
+    for encontrados, posiciones in resultados:
+        for texto in encontrados:
+            celda = posiciones.get(texto)
+            clave = nombre_de_tooltip(texto) or texto
+            actual = por_nombre.get(clave)
+            if actual is None or (celda is not None and (actual[1] is None or celda < actual[1])):
+                por_nombre[clave] = (texto, celda)
+
+    encontrados = {texto for texto, _ in por_nombre.values()}
+    posiciones = {texto: celda for texto, celda in por_nombre.values() if celda is not None}
+    return encontrados, posiciones
+
+
+def _fusionar_cobertura(informes, expected_items, celdas_totales):
+    """Informe de cobertura conjunto a partir de los informes de cada fragmento."""
+    esperados = set(expected_items)
+    encontrados = set()
+    for informe in informes:
+        encontrados.update(informe['encontrados'])
+    faltantes = esperados - encontrados
+    return {
+        'celdas_visitadas': sum(informe['celdas_visitadas'] for informe in informes),
+        'celdas_totales': celdas_totales,
+        'encontrados': sorted(encontrados & esperados),
+        'faltantes': sorted(faltantes),
+        'cobertura': (len(esperados) - len(faltantes)) / len(esperados) if esperados else 1.0,
+    }
+
+
+def escanear_fragmentado(abrir_navegador, fragmentos, driver=None, grid_size=None, zone=None,
+                         nivel=None, expected_items=None, coverage=False,
+                         expected_positions=None, verbose=True, reintentos=1, **opciones):
+    """
+    Recorre la cuadrícula de GridSearch repartida en fragmentos paralelos.
+
+    Args:
+        abrir_navegador (callable): Sin argumentos, devuelve un driver nuevo ya
+                                    abierto en la vista del mapa a escanear
+        fragmentos (int): Número de navegadores en paralelo
+        driver (opcional): Driver ya abierto en la vista; recorre el primer
+                           fragmento y no se cierra. Si es None, se abre uno
+        grid_size (int, opcional): Divisiones de cada eje (ver GridSearch)
+        zone (dict, opcional): Zona del mapa; si es None, se detecta en el primer driver
+        nivel (str, opcional): Nivel del mapa para los parámetros calibrados
+        expected_items (set, opcional): Elementos que se están buscando
+        coverage (bool): Recorrer cada franja en orden de cobertura (ver
+                         GridSearch.search_grid); cada franja busca los
+                         elementos esperados cuya posición cae en ella
+        expected_positions (dict, opcional): nombre normalizado → (x, y) aproximado
+        verbose (bool): Mostrar el resumen de cada fragmento
+        reintentos (int): Veces que se repite un fragmento fallido en un
+                          navegador nuevo
+        **opciones: Otros argumentos de GridSearch.search_grid (wait_time,
+                    adaptive_wait, tooltip_selector, process_tooltip_func)
+
+    Returns:
+        dict: 'encontrados' (set), 'posiciones' (elemento → (fila, columna)),
+              'cobertura' (informe conjunto o None), 'fragmentos' (resumen de
+              cada uno), 'completo' (False si algún fragmento falló en todos
+              sus intentos) y 'duracion' (segundos)
+    """
+    propio = driver is None
+    if propio:
+        driver = abrir_navegador()
+
+    drivers = [driver]
+    inicio = time.perf_counter()
+    try:
+        # Zona y resolución comunes, resueltas en el primer navegador
+        base = GridSearch(driver, grid_size=grid_size, zone=zone, nivel=nivel)
+        franjas = dividir_cuadricula(base.grid_size, fragmentos)
+        cobertura = bool(coverage and expected_items)
+        if cobertura:
+            esperados = repartir_esperados(base, franjas, expected_items, expected_positions)
+        else:
+            esperados = [expected_items] * len(franjas)
+
+        if verbose:
+            print(f"Cuadrícula {base.grid_size}x{base.grid_size} repartida en {len(franjas)} fragmentos")
+
+        def recorrer(indice):
+            celdas = franjas[indice]
+            resumen = {'fragmento': indice, 'filas': [celdas[0][0], celdas[-1][0]],
+                       'celdas': len(celdas), 'encontrados': 0, 'duracion': 0.0, 'error': None,
+                       'intentos': 0}
+            if cobertura and not esperados[indice]:
+                # Ningún elemento esperado cae en esta franja
+                return resumen, None
+            reloj = time.perf_counter()
+            for intento in range(1 + max(0, reintentos)):
+                resumen['intentos'] = intento + 1
+                try:
+                    if indice == 0 and intento == 0:
+                        driver_fragmento = driver
+                    else:
+                        # Los reintentos (también los del primer fragmento) usan un navegador nuevo
+                        driver_fragmento = abrir_navegador()
+                        drivers.append(driver_fragmento)
+                    buscador = GridSearch(driver_fragmento, grid_size=base.grid_size, zone=base.zone, nivel=nivel)
+                    with span('escanear', metodo='cuadricula_fragmento', fragmento=indice,
+                              celdas=len(celdas), intento=intento + 1):
+                        buscador.search_grid(expected_items=esperados[indice], coverage=cobertura,
+                                             expected_positions=expected_positions, verbose=False,
+                                             cells=celdas, **opciones)
+                    break
+                except Exception as e:
+                    # Incluso un error fatal (navegador perdido) solo detiene este
+                    # intento: los demás fragmentos siguen
+                    resumen['error'] = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+                    print(f"[{clasificar_error(e)}] escanear el fragmento {indice} "
+                          f"(intento {intento + 1}): {resumen['error']}")
+                    contar('siea_fragmentos_fallidos')
+                    if isinstance(e, PlazoVencido) or plazo.vencido:
+                        return resumen, None
+            else:
+                return resumen, None
+            resumen['error'] = None
+            resumen['encontrados'] = len(buscador.found_items)
+            resumen['duracion'] = round(time.perf_counter() - reloj, 2)
+            resumen['espera'] = buscador.wait_report
+            return resumen, buscador
+
+        # El plazo y la pila de spans son propios de cada hilo: los fragmentos
+        # vuelven a entrar en los del hilo que los lanza
+        plazo = plazo_actual()
+
+        with span('escanear', metodo='cuadricula_fragmentada', fragmentos=len(franjas),
+                  celdas=base.grid_size ** 2) as atributos:
+            padre = span_actual()
+
+            def recorrer_en_tarea(indice):
+                with en_plazo(plazo), dentro_de(padre):
+                    return recorrer(indice)
+
+            with ThreadPoolExecutor(max_workers=len(franjas), thread_name_prefix='fragmento') as ejecutor:
+                resultados = list(ejecutor.map(recorrer_en_tarea, range(len(franjas))))
+
+            buscadores = [buscador for _, buscador in resultados if buscador is not None]
+            encontrados, posiciones = fusionar(
+                [(buscador.found_items, buscador.found_positions) for buscador in buscadores])
+            completo = not any(resumen['error'] for resumen, _ in resultados)
+            atributos['encontrados'] = len(encontrados)
+            atributos['completo'] = completo
+    finally:
+        for otro in drivers[1:]:
+            try:
+                otro.quit()
+            except Exception as e:
+                reportar_error(e, "cerrar el navegador de un fragmento", relanzar_fatal=False)
+        if propio:
+            driver.quit()
+
+    duracion = time.perf_counter() - inicio
+    informe = None
+    if cobertura:
+        informe = _fusionar_cobertura(
+            [buscador.coverage_report for buscador in buscadores if buscador.coverage_report],
+            expected_items, base.grid_size ** 2)
+
+    resumenes = [resumen for resumen, _ in resultados]
+    suma = sum(resumen['duracion'] for resumen in resumenes)
+    evento('escaneo_fragmentado', fragmentos=len(franjas), encontrados=len(encontrados),
+           duracion=round(duracion, 2), suma_fragmentos=round(suma, 2), completo=completo)
+
+    if verbose:
+        for resumen in resumenes:
+            estado = f"error: {resumen['error']}" if resumen['error'] else f"{resumen['duracion']} s"
+            print(f"- Fragmento {resumen['fragmento']} (filas {resumen['filas'][0]}-{resumen['filas'][1]}): "
+                  f"{resumen['encontrados']} encontrados, {estado}")
+        print(f"Escaneo terminado en {duracion:.2f} s ({suma:.2f} s sumando los fragmentos); "
+              f"{len(encontrados)} elementos sin duplicados")
+        if not completo:
+            fallidos = [str(resumen['fragmento']) for resumen in resumenes if resumen['error']]
+            print(f"Escaneo incompleto: fallaron los fragmentos {', '.join(fallidos)}")
+        if informe:
+            from cobertura import imprimir_informe
+
+            imprimir_informe(informe)
+
+    return {
+        'encontrados': encontrados,
+        'posiciones': posiciones,
+        'cobertura': informe,
+        'fragmentos': resumenes,
+        'completo': completo,
+        'duracion': round(duracion, 2),
+    }
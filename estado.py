@@ -0,0 +1,61 @@
+# estado.py
+"""
+Ubicación de los archivos de estado que persisten entre ejecuciones
+(estadísticas de estrategias, cachés, parámetros calibrados, etc.).
+
+Por defecto se guardan en la carpeta `.siea` del directorio de trabajo;
+la variable de entorno SIEA_ESTADO permite cambiarla.
+"""
+
+import json
+import os
+
+DIRECTORIO_ESTADO = os.environ.get('SIEA_ESTADO', '.siea')
+
+
+def ruta_estado(*partes):
+    """
+    Construye la ruta de un archivo de estado y crea su carpeta si no existe.
+
+    Args:
+        *partes: Componentes de la ruta relativos a DIRECTORIO_ESTADO
+
+    Returns:
+        str: Ruta completa del archivo
+    """
+    ruta = os.path.join(DIRECTORIO_ESTADO, *partes)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    return ruta
+
+
+def cargar_json(ruta, por_defecto=None):
+    """
+    Lee un archivo JSON de estado.
+
+    Args:
+        ruta (str): Ruta del archivo
+        por_defecto: Valor devuelto si el archivo no existe o está dañado
+
+    Returns:
+        Contenido del archivo o `por_defecto`
+    """
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return por_defecto
+
+
+def guardar_json(ruta, datos):
+    """
+    Escribe un archivo JSON de forma atómica (archivo temporal + reemplazo),
+    para que una ejecución interrumpida no deje el estado a medio escribir.
+
+    Args:
+        ruta (str): Ruta del archivo
+        datos: Contenido serializable a JSON
+    """
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
@@ -0,0 +1,138 @@
+# estrategias.py
+"""
+Registro compartido de estrategias alternativas (métodos de clic y de
+extracción). Guarda cuántas veces tuvo éxito cada estrategia por tipo de
+página y prueba primero la que históricamente funciona mejor, de modo que
+cuando el portal se estabiliza en un comportamiento se deja de pagar por
+los intentos fallidos en cada distrito.
+"""
+
+from estado import ruta_estado, cargar_json, guardar_json
+
+# A partir de este número de intentos se reducen los contadores a la mitad,
+# para que un cambio de comportamiento del portal se note pronto
+MAX_INTENTOS = 50
+
+
+class RegistroEstrategias:
+    """
+    Estadísticas de éxito de estrategias, persistidas en un archivo JSON.
+    """
+
+    def __init__(self, ruta=None):
+        """
+        Inicializa el registro cargando las estadísticas guardadas.
+
+        Args:
+            ruta (str, opcional): Archivo JSON de estadísticas.
+                                  Si es None, usa `.siea/estrategias.json`
+        """
+        self.ruta = ruta or ruta_estado('estrategias.json')
+        self.estadisticas = cargar_json(self.ruta, {})
+
+    def puntaje(self, tipo_pagina, nombre):
+        """
+        Calcula la tasa de éxito suavizada de una estrategia.
+
+        Args:
+            tipo_pagina (str): Tipo de página (p. ej. 'click_mapa')
+            nombre (str): Nombre de la estrategia
+
+        Returns:
+            float: Tasa de éxito entre 0 y 1 (0.5 si no hay datos)
+        """
+        datos = self.estadisticas.get(tipo_pagina, {}).get(nombre, {})
+        exitos = datos.get('exitos', 0)
+        fallos = datos.get('fallos', 0)
+        return (exitos + 1) / (exitos + fallos + 2)
+
+    def ordenar(self, tipo_pagina, nombres):
+        """
+        Ordena las estrategias de mejor a peor según su historial.
+        Ante empate se respeta el orden original.
+
+        Args:
+            tipo_pagina (str): Tipo de página
+            nombres (list): Nombres de las estrategias en su orden por defecto
+
+        Returns:
+            list: Nombres ordenados
+        """
+        return sorted(nombres, key=lambda nombre: -self.puntaje(tipo_pagina, nombre))
+
+    def registrar(self, tipo_pagina, nombre, exito):
+        """
+        Registra el resultado de un intento.
+
+        Args:
+            tipo_pagina (str): Tipo de página
+            nombre (str): Nombre de la estrategia
+            exito (bool): Si la estrategia funcionó
+        """
+        datos = self.estadisticas.setdefault(tipo_pagina, {}).setdefault(
+            nombre, {'exitos': 0, 'fallos': 0}
+        )
+        datos['exitos' if exito else 'fallos'] += 1
+
+        if datos['exitos'] + datos['fallos'] > MAX_INTENTOS:
+            datos['exitos'] //= 2
+            datos['fallos'] //= 2
+
+    def ejecutar(self, tipo_pagina, estrategias, es_valido=None):
+        """
+        Prueba las estrategias en orden de historial hasta que una funcione.
+
+        Una estrategia falla si lanza una excepción o si su resultado no pasa
+        `es_valido`. Las estadísticas se guardan al terminar.
+
+        Args:
+            tipo_pagina (str): Tipo de página
+            estrategias (list): Lista de tuplas (nombre, función sin argumentos)
+            es_valido (callable, opcional): Valida el resultado de la función.
+                                            Si es None, cualquier resultado sin
+                                            excepción cuenta como éxito
+
+        Returns:
+            tuple: (nombre de la estrategia exitosa, resultado) o (None, None)
+        """
+        funciones = dict(estrategias)
+
+        try:
+            for nombre in self.ordenar(tipo_pagina, [n for n, _ in estrategias]):
+                try:
+                    resultado = funciones[nombre]()
+                except Exception as e:
+                    print(f"Estrategia '{nombre}' falló en {tipo_pagina}: {e}")
+                    self.registrar(tipo_pagina, nombre, False)
+                    continue
+
+                if es_valido is not None and not es_valido(resultado):
+                    self.registrar(tipo_pagina, nombre, False)
+                    continue
+
+                self.registrar(tipo_pagina, nombre, True)
+                return nombre, resultado
+
+            return None, None
+        finally:
+            self.guardar()
+
+    def guardar(self):
+        """Guarda las estadísticas en disco."""
+        guardar_json(self.ruta, self.estadisticas)
+
+
+_registro = None
+
+
+def obtener_registro():
+    """
+    Devuelve el registro compartido del proceso (se crea la primera vez).
+
+    Returns:
+        RegistroEstrategias: Registro de estrategias
+    """
+    global _registro
+    if _registro is None:
+        _registro = RegistroEstrategias()
+    return _registro
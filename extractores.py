@@ -1,19 +1,22 @@
-def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
+def extraer_datos_grafico_calendario(driver, titulo_grafico=None, cultivo=None):
     """
     Extrae datos de un gráfico de calendario de cosechas del SIEA.
     
     Args:
         driver: WebDriver de Selenium inicializado
         titulo_grafico: Título del gráfico para verificación (opcional)
+        cultivo: Cultivo de los datos (opcional; por defecto, el seleccionado
+                 en el buscador del portal)
     
     Returns:
         dict: Diccionario con información del departamento y datos mensuales
     """
     from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.common.action_chains import ActionChains
-    import time
+    from tiempos import ESPERAS, dormir, esperar_hasta, reportar_error
+    from trazas import evento
+    from catalogo_cultivos import cultivo_actual
+    from entrada_cdp import mover_a_elemento
     import re
     
     # Lista de meses del año
@@ -21,9 +24,8 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
     
     try:
         # Esperar a que cargue el gráfico
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".highcharts-column-series .highcharts-point"))
-        )
+        esperar_hasta(driver, EC.presence_of_all_elements_located(
+            (By.CSS_SELECTOR, ".highcharts-column-series .highcharts-point")), ESPERAS['carga_mapa'])
         
         # Obtener el título del gráfico
         titulo_elemento = driver.find_element(By.CSS_SELECTOR, ".highcharts-title")
@@ -53,11 +55,9 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
         # Crear diccionario para almacenar datos por mes
         datos_por_mes = {mes: {"porcentaje": None, "tm": None} for mes in meses}
         
-        # Crear ActionChains para mover el mouse
-        action = ActionChains(driver)
-        
         # Analizar cada barra y asociarla con el mes correcto
         for barra in barras:
+            mes_cercano = None
             try:
                 # Obtener la posición X central de la barra
                 pos_x_barra = barra.rect['x'] + (barra.rect['width'] / 2)
@@ -76,8 +76,8 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
                 # Solo procesar si la barra tiene altura (es visible)
                 if altura > 0 and mes_cercano:
                     # Mover el cursor a la barra para mostrar el tooltip
-                    action.move_to_element(barra).perform()
-                    time.sleep(0.5)  # Esperar a que aparezca el tooltip
+                    mover_a_elemento(driver, barra)
+                    dormir(ESPERAS['tooltip_grafico'])  # Esperar a que aparezca el tooltip
                     
                     # Intentar obtener el texto del tooltip
                     tooltip_elementos = driver.find_elements(By.CSS_SELECTOR, ".highcharts-tooltip text, .highcharts-tooltip-box + text")
@@ -118,11 +118,11 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
                         "tooltip": tooltip_texto
                     }
                     
-                    # Imprimir lo que se encontró para cada mes (opcional)
-                    print(f"Mes {mes_cercano}: Porcentaje={porcentaje}%, TM={tm}")
+                    # Registrar lo que se encontró para cada mes en la traza
+                    evento('barra', mes=mes_cercano, porcentaje=porcentaje, tm=tm)
                     
             except Exception as e:
-                print(f"Error al procesar barra para mes {mes_cercano}: {str(e)}")
+                reportar_error(e, f"procesar barra del mes {mes_cercano}")
         
         # Convertir el diccionario a una lista ordenada por los meses
         datos_mensuales = []
@@ -137,7 +137,9 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
                     })
         
         # Imprimir los datos extraídos
-        print(f"\nDatos extraídos para {departamento} - Maiz Amarillo Duro:")
+        # Etiquetar los datos con el cultivo que muestra realmente el portal
+        cultivo = cultivo or cultivo_actual(driver)
+        print(f"\nDatos extraídos para {departamento} - {cultivo}:")
         print("Mes | Porcentaje | Toneladas Métricas")
         print("----|------------|------------------")
         for dato in datos_mensuales:
@@ -148,7 +150,7 @@ def extraer_datos_grafico_calendario(driver, titulo_grafico=None):
         # Devolver los resultados en un formato estructurado
         return {
             "departamento": departamento,
-            "cultivo": "Maiz Amarillo Duro",  # Se podría parametrizar más adelante
+            "cultivo": cultivo,
             "datos_mensuales": datos_mensuales
         }
         
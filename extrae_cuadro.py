@@ -1,32 +1,118 @@
+def _convertir_valor(texto):
+    """Convierte un valor del cuadro de resumen ("1 234,5") a float."""
+    return float(texto.replace(' ', '').replace(',', '.'))
+
+
+def _hay_valores(datos):
+    """Indica si una extracción devolvió al menos un valor numérico."""
+    return bool(datos) and any(v is not None for k, v in datos.items() if k != "provincia")
+
+
+def _extraer_por_etiquetas(driver):
+    """Asocia cada valor del resumen con su etiqueta leída del DOM."""
+    from selenium.webdriver.common.by import By
+
+    # Buscar los valores por clase
+    valores = driver.find_elements(By.CSS_SELECTOR, ".valor_celda_resumen")
+
+    # Leer las etiquetas para asegurar que asignamos los valores correctamente
+    etiquetas = driver.find_elements(By.CSS_SELECTOR, "div._ngcontent-ouq-7")
+    textos_etiquetas = [etiqueta.text for etiqueta in etiquetas if etiqueta.text]
+
+    datos = {}
+    for i, valor in enumerate(valores):
+        valor_texto = valor.text.strip()
+
+        # Buscar la etiqueta correspondiente
+        if i < len(textos_etiquetas):
+            etiqueta = textos_etiquetas[i].lower()
+
+            if "superficie" in etiqueta:
+                datos["superficie_ha"] = _convertir_valor(valor_texto)
+            elif "rendimiento" in etiqueta:
+                datos["rendimiento_tha"] = _convertir_valor(valor_texto)
+            elif "produccion" in etiqueta:
+                datos["produccion_tm"] = _convertir_valor(valor_texto)
+            elif "participacion" in etiqueta:
+                datos["participacion_porcentaje"] = _convertir_valor(valor_texto)
+
+    return datos
+
+
+def _extraer_por_tabla(driver):
+    """Extrae los valores con expresiones regulares sobre el texto de la tabla."""
+    from selenium.webdriver.common.by import By
+    import re
+
+    # Intentar extraer toda la tabla como texto
+    tabla = driver.find_element(By.CSS_SELECTOR, "table#mytable")
+    tabla_texto = tabla.text
+
+    # Patrones para extraer los valores
+    patrones = {
+        "superficie_ha": r'Superficie\s*\(ha\)\s*:\s*([\d\s.,]+)',
+        "rendimiento_tha": r'Rendimiento\s*\(t/ha\)\s*:\s*([\d\s.,]+)',
+        "produccion_tm": r'Produccion\s*\(tm\)\s*:\s*([\d\s.,]+)',
+        "participacion_porcentaje": r'Participación\s*\(%\)\s*:\s*([\d\s.,]+)',
+    }
+
+    datos = {}
+    for clave, patron in patrones.items():
+        coincidencia = re.search(patron, tabla_texto)
+        if coincidencia:
+            datos[clave] = _convertir_valor(coincidencia.group(1))
+
+    return datos
+
+
+def _extraer_por_javascript(driver):
+    """Lee los valores y el nombre de la provincia con un solo script."""
+    datos_js = driver.execute_script("""
+        const valores = Array.from(document.querySelectorAll('.valor_celda_resumen')).map(e => e.textContent.trim());
+        const provincia = document.querySelector('.titulo_celda_resumen')?.textContent.trim();
+        return {
+            provincia: provincia,
+            valores: valores
+        };
+    """)
+
+    if not datos_js or 'valores' not in datos_js or len(datos_js['valores']) < 4:
+        return None
+
+    # Asumiendo el orden: Superficie, Rendimiento, Producción, Participación
+    return {
+        "superficie_ha": _convertir_valor(datos_js['valores'][0]),
+        "rendimiento_tha": _convertir_valor(datos_js['valores'][1]),
+        "produccion_tm": _convertir_valor(datos_js['valores'][2]),
+        "participacion_porcentaje": _convertir_valor(datos_js['valores'][3]),
+        "provincia": datos_js['provincia'],
+    }
+
+
 def extraer_datos_resumen_provincia(driver):
     """
     Extrae los datos del resumen de la provincia que aparece en el cuadro inferior izquierdo.
-    
+
     Args:
         driver: WebDriver de Selenium inicializado
-    
+
     Returns:
         dict: Diccionario con la información de superficie, rendimiento, producción y participación
     """
     from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
-    import re
-    
+    from estrategias import obtener_registro
+    from tiempos import ESPERAS, esperar_hasta
+
     try:
         # Esperar a que se cargue la tabla de resumen
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".celda_resumen"))
-        )
-        
+        esperar_hasta(driver, EC.presence_of_element_located(
+            (By.CSS_SELECTOR, ".celda_resumen")), ESPERAS['elemento'])
+
         # Obtener el nombre de la provincia/departamento
         titulo_elemento = driver.find_element(By.CSS_SELECTOR, ".titulo_celda_resumen")
         nombre_provincia = titulo_elemento.text.replace("PROV.: ", "").replace("DPTO.: ", "").strip()
-        
-        # Extraer los valores de la tabla
-        # Buscar los valores por clase
-        valores = driver.find_elements(By.CSS_SELECTOR, ".valor_celda_resumen")
-        
+
         # Crear diccionario para almacenar la información
         datos_resumen = {
             "provincia": nombre_provincia,
@@ -35,77 +121,30 @@ def extraer_datos_resumen_provincia(driver):
             "produccion_tm": None,
             "participacion_porcentaje": None
         }
-        
-        # Leer las etiquetas para asegurar que asignamos los valores correctamente
-        etiquetas = driver.find_elements(By.CSS_SELECTOR, "div._ngcontent-ouq-7")
-        textos_etiquetas = [etiqueta.text for etiqueta in etiquetas if etiqueta.text]
-        
-        # Intentar extraer los valores directamente
-        for i, valor in enumerate(valores):
-            valor_texto = valor.text.strip()
-            
-            # Buscar la etiqueta correspondiente
-            if i < len(textos_etiquetas):
-                etiqueta = textos_etiquetas[i].lower()
-                
-                if "superficie" in etiqueta:
-                    datos_resumen["superficie_ha"] = float(valor_texto.replace(' ', '').replace(',', '.'))
-                elif "rendimiento" in etiqueta:
-                    datos_resumen["rendimiento_tha"] = float(valor_texto.replace(' ', '').replace(',', '.'))
-                elif "produccion" in etiqueta:
-                    datos_resumen["produccion_tm"] = float(valor_texto.replace(' ', '').replace(',', '.'))
-                elif "participacion" in etiqueta:
-                    datos_resumen["participacion_porcentaje"] = float(valor_texto.replace(' ', '').replace(',', '.'))
-        
-        # Si no se pudo extraer con el método anterior, intentar otro enfoque
-        if not any(datos_resumen.values()):
-            # Intentar extraer toda la tabla como texto
-            tabla = driver.find_element(By.CSS_SELECTOR, "table#mytable")
-            tabla_texto = tabla.text
-            
-            # Patrones para extraer los valores
-            superficie_match = re.search(r'Superficie\s*\(ha\)\s*:\s*([\d\s.,]+)', tabla_texto)
-            rendimiento_match = re.search(r'Rendimiento\s*\(t/ha\)\s*:\s*([\d\s.,]+)', tabla_texto)
-            produccion_match = re.search(r'Produccion\s*\(tm\)\s*:\s*([\d\s.,]+)', tabla_texto)
-            participacion_match = re.search(r'Participación\s*\(%\)\s*:\s*([\d\s.,]+)', tabla_texto)
-            
-            if superficie_match:
-                datos_resumen["superficie_ha"] = float(superficie_match.group(1).replace(' ', '').replace(',', '.'))
-            if rendimiento_match:
-                datos_resumen["rendimiento_tha"] = float(rendimiento_match.group(1).replace(' ', '').replace(',', '.'))
-            if produccion_match:
-                datos_resumen["produccion_tm"] = float(produccion_match.group(1).replace(' ', '').replace(',', '.'))
-            if participacion_match:
-                datos_resumen["participacion_porcentaje"] = float(participacion_match.group(1).replace(' ', '').replace(',', '.'))
-        
-        # Método alternativo usando JavaScript
-        if not any(datos_resumen.values()):
-            datos_js = driver.execute_script("""
-                const valores = Array.from(document.querySelectorAll('.valor_celda_resumen')).map(e => e.textContent.trim());
-                const provincia = document.querySelector('.titulo_celda_resumen')?.textContent.trim();
-                return {
-                    provincia: provincia,
-                    valores: valores
-                };
-            """)
-            
-            if datos_js and 'valores' in datos_js and len(datos_js['valores']) >= 4:
-                # Asumiendo el orden: Superficie, Rendimiento, Producción, Participación
-                datos_resumen["superficie_ha"] = float(datos_js['valores'][0].replace(' ', '').replace(',', '.'))
-                datos_resumen["rendimiento_tha"] = float(datos_js['valores'][1].replace(' ', '').replace(',', '.'))
-                datos_resumen["produccion_tm"] = float(datos_js['valores'][2].replace(' ', '').replace(',', '.'))
-                datos_resumen["participacion_porcentaje"] = float(datos_js['valores'][3].replace(' ', '').replace(',', '.'))
-                datos_resumen["provincia"] = datos_js['provincia']
-        
+
+        # Probar primero el método que mejor ha funcionado: etiquetas del DOM,
+        # texto de la tabla o JavaScript
+        estrategias = [
+            ("etiquetas", lambda: _extraer_por_etiquetas(driver)),
+            ("tabla", lambda: _extraer_por_tabla(driver)),
+            ("javascript", lambda: _extraer_por_javascript(driver)),
+        ]
+
+        metodo, valores = obtener_registro().ejecutar(
+            "extraccion_resumen", estrategias, es_valido=_hay_valores
+        )
+        if metodo:
+            datos_resumen.update(valores)
+
         # Imprimir resultados
         print("\nDatos de resumen para la provincia/departamento:", nombre_provincia)
         print(f"Superficie (ha): {datos_resumen['superficie_ha']}")
         print(f"Rendimiento (t/ha): {datos_resumen['rendimiento_tha']}")
         print(f"Producción (tm): {datos_resumen['produccion_tm']}")
         print(f"Participación (%): {datos_resumen['participacion_porcentaje']}")
-        
+
         return datos_resumen
-        
+
     except Exception as e:
         print(f"Error al extraer datos de resumen: {str(e)}")
-        return None
\ No newline at end of file
+        return None
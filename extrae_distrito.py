@@ -1,20 +1,170 @@
+def _convertir_valor(texto):
+    """Convierte un valor del cuadro de resumen ("1 234,5") a float."""
+    return float(texto.replace(' ', '').replace(',', '.'))
+
+
+def _hay_valores(datos):
+    """Indica si una extracción devolvió al menos un valor numérico."""
+    return bool(datos) and any(v is not None for v in datos.values())
+
+
+def _extraer_por_indice_dom(driver, nombre_distrito):
+    """Busca el título del distrito en el DOM y lee sus 4 valores por índice."""
+    from selenium.webdriver.common.by import By
+    from nomenclator import coincide
+
+    # Buscar título que contenga el nombre del distrito
+    textos_titulo = driver.find_elements(By.CSS_SELECTOR, ".titulo_celda_resumen")
+    distrito_indice = -1
+
+    for i, texto in enumerate(textos_titulo):
+        if "DIST.:" in texto.text and coincide(nombre_distrito, texto.text, nivel='distrito'):
+            print(f"Título encontrado: {texto.text}")
+            distrito_indice = i
+            break
+
+    if distrito_indice < 0:
+        return None
+
+    # Buscar valores correspondientes
+    valores = driver.find_elements(By.CSS_SELECTOR, ".valor_celda_resumen")
+
+    # Calcular índices para los valores del distrito
+    indice_inicio = distrito_indice * 4
+
+    if len(valores) < indice_inicio + 4:
+        return None
+
+    textos = [valores[indice_inicio + k].text.strip() for k in range(4)]
+    print(f"Valores encontrados: {', '.join(textos)}")
+
+    claves = ["superficie_ha", "rendimiento_tha", "produccion_tm", "participacion_porcentaje"]
+    return {clave: _convertir_valor(texto) if texto else None for clave, texto in zip(claves, textos)}
+
+
+def _extraer_por_javascript(driver):
+    """Lee los valores del distrito con un solo script en la página."""
+    datos_js = driver.execute_script("""
+        // Intentar encontrar el título del distrito
+        const titulos = Array.from(document.querySelectorAll(".titulo_celda_resumen"));
+        const distritoTitulo = titulos.find(t => t.textContent.includes("DIST.:"));
+
+        if (!distritoTitulo) return null;
+
+        // Buscar los valores
+        const valores = Array.from(document.querySelectorAll(".valor_celda_resumen"));
+
+        // Encontrar el índice del distrito
+        const indiceDistrito = titulos.indexOf(distritoTitulo);
+
+        // Si no encontramos índice, usar los últimos 4 valores
+        if (indiceDistrito === -1 && valores.length >= 4) {
+            return {
+                superficie_ha: valores[valores.length-4].textContent.trim(),
+                rendimiento_tha: valores[valores.length-3].textContent.trim(),
+                produccion_tm: valores[valores.length-2].textContent.trim(),
+                participacion_porcentaje: valores[valores.length-1].textContent.trim()
+            };
+        }
+
+        // Si encontramos índice, calcular inicio
+        const indiceInicio = indiceDistrito * 4;
+
+        if (valores.length >= indiceInicio + 4) {
+            return {
+                superficie_ha: valores[indiceInicio].textContent.trim(),
+                rendimiento_tha: valores[indiceInicio+1].textContent.trim(),
+                produccion_tm: valores[indiceInicio+2].textContent.trim(),
+                participacion_porcentaje: valores[indiceInicio+3].textContent.trim()
+            };
+        }
+
+        return null;
+    """)
+
+    if not datos_js:
+        return None
+
+    print("Datos extraídos con JavaScript:", datos_js)
+    return {clave: _convertir_valor(texto) if texto else None for clave, texto in datos_js.items()}
+
+
+def _extraer_por_html(driver, nombre_distrito):
+    """Busca los valores del cuadro de resumen con expresiones regulares en el HTML."""
+    import re
+
+    # Tomar captura para referencia
+    screenshot_path = f"distrito_{nombre_distrito.replace(' ', '_')}.png"
+    driver.save_screenshot(screenshot_path)
+
+    # Buscar patrones específicos en el HTML
+    html = driver.page_source
+    all_numbers = re.findall(r'valor_celda_resumen[^>]*>([\d\s.,]+)<', html)
+    print(f"Números encontrados en HTML: {all_numbers}")
+
+    if len(all_numbers) < 8:  # Asumiendo 4 para provincia y 4 para distrito
+        return None
+
+    claves = ["superficie_ha", "rendimiento_tha", "produccion_tm", "participacion_porcentaje"]
+    try:
+        return {clave: _convertir_valor(texto) for clave, texto in zip(claves, all_numbers[-8:-4])}
+    except ValueError:
+        # Si no funciona, probar con los últimos 4
+        return {clave: _convertir_valor(texto) for clave, texto in zip(claves, all_numbers[-4:])}
+
+
+def _extraer_valores_distrito(driver, nombre_distrito):
+    """
+    Extrae los valores del cuadro de resumen del distrito seleccionado,
+    probando primero el método que mejor ha funcionado: índice en el DOM,
+    JavaScript o análisis del HTML.
+
+    Returns:
+        dict: Valores encontrados (vacío si ningún método funcionó)
+    """
+    from estrategias import obtener_registro
+    from trazas import span
+
+    estrategias = [
+        ("indice_dom", lambda: _extraer_por_indice_dom(driver, nombre_distrito)),
+        ("javascript", lambda: _extraer_por_javascript(driver)),
+        ("html", lambda: _extraer_por_html(driver, nombre_distrito)),
+    ]
+
+    with span('extraer', tipo='distrito', distrito=nombre_distrito) as atributos:
+        metodo, valores = obtener_registro().ejecutar(
+            "extraccion_distrito", estrategias, es_valido=_hay_valores
+        )
+        atributos['metodo'] = metodo
+
+    if not metodo:
+        print(f"No se pudieron extraer los datos del distrito {nombre_distrito}")
+        return {}
+
+    print(f"Datos extraídos con el método {metodo}")
+    return valores
+
+
 def extraer_datos_distrito_mapa(driver, nombre_distrito):
     """
     Mueve el cursor al distrito especificado en el mapa y extrae sus datos.
-    
+
     Args:
         driver: WebDriver de Selenium inicializado
         nombre_distrito: Nombre del distrito a buscar
-    
+
     Returns:
         dict: Diccionario con la información del distrito
     """
     from selenium.webdriver.common.by import By
     from selenium.webdriver.common.action_chains import ActionChains
-    from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
-    import time
-    
+    from entrada_cdp import mover_a_elemento
+    from navegador import hacer_click_elemento
+    from indice_mapa import obtener_indice
+    from nomenclator import coincide
+    from tiempos import ESPERAS, dormir, esperar_hasta, reportar_error
+
     try:
         # Inicializar el diccionario de resultados
         datos_distrito = {
@@ -24,306 +174,139 @@ def extraer_datos_distrito_mapa(driver, nombre_distrito):
             "produccion_tm": None,
             "participacion_porcentaje": None
         }
-        
+
         # Esperar a que el mapa se cargue
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "path.highcharts-point"))
-        )
-        
+        esperar_hasta(driver, EC.presence_of_element_located(
+            (By.CSS_SELECTOR, "path.highcharts-point")), ESPERAS['carga_mapa'])
+
         # Configuración inicial
-        time.sleep(2)
+        dormir(ESPERAS['estabilizar_mapa'])
         action = ActionChains(driver)
-        elementos_mapa = driver.find_elements(By.CSS_SELECTOR, "path.highcharts-point")
-        
-        print(f"Encontrados {len(elementos_mapa)} elementos en el mapa")
-        distrito_encontrado = False
-        
+
+        # Búsqueda directa en el índice del mapa (sin recorrer los demás distritos)
+        distrito_encontrado = obtener_indice(driver).click(nombre_distrito)
+        if distrito_encontrado:
+            print(f"Distrito '{nombre_distrito}' encontrado en el índice del mapa")
+            dormir(ESPERAS['tras_click'])
+            elementos_mapa = []
+        else:
+            elementos_mapa = driver.find_elements(By.CSS_SELECTOR, "path.highcharts-point")
+            print(f"Encontrados {len(elementos_mapa)} elementos en el mapa")
+
         # Buscar el distrito en los elementos del mapa
         for elemento in elementos_mapa:
             try:
                 # Mover el cursor al elemento
-                action.move_to_element(elemento).perform()
-                time.sleep(0.7)
-                
+                mover_a_elemento(driver, elemento)
+                dormir(ESPERAS['tooltip'])
+
                 # Verificar si el tooltip contiene el nombre del distrito
                 tooltips = driver.find_elements(By.CSS_SELECTOR, ".highcharts-tooltip")
                 for tooltip in tooltips:
                     tooltip_text = tooltip.text.strip()
                     print(f"Tooltip encontrado: {tooltip_text}")
-                    
-                    if nombre_distrito.lower() in tooltip_text.lower():
+
+                    if coincide(nombre_distrito, tooltip_text, nivel='distrito'):
                         print(f"¡Distrito encontrado en tooltip!: {tooltip_text}")
                         distrito_encontrado = True
-                        
+
                         # Intentar hacer clic usando diferentes métodos
-                        try:
-                            # Método 1: Clic directo
-                            elemento.click()
-                            print("Clic directo exitoso")
-                        except Exception as e1:
-                            print(f"Error en clic directo: {e1}")
-                            try:
-                                # Método 2: Clic con ActionChains
-                                action.click(elemento).perform()
-                                print("Clic con ActionChains exitoso")
-                            except Exception as e2:
-                                print(f"Error en clic con ActionChains: {e2}")
-                                try:
-                                    # Método 3: Clic con JavaScript y MouseEvent
-                                    driver.execute_script("""
-                                        arguments[0].dispatchEvent(new MouseEvent('click', {
-                                            bubbles: true,
-                                            cancelable: true,
-                                            view: window
-                                        }));
-                                    """, elemento)
-                                    print("Clic con MouseEvent exitoso")
-                                except Exception as e3:
-                                    print(f"Error en clic con MouseEvent: {e3}")
-                        
+                        hacer_click_elemento(driver, elemento, action)
+
                         # Dar tiempo para que la página se actualice
-                        time.sleep(1.5)
+                        dormir(ESPERAS['tras_click'])
                         break
-                
+
                 # Si se encontró el distrito, salir del bucle
                 if distrito_encontrado:
                     break
-                    
+
             except Exception as e:
-                print(f"Error al procesar elemento: {e}")
+                reportar_error(e, "procesar elemento del mapa")
                 continue
-        
+
         # Si no se encontró por tooltips, intentar otros métodos
         if not distrito_encontrado:
             print(f"No se encontró el distrito '{nombre_distrito}' en los tooltips del mapa")
-            
+
             # Buscar por etiquetas de texto visibles
             etiquetas = driver.find_elements(By.CSS_SELECTOR, "text.highcharts-text-outline, .highcharts-label text")
-            
+
             for etiqueta in etiquetas:
                 try:
                     etiqueta_text = etiqueta.text.strip()
-                    if nombre_distrito.lower() in etiqueta_text.lower():
+                    if coincide(nombre_distrito, etiqueta_text, nivel='distrito'):
                         print(f"Etiqueta encontrada: {etiqueta_text}")
-                        
+
                         # Intentar hacer clic en la etiqueta
                         try:
                             etiqueta.click()
                             distrito_encontrado = True
                             print("Clic en etiqueta exitoso")
-                            time.sleep(1.5)
+                            dormir(ESPERAS['tras_click'])
                             break
                         except Exception as e:
-                            print(f"Error al hacer clic en etiqueta: {e}")
+                            reportar_error(e, "clic en etiqueta")
                             # Intentar con JavaScript
                             try:
                                 driver.execute_script("arguments[0].click();", etiqueta)
                                 distrito_encontrado = True
                                 print("Clic en etiqueta con JavaScript exitoso")
-                                time.sleep(1.5)
+                                dormir(ESPERAS['tras_click'])
                                 break
                             except Exception as e2:
-                                print(f"Error al hacer clic con JavaScript: {e2}")
+                                reportar_error(e2, "clic en etiqueta con JavaScript")
                 except Exception as e:
+                    reportar_error(e, "leer etiqueta del mapa")
                     continue
-        
+
         # Si aún no se encuentra, probar con elementos coloreados
         if not distrito_encontrado:
             print("Buscando elementos coloreados o destacados en el mapa...")
-            elementos_destacados = driver.find_elements(By.CSS_SELECTOR, 
+            elementos_destacados = driver.find_elements(By.CSS_SELECTOR,
                                                       "path.highcharts-point[fill='#FFFF00'], "
                                                       "path.highcharts-point[stroke-width='2']")
-            
+
             print(f"Encontrados {len(elementos_destacados)} elementos destacados")
-            
+
             for elemento in elementos_destacados:
                 try:
-                    action.move_to_element(elemento).perform()
-                    time.sleep(0.7)
-                    
+                    mover_a_elemento(driver, elemento)
+                    dormir(ESPERAS['tooltip'])
+
                     # Verificar si hay algún tooltip o texto relacionado con el distrito
                     tooltips = driver.find_elements(By.CSS_SELECTOR, ".highcharts-tooltip")
                     for tooltip in tooltips:
                         tooltip_text = tooltip.text.strip()
                         print(f"Tooltip en elemento destacado: {tooltip_text}")
-                        
-                        if nombre_distrito.lower() in tooltip_text.lower():
+
+                        if coincide(nombre_distrito, tooltip_text, nivel='distrito'):
                             print(f"Distrito encontrado en elemento destacado")
-                            
+
                             # Intentar hacer clic
-                            try:
-                                elemento.click()
-                                distrito_encontrado = True
-                                print("Clic en elemento destacado exitoso")
-                            except Exception as e:
-                                try:
-                                    action.click(elemento).perform()
-                                    distrito_encontrado = True
-                                    print("Clic con ActionChains exitoso")
-                                except Exception as e2:
-                                    try:
-                                        driver.execute_script("arguments[0].dispatchEvent(new MouseEvent('click', {bubbles: true}));", elemento)
-                                        distrito_encontrado = True
-                                        print("Clic con MouseEvent exitoso")
-                                    except Exception as e3:
-                                        print("No se pudo hacer clic en el elemento destacado")
-                            
-                            time.sleep(1.5)
+                            distrito_encontrado = hacer_click_elemento(driver, elemento, action)
+                            if not distrito_encontrado:
+                                print("No se pudo hacer clic en el elemento destacado")
+
+                            dormir(ESPERAS['tras_click'])
                             break
-                    
+
                     if distrito_encontrado:
                         break
                 except Exception as e:
-                    print(f"Error al procesar elemento destacado: {e}")
+                    reportar_error(e, "procesar elemento destacado")
                     continue
-        
+
         # Extraer datos del distrito
-        # Método directo: buscar los valores en el DOM
-        print("Intentando método directo de extracción...")
-        
-        # Buscar título que contenga el nombre del distrito
-        textos_titulo = driver.find_elements(By.CSS_SELECTOR, ".titulo_celda_resumen")
-        distrito_indice = -1
-        
-        for i, texto in enumerate(textos_titulo):
-            if "DIST.:" in texto.text and nombre_distrito.lower() in texto.text.lower():
-                print(f"Título encontrado: {texto.text}")
-                distrito_indice = i
-                break
-        
-        if distrito_indice >= 0:
-            # Buscar valores correspondientes
-            valores = driver.find_elements(By.CSS_SELECTOR, ".valor_celda_resumen")
-            
-            # Calcular índices para los valores del distrito
-            indice_inicio = distrito_indice * 4
-            
-            if len(valores) >= indice_inicio + 4:
-                try:
-                    superficie_text = valores[indice_inicio].text.strip()
-                    rendimiento_text = valores[indice_inicio + 1].text.strip()
-                    produccion_text = valores[indice_inicio + 2].text.strip()
-                    participacion_text = valores[indice_inicio + 3].text.strip()
-                    
-                    print(f"Valores encontrados: {superficie_text}, {rendimiento_text}, {produccion_text}, {participacion_text}")
-                    
-                    # Convertir a float, eliminando espacios y reemplazando comas por puntos
-                    if superficie_text:
-                        datos_distrito["superficie_ha"] = float(superficie_text.replace(' ', '').replace(',', '.'))
-                    if rendimiento_text:
-                        datos_distrito["rendimiento_tha"] = float(rendimiento_text.replace(' ', '').replace(',', '.'))
-                    if produccion_text:
-                        datos_distrito["produccion_tm"] = float(produccion_text.replace(' ', '').replace(',', '.'))
-                    if participacion_text:
-                        datos_distrito["participacion_porcentaje"] = float(participacion_text.replace(' ', '').replace(',', '.'))
-                except ValueError as e:
-                    print(f"Error al convertir valores: {e}")
-                except Exception as e:
-                    print(f"Error al procesar valores: {e}")
-        
-        # Método JavaScript si el método directo falló
-        if all(v is None for k, v in datos_distrito.items() if k != "nombre"):
-            print("Intentando extracción con JavaScript...")
-            
-            try:
-                datos_js = driver.execute_script("""
-                    // Intentar encontrar el título del distrito
-                    const titulos = Array.from(document.querySelectorAll(".titulo_celda_resumen"));
-                    const distritoTitulo = titulos.find(t => t.textContent.includes("DIST.:"));
-                    
-                    if (!distritoTitulo) return null;
-                    
-                    // Buscar los valores
-                    const valores = Array.from(document.querySelectorAll(".valor_celda_resumen"));
-                    
-                    // Encontrar el índice del distrito
-                    const indiceDistrito = titulos.indexOf(distritoTitulo);
-                    
-                    // Si no encontramos índice, usar los últimos 4 valores
-                    if (indiceDistrito === -1 && valores.length >= 4) {
-                        return {
-                            superficie_ha: valores[valores.length-4].textContent.trim(),
-                            rendimiento_tha: valores[valores.length-3].textContent.trim(),
-                            produccion_tm: valores[valores.length-2].textContent.trim(),
-                            participacion_porcentaje: valores[valores.length-1].textContent.trim()
-                        };
-                    }
-                    
-                    // Si encontramos índice, calcular inicio
-                    const indiceInicio = indiceDistrito * 4;
-                    
-                    if (valores.length >= indiceInicio + 4) {
-                        return {
-                            superficie_ha: valores[indiceInicio].textContent.trim(),
-                            rendimiento_tha: valores[indiceInicio+1].textContent.trim(),
-                            produccion_tm: valores[indiceInicio+2].textContent.trim(),
-                            participacion_porcentaje: valores[indiceInicio+3].textContent.trim()
-                        };
-                    }
-                    
-                    return null;
-                """)
-                
-                if datos_js:
-                    print("Datos extraídos con JavaScript:", datos_js)
-                    
-                    try:
-                        if datos_js.get("superficie_ha"):
-                            datos_distrito["superficie_ha"] = float(datos_js["superficie_ha"].replace(' ', '').replace(',', '.'))
-                        if datos_js.get("rendimiento_tha"):
-                            datos_distrito["rendimiento_tha"] = float(datos_js["rendimiento_tha"].replace(' ', '').replace(',', '.'))
-                        if datos_js.get("produccion_tm"):
-                            datos_distrito["produccion_tm"] = float(datos_js["produccion_tm"].replace(' ', '').replace(',', '.'))
-                        if datos_js.get("participacion_porcentaje"):
-                            datos_distrito["participacion_porcentaje"] = float(datos_js["participacion_porcentaje"].replace(' ', '').replace(',', '.'))
-                    except Exception as e:
-                        print(f"Error al convertir valores JS: {e}")
-            except Exception as js_error:
-                print(f"Error al ejecutar JavaScript: {js_error}")
-        
-        # Método de análisis de HTML si los anteriores fallaron
-        if all(v is None for k, v in datos_distrito.items() if k != "nombre"):
-            print("Intentando método de análisis de HTML...")
-            
-            try:
-                # Tomar captura para referencia
-                screenshot_path = f"distrito_{nombre_distrito.replace(' ', '_')}.png"
-                driver.save_screenshot(screenshot_path)
-                
-                # Analizar el HTML
-                html = driver.page_source
-                import re
-                
-                # Buscar patrones específicos en el HTML
-                all_numbers = re.findall(r'valor_celda_resumen[^>]*>([\d\s.,]+)<', html)
-                print(f"Números encontrados en HTML: {all_numbers}")
-                
-                if len(all_numbers) >= 8:  # Asumiendo 4 para provincia y 4 para distrito
-                    # Usar los últimos 4 números
-                    try:
-                        datos_distrito["superficie_ha"] = float(all_numbers[-8].replace(' ', '').replace(',', '.'))
-                        datos_distrito["rendimiento_tha"] = float(all_numbers[-7].replace(' ', '').replace(',', '.'))
-                        datos_distrito["produccion_tm"] = float(all_numbers[-6].replace(' ', '').replace(',', '.'))
-                        datos_distrito["participacion_porcentaje"] = float(all_numbers[-5].replace(' ', '').replace(',', '.'))
-                    except ValueError:
-                        # Si no funciona, probar con los últimos 4
-                        try:
-                            datos_distrito["superficie_ha"] = float(all_numbers[-4].replace(' ', '').replace(',', '.'))
-                            datos_distrito["rendimiento_tha"] = float(all_numbers[-3].replace(' ', '').replace(',', '.'))
-                            datos_distrito["produccion_tm"] = float(all_numbers[-2].replace(' ', '').replace(',', '.'))
-                            datos_distrito["participacion_porcentaje"] = float(all_numbers[-1].replace(' ', '').replace(',', '.'))
-                        except Exception as e:
-                            print(f"Error al convertir últimos valores: {e}")
-            except Exception as html_error:
-                print(f"Error al analizar HTML: {html_error}")
-        
+        datos_distrito.update(_extraer_valores_distrito(driver, nombre_distrito))
+
         return datos_distrito
-        
+
     except Exception as e:
         print(f"Error general al extraer datos del distrito {nombre_distrito}: {str(e)}")
         import traceback
         traceback.print_exc()
-        
+
         return {
             "nombre": nombre_distrito,
             "superficie_ha": None,
@@ -331,3 +314,56 @@ def extraer_datos_distrito_mapa(driver, nombre_distrito):
             "produccion_tm": None,
             "participacion_porcentaje": None
         }
+
+
+def extraer_datos_distritos_mapa(driver, nombres_distritos):
+    """
+    Extrae los datos de varios distritos de la provincia visible visitando
+    cada uno una sola vez, usando el índice nombre → elemento del mapa.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+        nombres_distritos (list): Nombres de los distritos a extraer
+
+    Returns:
+        list: Diccionarios con la información de cada distrito, en el mismo orden
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from indice_mapa import obtener_indice
+    from tiempos import ESPERAS, dormir, esperar_hasta, reportar_error
+
+    # Esperar a que el mapa se cargue
+    esperar_hasta(driver, EC.presence_of_element_located(
+        (By.CSS_SELECTOR, "path.highcharts-point")), ESPERAS['carga_mapa'])
+
+    indice = obtener_indice(driver)
+    indice.asegurar_vigente()
+
+    resultados = []
+    for nombre_distrito in nombres_distritos:
+        region = indice.buscar(nombre_distrito)
+        if region is None:
+            # No está en el índice: usar la búsqueda completa como respaldo
+            print(f"Distrito '{nombre_distrito}' no está en el índice, usando búsqueda completa")
+            resultados.append(extraer_datos_distrito_mapa(driver, nombre_distrito))
+            continue
+
+        datos_distrito = {
+            "nombre": nombre_distrito,
+            "superficie_ha": None,
+            "rendimiento_tha": None,
+            "produccion_tm": None,
+            "participacion_porcentaje": None
+        }
+
+        try:
+            if indice.click_region(region):
+                dormir(ESPERAS['tras_click'])
+                datos_distrito.update(_extraer_valores_distrito(driver, nombre_distrito))
+        except Exception as e:
+            reportar_error(e, f"extraer datos del distrito {nombre_distrito}")
+
+        resultados.append(datos_distrito)
+
+    return resultados
@@ -1,27 +1,46 @@
 # Crear archivo extraer_mapa.py
-def extraer_areas_habilitadas(driver, grid_size=40, wait_time=0.1, segunda_pasada=True):
+def extraer_areas_habilitadas(driver, grid_size=None, wait_time=None, segunda_pasada=True, nivel=None,
+                              reanudar=True):
     """
     Extrae áreas habilitadas mediante simulación de hover
     
     Args:
         driver: WebDriver de Selenium inicializado
-        grid_size: Resolución de la cuadrícula (mayor número = más puntos de prueba)
-        wait_time: Tiempo de espera entre movimientos (segundos)
+        grid_size: Resolución de la cuadrícula (mayor número = más puntos de prueba).
+                   Si es None, se usa la calibrada para el nivel o 40
+        wait_time: Tiempo de espera entre movimientos (segundos).
+                   Si es None, se usa la calibrada para el nivel o 0.1
         segunda_pasada: Si True, realiza una segunda pasada adaptativa en zonas sin detección
+        nivel: Nivel del mapa cuyos parámetros calibrados se usan (ver autoajuste.py)
+        reanudar: Si True, los puntos probados se anotan en un diario en disco y, si un
+                  escaneo con los mismos parámetros se interrumpió, se continúa donde
+                  se quedó (ver diario_escaneo.py)
     
     Returns:
         list: Lista de diccionarios con las áreas detectadas
     """
-    from selenium.webdriver.common.action_chains import ActionChains
     from selenium.webdriver.common.by import By
-    import time
+    from selenium.webdriver.support import expected_conditions as EC
+    from collections import Counter
+    from autoajuste import completar_parametros
+    from entrada_cdp import mover
+    from runtime_pagina import llamar
+    from tiempos import ESPERAS, dormir, esperar_hasta, clasificar_error, es_fatal
     import pandas as pd
     import numpy as np
     
+    # Errores por tipo (transitorio/permanente) durante el escaneo
+    errores = Counter()
+    
+    # Diario de puntos probados (se crea al conocer la cuadrícula)
+    diario = None
+    
     try:
         # Esperar a que el mapa se cargue completamente
         print("Esperando a que el mapa se cargue...")
-        time.sleep(5)
+        esperar_hasta(driver, EC.presence_of_element_located(
+            (By.CSS_SELECTOR, "svg path")), ESPERAS['carga_mapa'])
+        dormir(ESPERAS['estabilizar_mapa'])
         
         # Encontrar el elemento SVG del mapa
         svg_element = driver.find_element(By.CSS_SELECTOR, "svg")
@@ -39,22 +58,42 @@ def extraer_areas_habilitadas(driver, grid_size=40, wait_time=0.1, segunda_pasad
         """, svg_element)
         
         print(f"Dimensiones del SVG: {svg_size['width']}x{svg_size['height']}")
+        
+        # Resolución y espera calibradas para lo que no se indique
+        filas, columnas, wait_time = completar_parametros(
+            nivel, svg_size['width'], svg_size['height'], grid_size, grid_size, wait_time,
+            por_defecto=(40, 40, 0.1))
+        grid_size = max(filas, columnas)
         print(f"Usando cuadrícula de {grid_size}x{grid_size} puntos")
         
         # Primera pasada
         areas_detectadas = set()
         puntos_probados = []
         
+        # Reanudar un escaneo interrumpido con la misma página, SVG y cuadrícula
+        if reanudar:
+            from diario_escaneo import DiarioEscaneo
+            
+            diario = DiarioEscaneo('areas', {
+                'url': driver.current_url, 'cuadricula': grid_size, 'segunda_pasada': segunda_pasada,
+                'svg': [round(svg_size[k]) for k in ('x', 'y', 'width', 'height')],
+            })
+            areas_detectadas.update(texto for texto in diario.puntos.values() if texto)
+        
         # Crear una cuadrícula para mover el mouse
         step_x = svg_size['width'] / grid_size
         step_y = svg_size['height'] / grid_size
         
-        actions = ActionChains(driver)
+        # Centro del SVG en la ventana (los desplazamientos son desde el centro)
+        centro_x = svg_size['x'] + svg_size['width'] / 2
+        centro_y = svg_size['y'] + svg_size['height'] / 2
         
         # Primera pasada: Exploración sistemática
         print("\nRealizando primera pasada de detección...")
         for i in range(grid_size):
             for j in range(grid_size):
+                if diario is not None and diario.visitado((i, j)):
+                    continue
                 try:
                     # Calcular coordenadas
                     x_offset = int(step_x * i - svg_size['width']/2)
@@ -64,69 +103,27 @@ def extraer_areas_habilitadas(driver, grid_size=40, wait_time=0.1, segunda_pasad
                     puntos_probados.append((x_offset, y_offset))
                     
                     # Mover el mouse al punto
-                    actions.move_to_element_with_offset(svg_element, x_offset, y_offset).perform()
+                    mover(driver, centro_x + x_offset, centro_y + y_offset)
                     
                     # Esperar para que se active el hover
-                    time.sleep(wait_time)
+                    dormir(wait_time)
                     
-                    # Detectar área activa
-                    area_info = driver.execute_script("""
-                        // Buscar tooltips visibles
-                        const tooltips = document.querySelectorAll('.highcharts-tooltip, .tooltip, [class*="tooltip"]');
-                        for (const tooltip of tooltips) {
-                            if (tooltip.style.visibility !== 'hidden' && tooltip.style.display !== 'none') {
-                                return {
-                                    texto: tooltip.textContent.trim(),
-                                    tipo: 'tooltip'
-                                };
-                            }
-                        }
-                        
-                        // Buscar elementos con hover activo
-                        const elementos_hover = document.querySelectorAll(':hover');
-                        for (const elem of elementos_hover) {
-                            if (elem.tagName.toLowerCase() === 'path' || elem.tagName.toLowerCase() === 'polygon') {
-                                // Buscar texto asociado
-                                const title = elem.querySelector('title');
-                                if (title) return {
-                                    texto: title.textContent.trim(),
-                                    tipo: 'title'
-                                };
-                                
-                                // Buscar en atributos
-                                const dataName = elem.getAttribute('data-name');
-                                if (dataName) return {
-                                    texto: dataName,
-                                    tipo: 'data-name'
-                                };
-                                
-                                // Buscar texto cercano
-                                const bbox = elem.getBBox();
-                                const textos = document.querySelectorAll('text');
-                                for (const texto of textos) {
-                                    const txtBBox = texto.getBBox();
-                                    const dist = Math.sqrt(
-                                        Math.pow(bbox.x + bbox.width/2 - txtBBox.x - txtBBox.width/2, 2) +
-                                        Math.pow(bbox.y + bbox.height/2 - txtBBox.y - txtBBox.height/2, 2)
-                                    );
-                                    if (dist < 50) return {
-                                        texto: texto.textContent.trim(),
-                                        tipo: 'texto-cercano'
-                                    };
-                                }
-                            }
-                        }
-                        
-                        return null;
-                    """)
+                    # Detectar área activa (tooltip, title, data-name o texto cercano)
+                    area_info = llamar(driver, 'area')
                     
                     if area_info and area_info['texto'] and area_info['texto'] not in areas_detectadas:
                         areas_detectadas.add(area_info['texto'])
                         print(f"Área detectada: {area_info['texto']} (tipo: {area_info['tipo']})")
+                    
+                    # Anotar el punto (los puntos con error se repiten al reanudar)
+                    if diario is not None:
+                        diario.anotar((i, j), (area_info or {}).get('texto') or None)
                 
                 except Exception as e:
-                    # Ignorar errores de movimiento
-                    pass
+                    # Contar errores de movimiento; los fatales terminan el escaneo
+                    if es_fatal(e):
+                        raise
+                    errores[clasificar_error(e)] += 1
         
         # Segunda pasada adaptativa (opcional)
         if segunda_pasada:
@@ -174,23 +171,34 @@ def extraer_areas_habilitadas(driver, grid_size=40, wait_time=0.1, segunda_pasad
                             for dj in range(grid_size_detallado):
                                 x_offset = int(x_start + step_x_detallado * di)
                                 y_offset = int(y_start + step_y_detallado * dj)
+                                if diario is not None and diario.visitado((i, j, di, dj)):
+                                    continue
                                 
                                 try:
-                                    actions.move_to_element_with_offset(svg_element, x_offset, y_offset).perform()
-                                    time.sleep(wait_time * 1.5)  # Más tiempo para áreas pequeñas
+                                    mover(driver, centro_x + x_offset, centro_y + y_offset)
+                                    dormir(wait_time * 1.5)  # Más tiempo para áreas pequeñas
                                     
-                                    # Detectar área activa (mismo código que antes)
-                                    area_info = driver.execute_script("""
-                                        // [Mismo código JavaScript que en la primera pasada]
-                                        return null;
-                                    """)
+                                    # Detectar área activa (misma función que en la primera pasada)
+                                    area_info = llamar(driver, 'area')
                                     
                                     if area_info and area_info['texto'] and area_info['texto'] not in areas_detectadas:
                                         areas_detectadas.add(area_info['texto'])
                                         print(f"Área detectada (2da pasada): {area_info['texto']}")
+                                    
+                                    if diario is not None:
+                                        diario.anotar((i, j, di, dj), (area_info or {}).get('texto') or None)
                                 
                                 except Exception as e:
-                                    pass
+                                    if es_fatal(e):
+                                        raise
+                                    errores[clasificar_error(e)] += 1
+        
+        if errores:
+            print(f"Errores durante el escaneo: {dict(errores)}")
+        
+        # Escaneo completo: ya no hay nada que reanudar
+        if diario is not None:
+            diario.terminar()
         
         # Filtrar y organizar resultados
         resultados_finales = []
@@ -229,4 +237,9 @@ def extraer_areas_habilitadas(driver, grid_size=40, wait_time=0.1, segunda_pasad
         print(f"Error durante la extracción: {str(e)}")
         import traceback
         traceback.print_exc()
-        return []
\ No newline at end of file
+        return []
+    
+    finally:
+        # Llevar al disco los puntos anotados aunque el navegador se haya caído
+        if diario is not None:
+            diario.cerrar()
\ No newline at end of file
@@ -5,33 +5,41 @@ Este módulo implementa una estrategia de búsqueda sistemática que
 divide una zona definida en celdas y explora cada una de ellas.
 """
 
-from selenium.webdriver.common.action_chains import ActionChains
 import time
 
-# Importar las coordenadas de zona_a_utils.py
-from zone_a_utils import ZONE_A
+from autoajuste import completar_parametros
+from latencia import EsperaAdaptativa, leer_texto_tooltip, TOOLTIP, FIJA
+from runtime_pagina import llamar
+from tiempos import dormir, es_fatal
+from trazas import span, contar, evento, progreso
+from zonas import zona_del_mapa
 
 class GridSearch:
     """
     Clase que implementa una búsqueda sistemática por cuadrícula en una zona definida.
     """
     
-    def __init__(self, driver, grid_size=10, zone=None):
+    def __init__(self, driver, grid_size=None, zone=None, nivel=None):
         """
         Inicializa el sistema de búsqueda por cuadrícula.
         
         Args:
             driver: WebDriver de Selenium
-            grid_size (int): Número de divisiones en cada eje (grid_size x grid_size)
+            grid_size (int): Número de divisiones en cada eje (grid_size x grid_size).
+                             Si es None, usa la calibrada para el nivel o 10
             zone (dict, opcional): Diccionario con las coordenadas de la zona.
-                                  Si es None, usa ZONE_A de zone_a_utils.py
+                                  Si es None, se detecta la zona del mapa en la
+                                  página (ver zonas.py)
+            nivel (str, opcional): Nivel del mapa cuyos parámetros calibrados se
+                                   usan (ver autoajuste.py; default: 'departamento')
         """
+        from selenium.webdriver.common.action_chains import ActionChains
+        
         self.driver = driver
         self.action = ActionChains(driver)
-        self.grid_size = grid_size
         
-        # Usar la zona proporcionada o la zona A por defecto
-        self.zone = zone or ZONE_A
+        # Usar la zona proporcionada o la detectada en la página
+        self.zone = zona_del_mapa(driver, zone)
         
         # Extraer coordenadas de la zona
         self.x_min = self.zone['x_min']
@@ -39,12 +47,25 @@ class GridSearch:
         self.y_min = self.zone['y_min']
         self.y_max = self.zone['y_max']
         
+        # Resolución y espera calibradas para lo que no se indique
+        filas, columnas, self.default_wait_time = completar_parametros(
+            nivel, self.x_max - self.x_min, self.y_max - self.y_min,
+            grid_size, grid_size, None, por_defecto=(10, 10, 0.3))
+        self.grid_size = max(filas, columnas)
+        
         # Calcular el tamaño de cada celda
-        self.cell_width = (self.x_max - self.x_min) / grid_size
-        self.cell_height = (self.y_max - self.y_min) / grid_size
+        self.cell_width = (self.x_max - self.x_min) / self.grid_size
+        self.cell_height = (self.y_max - self.y_min) / self.grid_size
         
-        # Para seguimiento de elementos encontrados
+        # Para seguimiento de elementos encontrados y de la celda donde se vio cada uno
         self.found_items = set()
+        self.found_positions = {}
+        self.coverage_report = None
+        
+        # Región bajo el cursor tras el último movimiento y espera adaptativa
+        self.last_region = None
+        self.wait_report = None
+        self._adaptive_wait = None
         
         # Para visualización (opcional)
         self.visualization_enabled = False
@@ -85,27 +106,22 @@ class GridSearch:
             if self.visualization_enabled:
                 self._highlight_cell(row, col)
             
-            # Mover el cursor a esas coordenadas usando JavaScript
-            script = f"""
-                var evt = new MouseEvent('mousemove', {{
-                    bubbles: true,
-                    cancelable: true,
-                    view: window,
-                    clientX: {center_x},
-                    clientY: {center_y}
-                }});
-                document.elementFromPoint({center_x}, {center_y}).dispatchEvent(evt);
-            """
-            self.driver.execute_script(script)
+            # Mover el cursor a esas coordenadas con la biblioteca de la página
+            # (devuelve la región de Highcharts bajo el cursor en el mismo
+            # comando; por CDP harían falta dos, ver entrada_cdp.py)
+            self.last_region = llamar(self.driver, 'hover', center_x, center_y, False)
             
             return True
         except Exception as e:
+            if es_fatal(e):
+                raise
             print(f"Error al mover a celda [{row},{col}]: {e}")
             return False
     
     def search_grid(self, tooltip_selector=".highcharts-tooltip", 
                   process_tooltip_func=None, expected_items=None, 
-                  wait_time=0.3, verbose=True):
+                  wait_time=None, verbose=True, coverage=False,
+                  expected_positions=None, adaptive_wait=True, cells=None):
         """
         Busca elementos recorriendo toda la cuadrícula de manera sistemática.
         
@@ -114,12 +130,88 @@ class GridSearch:
             process_tooltip_func (callable, opcional): Función para procesar el tooltip.
                                                      Si es None, se usa una función básica.
             expected_items (set, opcional): Conjunto de elementos que se están buscando
-            wait_time (float): Tiempo de espera en cada celda
+            wait_time (float): Tiempo de espera en cada celda. Si es None, usa la
+                               calibrada para el nivel o 0.3
             verbose (bool): Si es True, muestra información detallada
+            coverage (bool): Si es True y hay expected_items, visita las celdas en
+                             orden de rendimiento esperado (ver cobertura.py) y
+                             termina al encontrar todos los elementos
+            expected_positions (dict, opcional): nombre normalizado → (x, y) aproximado
+                                                 de cada elemento esperado
+            adaptive_wait (bool): Si es True, wait_time es solo el límite inicial: en
+                                  cada celda se espera lo justo a que aparezca el
+                                  tooltip (ver latencia.py). El resumen queda en
+                                  `self.wait_report`
+            cells (iterable, opcional): Celdas (fila, columna) a recorrer; si es None,
+                                        toda la cuadrícula (ver escaneo_fragmentado.py)
             
         Returns:
             set: Conjunto de elementos encontrados
         """
+        if wait_time is None:
+            wait_time = self.default_wait_time
+        self._adaptive_wait = EsperaAdaptativa(inicial=wait_time) if adaptive_wait else None
+        
+        # Celdas a recorrer en orden de filas
+        if cells is None:
+            cells = [(row, col) for row in range(self.grid_size) for col in range(self.grid_size)]
+        else:
+            cells = sorted(set(cells))
+        
+        if coverage and expected_items:
+            metodo = 'cuadricula_cobertura'
+            with span('escanear', metodo=metodo, celdas=len(cells)) as atributos:
+                encontrados = self._search_grid_coverage(tooltip_selector, process_tooltip_func,
+                                                         expected_items, wait_time, verbose,
+                                                         expected_positions, cells)
+                atributos['encontrados'] = len(encontrados)
+        else:
+            metodo = 'cuadricula'
+            with span('escanear', metodo=metodo, celdas=len(cells)) as atributos:
+                encontrados = self._search_grid_sequential(tooltip_selector, process_tooltip_func,
+                                                           expected_items, wait_time, verbose, cells)
+                atributos['encontrados'] = len(encontrados)
+        
+        if self._adaptive_wait is not None:
+            self.wait_report = self._adaptive_wait.resumen()
+            evento('espera_adaptativa', metodo=metodo, **self.wait_report)
+            if verbose:
+                print(f"Espera adaptativa: límite final {self.wait_report['limite']} s, "
+                      f"{self.wait_report['fallos']} fallos por latencia "
+                      f"({self.wait_report['recuperados']} recuperados)")
+        return encontrados
+    
+    def _probe_cell(self, row, col, tooltip_selector, wait_time):
+        """
+        Mueve el cursor a una celda y espera al tooltip: lo justo con la
+        espera adaptativa, o wait_time sin ella.
+        
+        Returns:
+            bool: True si hay que leer el tooltip de la celda
+        """
+        if self._adaptive_wait is None:
+            if not self.move_to_cell(row, col):
+                return False
+            dormir(wait_time)
+            return True
+        
+        moved = [False]
+        
+        def mover():
+            moved[0] = self.move_to_cell(row, col)
+            return self.last_region if moved[0] else None
+        
+        result = self._adaptive_wait.sondear(
+            mover, lambda: leer_texto_tooltip(self.driver, [tooltip_selector]))
+        return moved[0] and result in (TOOLTIP, FIJA)
+    
+    def _search_grid_sequential(self, tooltip_selector, process_tooltip_func,
+                                expected_items, wait_time, verbose, cells):
+        """
+        Recorre las celdas fila por fila. El avance se registra como
+        eventos de progreso muestreados (ver trazas.py) en lugar de una
+        línea por celda.
+        """
         if verbose:
             print(f"Iniciando búsqueda por cuadrícula {self.grid_size}x{self.grid_size}...")
             print(f"Zona: X({self.x_min}-{self.x_max}), Y({self.y_min}-{self.y_max})")
@@ -131,36 +223,29 @@ class GridSearch:
             process_tooltip_func = self._default_process_tooltip
         
         start_time = time.time()
+        total_cells = len(cells)
+        visited = 0
         
-        # Iterar por cada celda de la cuadrícula
-        for row in range(self.grid_size):
-            for col in range(self.grid_size):
-                # Si ya encontramos todos los elementos esperados, terminar
-                if expected_items and self.found_items.issuperset(expected_items):
-                    if verbose:
-                        print(f"\n¡Se encontraron todos los {len(expected_items)} elementos buscados!")
-                    break
-                
-                if verbose:
-                    print(f"Explorando celda [{row},{col}]", end="")
-                
-                # Mover a la celda actual
-                if self.move_to_cell(row, col):
-                    # Esperar un momento para que aparezca el tooltip
-                    time.sleep(wait_time)
-                    
-                    # Procesar tooltip
-                    item = process_tooltip_func(tooltip_selector, expected_items)
-                    
-                    if verbose:
-                        if item:
-                            print(f" → {item}")
-                        else:
-                            print(" → Nada encontrado")
-            
-            # Si ya encontramos todos los elementos, terminar
+        # Iterar por cada celda
+        for row, col in cells:
+            # Si ya encontramos todos los elementos esperados, terminar
             if expected_items and self.found_items.issuperset(expected_items):
+                if verbose:
+                    print(f"\n¡Se encontraron todos los {len(expected_items)} elementos buscados!")
                 break
+            
+            # Mover a la celda actual y esperar a que aparezca el tooltip
+            if self._probe_cell(row, col, tooltip_selector, wait_time):
+                # Procesar tooltip
+                item = process_tooltip_func(tooltip_selector, expected_items)
+                if item:
+                    self.found_positions.setdefault(item, (row, col))
+                    evento('encontrado', metodo='cuadricula', celda=[row, col], texto=item)
+                    contar('siea_regiones_encontradas', metodo='cuadricula')
+            
+            visited += 1
+            progreso('escanear.cuadricula', visited, total_cells, mostrar=verbose,
+                     encontrados=len(self.found_items))
         
         # Mostrar tiempo total
         duration = time.time() - start_time
@@ -170,6 +255,55 @@ class GridSearch:
         
         return self.found_items
     
+    def _search_grid_coverage(self, tooltip_selector, process_tooltip_func,
+                              expected_items, wait_time, verbose, expected_positions, cells):
+        """
+        Recorre la cuadrícula en orden de cobertura hasta encontrar todos los
+        elementos esperados. El informe queda en `self.coverage_report`.
+        """
+        from cobertura import PlanCobertura, imprimir_informe
+        
+        if not process_tooltip_func:
+            process_tooltip_func = self._default_process_tooltip
+        
+        puntos = {(row, col): self.get_cell_center(row, col) for row, col in cells}
+        plan = PlanCobertura(puntos, expected_items, expected_positions)
+        
+        if verbose:
+            print(f"Iniciando búsqueda por cobertura de {len(expected_items)} elementos "
+                  f"en cuadrícula {self.grid_size}x{self.grid_size}...")
+        
+        start_time = time.time()
+        
+        while True:
+            cell = plan.siguiente()
+            if cell is None:
+                break
+            
+            row, col = cell
+            if self._probe_cell(row, col, tooltip_selector, wait_time):
+                # Se procesa sin filtrar: el plan asocia el texto al nombre esperado
+                item = process_tooltip_func(tooltip_selector, None)
+                if item:
+                    self.found_positions.setdefault(item, (row, col))
+                    name = plan.registrar(item)
+                    evento('encontrado', metodo='cuadricula_cobertura', celda=[row, col],
+                           texto=item, esperado=name is not None)
+                    contar('siea_regiones_encontradas', metodo='cuadricula_cobertura')
+            
+            informe = plan.informe()
+            progreso('escanear.cobertura', informe['celdas_visitadas'], informe['celdas_totales'],
+                     mostrar=verbose, encontrados=len(informe['encontrados']),
+                     faltantes=len(informe['faltantes']))
+        
+        self.coverage_report = plan.informe()
+        
+        if verbose:
+            print(f"\nBúsqueda completa en {time.time() - start_time:.2f} segundos")
+            imprimir_informe(self.coverage_report)
+        
+        return self.found_items
+    
     def _default_process_tooltip(self, tooltip_selector, expected_items=None):
         """
         Función básica para procesar tooltips.
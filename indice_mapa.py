@@ -0,0 +1,222 @@
+# indice_mapa.py
+"""
+Índice nombre → elemento del mapa para una vista (nivel del mapa) concreta.
+
+En lugar de pasar el cursor por cada `path.highcharts-point` hasta que el
+tooltip coincida con el nombre buscado, el índice se construye una sola vez
+por vista leyendo los puntos de la serie de Highcharts (o, si no está
+disponible, con una única pasada de hover) y luego cada búsqueda es O(1).
+El índice se invalida solo cuando cambia la vista (otro título o número de
+regiones), por ejemplo al entrar en un departamento o al regresar.
+"""
+
+import weakref
+
+from normalizacion import normalizar_nombre, nombre_de_tooltip
+from tiempos import ESPERAS, dormir, reportar_error
+from trazas import contar
+
+# Lee todas las regiones de las series de tipo mapa visibles
+_JS_PUNTOS_MAPA = """
+    if (!window.Highcharts) return null;
+    const puntos = [];
+    Highcharts.charts.forEach((chart, ic) => {
+        if (!chart) return;
+        chart.series.forEach((serie, is) => {
+            if (serie.type !== 'map' || !serie.visible) return;
+            serie.points.forEach((punto, ip) => {
+                if (punto.name && punto.graphic && punto.graphic.element) {
+                    puntos.push([punto.name, ic, is, ip, punto.graphic.element]);
+                }
+            });
+        });
+    });
+    return puntos;
+"""
+
+# Clave barata que identifica la vista actual del mapa
+_JS_CLAVE_VISTA = """
+    const titulo = document.querySelector('.highcharts-title');
+    const partes = [titulo ? titulo.textContent : ''];
+    partes.push(document.querySelectorAll('path.highcharts-point').length);
+    if (window.Highcharts) {
+        Highcharts.charts.forEach(chart => {
+            if (!chart) return;
+            chart.series.forEach(serie => {
+                if (serie.type === 'map') partes.push(serie.name + ':' + serie.points.length);
+            });
+        });
+    }
+    return partes.join('|');
+"""
+
+_JS_CLICK_PUNTO = """
+    const punto = Highcharts.charts[arguments[0]].series[arguments[1]].points[arguments[2]];
+    punto.firePointEvent('click');
+    return true;
+"""
+
+_indices = weakref.WeakKeyDictionary()
+
+
+class IndiceMapa:
+    """
+    Índice de regiones del mapa actual por nombre normalizado.
+    """
+
+    def __init__(self, driver, espera_hover=ESPERAS['tooltip']):
+        """
+        Inicializa el índice (se construye de forma perezosa en la primera búsqueda).
+
+        Args:
+            driver: WebDriver de Selenium
+            espera_hover (float): Espera por región si hay que construir el
+                                  índice pasando el cursor
+        """
+        self.driver = driver
+        self.espera_hover = espera_hover
+        self.clave_vista = None
+        self.regiones = {}
+
+    def clave_vista_actual(self):
+        """
+        Returns:
+            str: Identificador de la vista que muestra el mapa ahora mismo
+        """
+        return self.driver.execute_script(_JS_CLAVE_VISTA)
+
+    def invalidar(self):
+        """Descarta el índice; se reconstruirá en la siguiente búsqueda."""
+        self.clave_vista = None
+        self.regiones = {}
+
+    def construir(self):
+        """
+        Construye el índice de la vista actual.
+
+        Returns:
+            dict: nombre normalizado → {'nombre', 'elemento', 'punto'}
+        """
+        self.regiones = {}
+        puntos = self.driver.execute_script(_JS_PUNTOS_MAPA)
+
+        if puntos:
+            for nombre, ic, is_, ip, elemento in puntos:
+                self.regiones[normalizar_nombre(nombre)] = {
+                    'nombre': nombre,
+                    'elemento': elemento,
+                    'punto': (ic, is_, ip),
+                }
+        else:
+            self._construir_con_hover()
+
+        self.clave_vista = self.clave_vista_actual()
+        print(f"Índice del mapa construido: {len(self.regiones)} regiones")
+        return self.regiones
+
+    def _construir_con_hover(self):
+        """Construye el índice pasando el cursor una vez por cada región."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.action_chains import ActionChains
+
+        action = ActionChains(self.driver)
+        for elemento in self.driver.find_elements(By.CSS_SELECTOR, "path.highcharts-point"):
+            try:
+                action.move_to_element(elemento).perform()
+                dormir(self.espera_hover)
+                tooltip = self.driver.find_element(By.CSS_SELECTOR, ".highcharts-tooltip")
+                texto = tooltip.text.strip()
+                clave = nombre_de_tooltip(texto)
+                if clave and clave not in self.regiones:
+                    self.regiones[clave] = {
+                        'nombre': texto.splitlines()[0],
+                        'elemento': elemento,
+                        'punto': None,
+                    }
+            except Exception as e:
+                reportar_error(e, "indexar elemento del mapa")
+
+    def asegurar_vigente(self):
+        """Reconstruye el índice si la vista del mapa cambió."""
+        if self.clave_vista is None or self.clave_vista != self.clave_vista_actual():
+            self.construir()
+
+    def buscar(self, nombre):
+        """
+        Busca una región por nombre en la vista actual. Si el nombre no
+        coincide exactamente, se compara por ubigeo con el nomenclátor
+        (tildes, erratas, nombres alternativos; ver nomenclator.py).
+
+        Args:
+            nombre (str): Nombre de la región (se normaliza)
+
+        Returns:
+            dict: Entrada del índice, o None si no está en la vista
+        """
+        self.asegurar_vigente()
+        region = self.regiones.get(normalizar_nombre(nombre))
+        if region is None and self.regiones:
+            from nomenclator import coincide
+
+            region = next((r for r in self.regiones.values() if coincide(nombre, r['nombre'])), None)
+        contar('siea_cache', tipo='indice_mapa', resultado='acierto' if region else 'fallo')
+        return region
+
+    def nombres(self):
+        """
+        Returns:
+            list: Nombres originales de las regiones de la vista actual
+        """
+        self.asegurar_vigente()
+        return [region['nombre'] for region in self.regiones.values()]
+
+    def click(self, nombre):
+        """
+        Hace clic en una región del mapa sin recorrer las demás.
+
+        Args:
+            nombre (str): Nombre de la región
+
+        Returns:
+            bool: True si se encontró la región y el clic funcionó
+        """
+        region = self.buscar(nombre)
+        if region is None:
+            return False
+        return self.click_region(region)
+
+    def click_region(self, region):
+        """
+        Hace clic en una entrada ya obtenida con `buscar`.
+
+        Args:
+            region (dict): Entrada del índice
+
+        Returns:
+            bool: True si el clic funcionó
+        """
+        from navegador import hacer_click_elemento
+
+        extra = []
+        if region['punto'] is not None:
+            extra.append(("click_highcharts",
+                          lambda: self.driver.execute_script(_JS_CLICK_PUNTO, *region['punto'])))
+
+        return hacer_click_elemento(self.driver, region['elemento'], estrategias_extra=extra)
+
+
+def obtener_indice(driver):
+    """
+    Devuelve el índice asociado a un driver (se crea la primera vez).
+
+    Args:
+        driver: WebDriver de Selenium
+
+    Returns:
+        IndiceMapa: Índice del mapa para ese driver
+    """
+    indice = _indices.get(driver)
+    if indice is None:
+        indice = IndiceMapa(driver)
+        _indices[driver] = indice
+    return indice
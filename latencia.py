@@ -0,0 +1,237 @@
+# latencia.py
+"""
+Espera adaptativa por punto en los escaneos de tooltips.
+
+En lugar de dormir un tiempo fijo después de cada hover, el escaneo consulta
+el tooltip hasta que muestra la región que hay bajo el cursor. La latencia
+observada en cada aparición alimenta una media móvil exponencial y un
+percentil alto de las últimas observaciones, y con ellos se recalcula el
+límite de espera. Así el límite baja mientras la página responde rápido.
+
+El hover (la función `hover` de runtime_pagina.py) devuelve además la
+región de Highcharts que hay bajo el cursor (el mismo `element.point` que
+usa Highcharts para mostrar el tooltip):
+
+- Si es la región cuyo tooltip ya se está mostrando, el tooltip no cambia
+  y no hace falta esperar.
+- Si no hay ningún punto del mapa bajo el cursor, no aparecerá tooltip.
+- Si hay una región nueva y el tooltip no cambia antes del límite, el fallo
+  se atribuye a la latencia: se amplía el límite y se vuelve a sondear el
+  punto. Si tampoco aparece, el límite queda ampliado para las celdas
+  siguientes (una pausa de la página no descarta la región). Solo cuando
+  el re-sondeo falla FALLOS_SIN_TOOLTIP veces ya con la espera máxima, la
+  región se da por sin tooltip, y aun así solo durante SALTOS_SIN_TOOLTIP
+  celdas: después se vuelve a probar.
+"""
+
+import time
+from collections import deque
+
+# Límite del re-sondeo (múltiplo del límite actual) y ampliación del límite
+# tras un fallo por latencia
+RESONDEO = 4.0
+AMPLIACION = 1.5
+
+# Re-sondeos fallidos con la espera máxima antes de descartar una región, y
+# celdas de esa región que se saltan antes de volver a probarla
+FALLOS_SIN_TOOLTIP = 2
+SALTOS_SIN_TOOLTIP = 25
+
+# Resultados de EsperaAdaptativa.sondear
+TOOLTIP = 'tooltip'          # El tooltip muestra la región del punto
+SIN_REGION = 'sin_region'    # No hay región bajo el cursor: no habrá tooltip
+SIN_TOOLTIP = 'sin_tooltip'  # Hay región pero su tooltip no apareció ni al re-sondear (o está descartada)
+FIJA = 'fija'                # No se conoce la región: se esperó el límite completo
+
+
+def leer_texto_tooltip(driver, selectores=('.highcharts-tooltip',)):
+    """
+    Lee el texto del tooltip con una llamada corta a la biblioteca de la
+    página (para sondear si cambió).
+
+    Args:
+        driver: WebDriver de Selenium
+        selectores: Selectores CSS del tooltip, en orden de preferencia
+
+    Returns:
+        str: Texto del tooltip, o None si no hay ninguno con contenido
+    """
+    from runtime_pagina import llamar
+
+    return llamar(driver, 'tooltip', list(selectores))
+
+
+class EsperaAdaptativa:
+    """
+    Límite de espera por punto que se adapta a la latencia observada del tooltip.
+    """
+
+    def __init__(self, inicial=1.0, minima=0.02, maxima=2.0, margen=1.3, percentil=95,
+                 peso=0.2, ventana=200, intervalo=0.01):
+        """
+        Args:
+            inicial (float): Límite inicial en segundos (p. ej. la espera calibrada)
+            minima (float): Límite mínimo en segundos
+            maxima (float): Límite máximo en segundos
+            margen (float): Factor de seguridad sobre la latencia estimada
+            percentil (float): Percentil de las últimas latencias que debe cubrir el límite
+            peso (float): Peso de la última observación en la media móvil
+            ventana (int): Latencias recientes con las que se calcula el percentil
+            intervalo (float): Segundos entre lecturas del tooltip al sondear
+        """
+        self.minima = minima
+        self.maxima = max(maxima, inicial)
+        self.margen = margen
+        self.percentil = percentil
+        self.peso = peso
+        self.intervalo = intervalo
+
+        self.limite = min(self.maxima, max(self.minima, inicial))
+        self.latencias = deque(maxlen=ventana)
+        self.media = None
+        self.factor = 1.0  # Ampliación por fallos recientes
+
+        self.estadisticas = {'observaciones': 0, 'fallos': 0, 'recuperados': 0, 'sin_tooltip': 0,
+                             'descartadas': 0}
+        self._regiones_sin_tooltip = {}  # región → celdas que aún se saltan
+        self._fallos_region = {}  # región → re-sondeos fallidos con la espera máxima
+        self._hay_regiones = False
+        self._texto_anterior = None
+        self._region_texto = None  # Región cuyo tooltip se muestra ahora
+
+    def _valor_percentil(self):
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * self.percentil / 100))]
+
+    def _recalcular(self):
+        estimada = max(self.media, self._valor_percentil()) if self.latencias else self.limite
+        self.limite = min(self.maxima, max(self.minima, estimada * self.margen * self.factor))
+
+    def observar(self, segundos):
+        """
+        Registra la latencia de un tooltip y recalcula el límite.
+
+        Args:
+            segundos (float): Tiempo desde el hover hasta que apareció el tooltip
+        """
+        from trazas import obtener_trazador
+
+        self.latencias.append(segundos)
+        self.media = segundos if self.media is None else (1 - self.peso) * self.media + self.peso * segundos
+        # La ampliación por fallos se deshace poco a poco mientras haya aciertos
+        self.factor = max(1.0, self.factor * 0.9)
+        self.estadisticas['observaciones'] += 1
+        obtener_trazador().observar('siea_latencia_tooltip_segundos', segundos)
+        self._recalcular()
+
+    def _ampliar(self, factor):
+        self.factor = min(8.0, max(1.0, self.factor * factor))
+        self.limite = min(self.maxima, max(self.minima, self.limite * factor))
+
+    def _esperar(self, leer, region, limite, inicio):
+        """
+        Sondea el tooltip hasta que muestre la región o venza el límite.
+
+        Args:
+            leer (callable): Lectura del texto del tooltip
+            region (str): Región bajo el cursor
+            limite (float): Segundos máximos desde `inicio`
+            inicio (float): Momento del hover (time.perf_counter)
+
+        Returns:
+            bool: True si el tooltip mostró la región a tiempo
+        """
+        from tiempos import dormir
+
+        mismo = region == self._region_texto and self._texto_anterior is not None
+        while True:
+            texto = leer()
+            transcurrido = time.perf_counter() - inicio
+            if texto and (mismo or texto != self._texto_anterior):
+                if not mismo:
+                    self.observar(transcurrido)
+                self._texto_anterior, self._region_texto = texto, region
+                return True
+            if transcurrido >= limite:
+                return False
+            dormir(min(self.intervalo, limite - transcurrido))
+
+    def sondear(self, mover, leer):
+        """
+        Hace hover en un punto y espera lo justo a que aparezca su tooltip.
+
+        Args:
+            mover (callable): Hace el hover y devuelve la región bajo el cursor
+                              (None si no hay o no se sabe)
+            leer (callable): Devuelve el texto actual del tooltip (None si no hay)
+
+        Returns:
+            str: TOOLTIP, SIN_REGION, SIN_TOOLTIP o FIJA
+        """
+        from tiempos import dormir
+
+        region = mover()
+        if region is None:
+            if self._hay_regiones:
+                # El mapa expone sus regiones y aquí no hay ninguna
+                return SIN_REGION
+            # Página sin regiones de Highcharts reconocibles: espera fija
+            dormir(self.limite)
+            self._texto_anterior, self._region_texto = leer(), None
+            return FIJA
+
+        self._hay_regiones = True
+        saltos = self._regiones_sin_tooltip.get(region)
+        if saltos is not None:
+            if saltos > 0:
+                self._regiones_sin_tooltip[region] = saltos - 1
+                return SIN_TOOLTIP
+            # Venció el descarte: se vuelve a probar la región
+            del self._regiones_sin_tooltip[region]
+        inicio = time.perf_counter()
+        if self._esperar(leer, region, self.limite, inicio):
+            self._fallos_region.pop(region, None)
+            return TOOLTIP
+
+        # Región nueva sin tooltip: probablemente la página va lenta. Se repite
+        # el hover y se sigue sondeando con un límite más amplio; la latencia
+        # se cuenta desde el primer hover
+        self.estadisticas['fallos'] += 1
+        mover()
+        ventana = min(self.maxima, self.limite * RESONDEO)
+        limite = time.perf_counter() - inicio + ventana
+        if self._esperar(leer, region, limite, inicio):
+            self.estadisticas['recuperados'] += 1
+            self._fallos_region.pop(region, None)
+            self._ampliar(AMPLIACION)
+            return TOOLTIP
+
+        self.estadisticas['sin_tooltip'] += 1
+        if ventana < self.maxima:
+            # Puede ser una pausa de la página: la próxima celda empieza con la
+            # ventana que se acaba de probar, hasta llegar a la espera máxima
+            self._ampliar(ventana / self.limite)
+            return SIN_TOOLTIP
+
+        # Sin tooltip ni con la espera máxima: tras varios fallos así, la
+        # región se salta durante unas celdas
+        fallos = self._fallos_region.get(region, 0) + 1
+        if fallos >= FALLOS_SIN_TOOLTIP:
+            self._fallos_region.pop(region, None)
+            self._regiones_sin_tooltip[region] = SALTOS_SIN_TOOLTIP
+            self.estadisticas['descartadas'] += 1
+        else:
+            self._fallos_region[region] = fallos
+        return SIN_TOOLTIP
+
+    def resumen(self):
+        """
+        Returns:
+            dict: Límite actual, latencia media y percentil, y conteos de fallos
+        """
+        return {
+            'limite': round(self.limite, 4),
+            'media': round(self.media, 4) if self.media is not None else None,
+            f'p{self.percentil}': round(self._valor_percentil(), 4) if self.latencias else None,
+            **self.estadisticas,
+        }
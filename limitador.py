@@ -0,0 +1,221 @@
+# limitador.py
+"""
+Limitador de tasa compartido entre todos los trabajadores de la máquina.
+
+El portal del SIEA es el cuello de botella común: con varios trabajadores
+(o varias pestañas) hay que repartir un mismo presupuesto de peticiones.
+Cada host tiene un archivo de estado en `.siea/limites/` protegido con un
+FileLock, con un token bucket por tipo de acción:
+
+- 'carga_pagina': abrir el portal (driver.get)
+- 'datos': acciones que piden datos al servidor (elegir cultivo, entrar a
+  una región, regresar)
+
+La tasa se adapta a la latencia observada del servidor (aumento aditivo,
+reducción multiplicativa): si las cargas tardan más que su latencia
+objetivo, todos los trabajadores bajan su tasa a la vez; cuando el servidor
+se recupera, la tasa vuelve poco a poco al máximo configurado.
+
+Los hovers no se limitan: el tooltip se genera en el navegador local y no
+llega al servidor.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from estado import DIRECTORIO_ESTADO, cargar_json, guardar_json
+
+HOST_PORTAL = 'siea.midagri.gob.pe'
+
+# tasa: tokens por segundo, rafaga: tokens acumulables,
+# latencia_objetivo: segundos por encima de los cuales se reduce la tasa (None = no adapta)
+LIMITES = {
+    'carga_pagina': {'tasa': 0.5, 'rafaga': 2, 'latencia_objetivo': 8.0},
+    'datos': {'tasa': 2.0, 'rafaga': 4, 'latencia_objetivo': 3.0},
+}
+
+# Adaptación de la tasa a la latencia
+FACTOR_MINIMO = 0.1
+REDUCCION = 0.7
+AUMENTO = 0.05
+PESO_LATENCIA = 0.3  # Peso de la última observación en la media móvil
+
+
+class LimitadorCompartido:
+    """
+    Token buckets por host y acción, persistidos en archivos con bloqueo
+    para que los compartan todos los procesos que usan la misma carpeta.
+    """
+
+    def __init__(self, directorio=None, limites=None):
+        """
+        Args:
+            directorio (str, opcional): Carpeta de los archivos de estado.
+                                        Si es None, usa `.siea/limites`
+            limites (dict, opcional): Límites por acción (por defecto LIMITES)
+        """
+        self.directorio = directorio or os.path.join(DIRECTORIO_ESTADO, 'limites')
+        os.makedirs(self.directorio, exist_ok=True)
+        self.limites = {**LIMITES, **(limites or {})}
+        self._bloqueos = {}
+
+    def _archivos(self, host):
+        """Ruta del estado de un host y su FileLock (se reutiliza el objeto)."""
+        from filelock import FileLock
+
+        ruta = os.path.join(self.directorio, f"{host.replace(':', '_')}.json")
+        if ruta not in self._bloqueos:
+            self._bloqueos[ruta] = FileLock(f"{ruta}.lock")
+        return ruta, self._bloqueos[ruta]
+
+    def adquirir(self, accion, host=HOST_PORTAL, costo=1.0):
+        """
+        Espera hasta que haya `costo` tokens para la acción y los consume.
+
+        Args:
+            accion (str): Tipo de acción ('carga_pagina', 'datos')
+            host (str): Host al que va dirigida la acción
+            costo (float): Tokens que consume la acción
+
+        Returns:
+            float: Segundos que se esperó
+        """
+        from tiempos import dormir
+
+        limite = self.limites[accion]
+        ruta, bloqueo = self._archivos(host)
+        esperado = 0.0
+
+        while True:
+            with bloqueo:
+                estado = cargar_json(ruta, {})
+                # Solo las acciones que llegan al servidor se adaptan a su latencia
+                factor = 1.0
+                if limite.get('latencia_objetivo') is not None:
+                    factor = estado.get('_adaptacion', {}).get('factor', 1.0)
+                tasa = limite['tasa'] * factor
+                ahora = time.time()
+
+                cubo = estado.setdefault(accion, {'tokens': limite['rafaga'], 'ultimo': ahora})
+                cubo['tokens'] = min(limite['rafaga'], cubo['tokens'] + (ahora - cubo['ultimo']) * tasa)
+                cubo['ultimo'] = ahora
+
+                if cubo['tokens'] >= costo:
+                    cubo['tokens'] -= costo
+                    espera = 0.0
+                else:
+                    espera = (costo - cubo['tokens']) / tasa
+                guardar_json(ruta, estado)
+
+            if espera == 0.0:
+                return esperado
+            # Esperar fuera del bloqueo para no frenar a los demás procesos
+            dormir(espera)
+            esperado += espera
+
+    def observar_latencia(self, accion, segundos, host=HOST_PORTAL):
+        """
+        Registra la latencia de una acción y ajusta el factor de tasa del host.
+
+        Args:
+            accion (str): Tipo de acción
+            segundos (float): Duración observada
+            host (str): Host de la acción
+
+        Returns:
+            float: Nuevo factor de tasa (entre FACTOR_MINIMO y 1)
+        """
+        objetivo = self.limites[accion].get('latencia_objetivo')
+        ruta, bloqueo = self._archivos(host)
+
+        with bloqueo:
+            estado = cargar_json(ruta, {})
+            adaptacion = estado.setdefault('_adaptacion', {'factor': 1.0, 'latencias': {}})
+            previa = adaptacion['latencias'].get(accion, segundos)
+            media = (1 - PESO_LATENCIA) * previa + PESO_LATENCIA * segundos
+            adaptacion['latencias'][accion] = media
+
+            if objetivo is not None:
+                if media > objetivo:
+                    adaptacion['factor'] = max(FACTOR_MINIMO, adaptacion['factor'] * REDUCCION)
+                else:
+                    adaptacion['factor'] = min(1.0, adaptacion['factor'] + AUMENTO)
+            guardar_json(ruta, estado)
+            return adaptacion['factor']
+
+    def estado(self, host=HOST_PORTAL):
+        """
+        Returns:
+            dict: Tokens por acción, factor de tasa y latencias medias del host
+        """
+        ruta, bloqueo = self._archivos(host)
+        with bloqueo:
+            return cargar_json(ruta, {})
+
+
+class _SinLimite:
+    """Limitador que no espera (para pruebas o ejecuciones sin límite)."""
+
+    def adquirir(self, accion, host=HOST_PORTAL, costo=1.0):
+        return 0.0
+
+    def observar_latencia(self, accion, segundos, host=HOST_PORTAL):
+        return 1.0
+
+    def estado(self, host=HOST_PORTAL):
+        return {}
+
+
+_limitador = None
+
+
+def obtener_limitador():
+    """
+    Devuelve el limitador compartido del proceso (se crea la primera vez).
+
+    Returns:
+        LimitadorCompartido: Limitador de tasa
+    """
+    global _limitador
+    if _limitador is None:
+        _limitador = LimitadorCompartido()
+    return _limitador
+
+
+def configurar(activo=True, limites=None):
+    """
+    Reemplaza el limitador del proceso.
+
+    Args:
+        activo (bool): False para no limitar la tasa
+        limites (dict, opcional): Límites por acción que reemplazan a LIMITES
+    """
+    global _limitador
+    _limitador = LimitadorCompartido(limites=limites) if activo else _SinLimite()
+
+
+def esperar_turno(accion, host=HOST_PORTAL, costo=1.0):
+    """Espera un token de la acción sin medir su latencia (p. ej. entrar en una región)."""
+    return obtener_limitador().adquirir(accion, host, costo)
+
+
+@contextmanager
+def limitar(accion, host=HOST_PORTAL):
+    """
+    Espera un token para la acción, ejecuta el bloque y registra su latencia
+    para adaptar la tasa. La latencia se registra también si el bloque falla
+    o vence su plazo: son justo las respuestas lentas ante las que hay que
+    bajar la tasa.
+
+    Args:
+        accion (str): Tipo de acción
+        host (str): Host de la acción
+    """
+    limitador = obtener_limitador()
+    limitador.adquirir(accion, host)
+    inicio = time.monotonic()
+    try:
+        yield
+    finally:
+        limitador.observar_latencia(accion, time.monotonic() - inicio, host)
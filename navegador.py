@@ -0,0 +1,258 @@
+# navegador.py
+"""
+Utilidades de navegación para el portal de calendario de cosechas del SIEA.
+Agrupa los pasos que antes se ejecutaban a mano en el notebook: crear el
+driver, abrir el portal, elegir el cultivo, entrar a una región del mapa y
+regresar al nivel anterior.
+
+Selenium se importa dentro de cada función para que los módulos que solo
+necesitan parsear argumentos (por ejemplo main.py) arranquen rápido.
+"""
+
+from limitador import HOST_PORTAL, esperar_turno, limitar
+from tiempos import ESPERAS, dormir, esperar_hasta, reintentar, reportar_error
+from trazas import span
+
+URL_CALENDARIO = "https://siea.midagri.gob.pe/portal/calendario/#"
+
+
+def crear_driver(headless=False):
+    """
+    Crea un WebDriver de Chrome con la configuración usada en el notebook.
+
+    Args:
+        headless (bool): Si es True, ejecuta el navegador sin interfaz
+
+    Returns:
+        WebDriver: Driver de Selenium inicializado
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--start-maximized")  # Maximizar ventana
+    options.add_argument("--disable-notifications")  # Desactivar notificaciones
+    options.add_argument("--disable-popup-blocking")  # Desactivar bloqueo de popups
+    options.add_argument("--disable-infobars")  # Desactivar infobars
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+
+    return webdriver.Chrome(options=options)
+
+
+def abrir_calendario(driver, url=URL_CALENDARIO):
+    """
+    Abre el portal del calendario de cosechas.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+        url (str): Dirección del portal
+    """
+    from urllib.parse import urlparse
+
+    host = urlparse(url).hostname or HOST_PORTAL
+
+    def cargar():
+        # La latencia de cada carga ajusta la tasa compartida del host
+        with limitar('carga_pagina', host):
+            driver.get(url)
+
+    with span('navegar', accion='abrir_portal'):
+        reintentar(cargar, descripcion="abrir el portal")
+
+
+def seleccionar_cultivo(driver, cultivo):
+    """
+    Escribe el cultivo en el buscador select2 y muestra el mapa de cosechas.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+        cultivo (str): Nombre del cultivo tal como aparece en el portal
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support import expected_conditions as EC
+
+    def escribir_cultivo():
+        esperar_hasta(driver, EC.element_to_be_clickable(
+            (By.CSS_SELECTOR, "span.select2-selection")), ESPERAS['carga_pagina']).click()
+
+        search_box = esperar_hasta(driver, EC.visibility_of_element_located(
+            (By.CSS_SELECTOR, "input.select2-search__field")), ESPERAS['elemento'])
+        search_box.send_keys(cultivo, Keys.RETURN)
+
+    with span('navegar', accion='seleccionar_cultivo', cultivo=cultivo):
+        reintentar(escribir_cultivo, descripcion=f"seleccionar el cultivo {cultivo}")
+        mostrar_cosecha(driver)
+
+
+def mostrar_cosecha(driver):
+    """
+    Hace clic en el botón "Cosecha" para cargar el mapa del cultivo elegido.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    def cargar_mapa():
+        with limitar('datos'):
+            esperar_hasta(driver, EC.element_to_be_clickable(
+                (By.ID, "btnCosecha")), ESPERAS['elemento']).click()
+            esperar_hasta(driver, EC.presence_of_element_located(
+                (By.CSS_SELECTOR, "path.highcharts-point")), ESPERAS['carga_mapa'])
+
+    reintentar(cargar_mapa, descripcion="mostrar cosecha")
+    dormir(ESPERAS['estabilizar_mapa'])
+
+
+def entrar_region(driver, nombre_region, nivel=None):
+    """
+    Busca una región en el mapa por el texto de su tooltip y hace clic en ella
+    para bajar al siguiente nivel (departamento → provincia → distrito).
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+        nombre_region (str): Nombre de la región tal como aparece en el tooltip
+        nivel (str, opcional): Nivel de la región ('departamento', 'provincia'
+                               o 'distrito'), para compararla con el nomenclátor
+
+    Returns:
+        bool: True si se encontró y se hizo clic en la región
+    """
+    with span('bajar', region=nombre_region) as atributos:
+        atributos['encontrada'] = _entrar_region(driver, nombre_region, nivel)
+        return atributos['encontrada']
+
+
+def _entrar_region(driver, nombre_region, nivel=None):
+    """Implementación de entrar_region (ver su documentación)."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.action_chains import ActionChains
+    from indice_mapa import obtener_indice
+    from nomenclator import coincide
+
+    dormir(ESPERAS['estabilizar_mapa'])
+
+    # Entrar en una región pide al servidor los datos del nivel siguiente
+    esperar_turno('datos')
+
+    # Búsqueda directa en el índice de la vista actual
+    if obtener_indice(driver).click(nombre_region):
+        dormir(ESPERAS['tras_click'])
+        return True
+
+    # Respaldo: recorrer las regiones comparando el texto del tooltip con el
+    # nomenclátor (por subcadena, 'Ica' coincidía con 'Huancavelica')
+    action = ActionChains(driver)
+    regiones = driver.find_elements(By.CSS_SELECTOR, "path.highcharts-point")
+
+    for region in regiones:
+        try:
+            action.move_to_element(region).perform()
+            tooltip = driver.find_element(By.CSS_SELECTOR, ".highcharts-tooltip")
+
+            if coincide(nombre_region, tooltip.text, nivel=nivel):
+                hacer_click_elemento(driver, region, action)
+                dormir(ESPERAS['tras_click'])
+                return True
+        except Exception as e:
+            reportar_error(e, f"buscar la región {nombre_region}")
+            continue
+
+    print(f"No se encontró la región '{nombre_region}' en el mapa")
+    return False
+
+
+def hacer_click_elemento(driver, elemento, action=None, estrategias_extra=None):
+    """
+    Hace clic en un elemento del mapa probando los métodos disponibles
+    (clic directo, ActionChains y MouseEvent sintético) en el orden que
+    históricamente mejor ha funcionado.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+        elemento: Elemento del mapa en el que hacer clic
+        action: ActionChains reutilizable (opcional)
+        estrategias_extra (list, opcional): Tuplas (nombre, función) adicionales,
+                                            p. ej. el clic por la API de Highcharts
+
+    Returns:
+        bool: True si alguno de los métodos funcionó
+    """
+    from selenium.webdriver.common.action_chains import ActionChains
+    from estrategias import obtener_registro
+
+    action = action or ActionChains(driver)
+
+    estrategias = [
+        ("click_directo", lambda: elemento.click()),
+        ("click_actionchains", lambda: action.click(elemento).perform()),
+        ("click_mouseevent", lambda: driver.execute_script("""
+            arguments[0].dispatchEvent(new MouseEvent('click', {
+                bubbles: true,
+                cancelable: true,
+                view: window
+            }));
+        """, elemento)),
+    ] + list(estrategias_extra or [])
+
+    nombre, _ = obtener_registro().ejecutar("click_mapa", estrategias)
+    if nombre:
+        print(f"Clic exitoso con {nombre}")
+    return nombre is not None
+
+
+def regresar(driver):
+    """
+    Hace clic en el botón "Regresar" del mapa para volver al nivel anterior.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support import expected_conditions as EC
+
+    def click_regresar():
+        regresar_button = esperar_hasta(driver, EC.element_to_be_clickable(
+            (By.CSS_SELECTOR, ".highcharts-button-box")), ESPERAS['elemento'])
+        ActionChains(driver).move_to_element(regresar_button).click().perform()
+
+    def regresar_limitado():
+        with limitar('datos'):
+            click_regresar()
+
+    with span('bajar', accion='regresar'):
+        reintentar(regresar_limitado, descripcion="regresar")
+        dormir(ESPERAS['estabilizar_mapa'])
+
+
+def nombres_regiones_visibles(driver):
+    """
+    Devuelve los nombres de las regiones del mapa actual leyendo la serie de
+    Highcharts, sin necesidad de pasar el cursor por cada una.
+
+    Args:
+        driver: WebDriver de Selenium inicializado
+
+    Returns:
+        list: Nombres de las regiones del mapa (vacía si no se pudo leer)
+    """
+    nombres = driver.execute_script("""
+        if (!window.Highcharts) return [];
+        const charts = Highcharts.charts.filter(c => c && c.series && c.series.length);
+        const nombres = [];
+        for (const chart of charts) {
+            for (const serie of chart.series) {
+                if (serie.type !== 'map') continue;
+                for (const punto of serie.points) {
+                    if (punto.name) nombres.push(punto.name);
+                }
+            }
+        }
+        return nombres;
+    """)
+    return nombres or []
@@ -0,0 +1,358 @@
+# nomenclator.py
+"""
+Nomenclátor de ubigeos: departamentos, provincias y distritos del Perú con
+su código INEI y un índice de nombres para resolver textos a códigos.
+
+Los nombres llegan de fuentes distintas (tooltips del mapa, argumentos del
+usuario, Lista_departamentos.xlsx) y se comparaban como cadenas, a veces
+con `nombre in texto`, que confunde "San Juan" con "San Juan Bautista" y
+falla con tildes o erratas. Aquí cada texto se resuelve a un ubigeo
+('15' Lima, '1508' Huaura, '150801' Huacho), que sirve de clave estable
+para búsquedas, uniones y cachés.
+
+El índice tiene dos partes:
+
+- exacto: nombre normalizado (ver normalizacion.py) → ubigeos; una
+  búsqueda es una consulta a un diccionario;
+- trigramas: para los textos que no coinciden exactamente, cada nombre se
+  descompone en trigramas de caracteres y los candidatos se puntúan con el
+  coeficiente de Dice sobre los trigramas que comparten.
+
+La lista se lee de Lista_departamentos.xlsx una sola vez y se guarda ya
+procesada en `.siea/nomenclator.json`, que se regenera si cambia el Excel.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from estado import cargar_json, guardar_json, ruta_estado
+from normalizacion import normalizar_nombre
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+RUTA_LISTA = os.path.join(RAIZ, 'Lista_departamentos.xlsx')
+
+# Cambiar al modificar el formato del archivo procesado
+VERSION = 1
+
+NIVELES = ('departamento', 'provincia', 'distrito')
+# Dígitos del ubigeo de cada nivel
+DIGITOS = {'departamento': 2, 'provincia': 4, 'distrito': 6}
+
+# Puntaje mínimo (Dice sobre trigramas) para aceptar una coincidencia aproximada
+UMBRAL = 0.6
+
+# Nombres alternativos frecuentes que el índice de trigramas no alcanza
+ALIAS = {'Cuzco': '08'}
+
+# Prefijos de los títulos del portal ("DIST.: Huacho", "PROV.: Huaura")
+_PREFIJOS = ('departamento', 'dpto', 'dep', 'provincia', 'prov', 'distrito', 'dist')
+
+Lugar = namedtuple('Lugar', ['ubigeo', 'nivel', 'nombre', 'padre'])
+
+
+def trigramas(clave):
+    """
+    Args:
+        clave (str): Nombre normalizado
+
+    Returns:
+        set: Trigramas de la clave con espacios de relleno en los extremos
+    """
+    relleno = f"  {clave} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def nombre_de_texto(texto):
+    """
+    Extrae el nombre de región de un texto del portal: la primera línea de
+    un tooltip, sin el prefijo de nivel ni los valores tras los dos puntos.
+
+    Ejemplos: "DIST.: Huacho" → "huacho", "Lima\\nProducción: 12" → "lima"
+
+    Args:
+        texto (str): Texto del tooltip, título o entrada del usuario
+
+    Returns:
+        str: Nombre normalizado
+    """
+    if not texto or not str(texto).strip():
+        return ""
+    partes = str(texto).strip().splitlines()[0].split(':')
+    if len(partes) > 1 and normalizar_nombre(partes[0]) in _PREFIJOS:
+        partes = partes[1:]
+    return normalizar_nombre(partes[0])
+
+
+def _nombre_visible(nombre):
+    """Nombre para mostrar: los que vienen en mayúsculas se pasan a tipo título."""
+    nombre = nombre.strip()
+    return nombre.title() if nombre.isupper() else nombre
+
+
+def leer_lista(ruta=RUTA_LISTA):
+    """
+    Lee los ubigeos de Lista_departamentos.xlsx.
+
+    Args:
+        ruta (str): Ruta del Excel
+
+    Returns:
+        dict: ubigeo → [nivel, nombre, padre]
+    """
+    import pandas as pd
+
+    df = pd.read_excel(ruta, dtype=str).dropna(subset=['IDDIST'])
+    df['IDDIST'] = df['IDDIST'].str.strip().str.zfill(6)
+
+    lugares = {}
+    for fila in df.itertuples(index=False):
+        codigo = fila.IDDIST
+        departamento = fila.DEP_TOOLTIP if isinstance(fila.DEP_TOOLTIP, str) else fila.NOMBDEP.title()
+        provincia = fila.PROV_TOOLTIP if isinstance(fila.PROV_TOOLTIP, str) else fila.NOMBPROV.title()
+        lugares.setdefault(codigo[:2], ['departamento', _nombre_visible(departamento), None])
+        lugares.setdefault(codigo[:4], ['provincia', _nombre_visible(provincia), codigo[:2]])
+        lugares[codigo] = ['distrito', _nombre_visible(fila.NOMBDIST), codigo[:4]]
+    return lugares
+
+
+def _origen(ruta):
+    """Identifica la versión del Excel de origen (tamaño y fecha de modificación)."""
+    info = os.stat(ruta)
+    return {'ruta': os.path.abspath(ruta), 'tamano': info.st_size, 'modificado': info.st_mtime}
+
+
+def cargar_lugares(ruta=RUTA_LISTA):
+    """
+    Devuelve los ubigeos desde el archivo procesado, o lee el Excel y lo
+    procesa si cambió.
+
+    Args:
+        ruta (str): Ruta de Lista_departamentos.xlsx
+
+    Returns:
+        dict: ubigeo → [nivel, nombre, padre]
+    """
+    cache = ruta_estado('nomenclator.json')
+    origen = _origen(ruta)
+    datos = cargar_json(cache, {})
+    if datos.get('version') == VERSION and datos.get('origen') == origen:
+        return datos['lugares']
+
+    lugares = leer_lista(ruta)
+    guardar_json(cache, {'version': VERSION, 'origen': origen, 'lugares': lugares})
+    return lugares
+
+
+class Nomenclator:
+    """
+    Ubigeos con un índice exacto y otro de trigramas sobre sus nombres.
+    """
+
+    def __init__(self, lugares, alias=None):
+        """
+        Args:
+            lugares (dict): ubigeo → (nivel, nombre, padre) (ver cargar_lugares)
+            alias (dict, opcional): nombre alternativo → ubigeo
+        """
+        self.lugares = {codigo: Lugar(codigo, *datos) for codigo, datos in lugares.items()}
+
+        # Índice exacto: nombre normalizado → ubigeos
+        self._exacto = {}
+        for lugar in self.lugares.values():
+            self._exacto.setdefault(normalizar_nombre(lugar.nombre), []).append(lugar.ubigeo)
+        for nombre, codigo in (alias or {}).items():
+            self._exacto.setdefault(normalizar_nombre(nombre), []).append(codigo)
+
+        # Índice de trigramas: trigrama → posiciones de las claves que lo contienen
+        self._claves = list(self._exacto)
+        self._tamanos = []
+        self._trigramas = {}
+        for posicion, clave in enumerate(self._claves):
+            propios = trigramas(clave)
+            self._tamanos.append(len(propios))
+            for trigrama in propios:
+                self._trigramas.setdefault(trigrama, []).append(posicion)
+
+        self._resueltos = {}
+
+    def __len__(self):
+        return len(self.lugares)
+
+    def __getitem__(self, ubigeo):
+        return self.lugares[ubigeo]
+
+    def _filtrar(self, codigos, nivel, padre):
+        """Ubigeos del nivel pedido y dentro del ubigeo padre."""
+        return [c for c in codigos
+                if (nivel is None or self.lugares[c].nivel == nivel)
+                and (padre is None or (c.startswith(padre) and c != padre))]
+
+    def buscar(self, texto, nivel=None, padre=None, limite=5, umbral=UMBRAL):
+        """
+        Busca los lugares cuyo nombre se parece al texto.
+
+        Args:
+            texto (str): Nombre, tooltip o título del portal
+            nivel (str, opcional): 'departamento', 'provincia' o 'distrito'
+            padre (str, opcional): Ubigeo que debe contener al resultado (p. ej. '15')
+            limite (int): Número máximo de resultados
+            umbral (float): Puntaje mínimo de las coincidencias aproximadas
+
+        Returns:
+            list: Pares (Lugar, puntaje) de mayor a menor puntaje; las
+                  coincidencias exactas tienen puntaje 1.0
+        """
+        clave = nombre_de_texto(texto)
+        if not clave:
+            return []
+
+        exactos = self._filtrar(self._exacto.get(clave, []), nivel, padre)
+        if exactos:
+            return [(self.lugares[c], 1.0) for c in exactos[:limite]]
+
+        # Trigramas compartidos con cada clave del índice
+        propios = trigramas(clave)
+        comunes = {}
+        for trigrama in propios:
+            for posicion in self._trigramas.get(trigrama, ()):
+                comunes[posicion] = comunes.get(posicion, 0) + 1
+
+        candidatos = []
+        for posicion, compartidos in comunes.items():
+            puntaje = 2 * compartidos / (len(propios) + self._tamanos[posicion])
+            if puntaje >= umbral:
+                for codigo in self._filtrar(self._exacto[self._claves[posicion]], nivel, padre):
+                    candidatos.append((self.lugares[codigo], puntaje))
+
+        candidatos.sort(key=lambda par: (-par[1], NIVELES.index(par[0].nivel), par[0].ubigeo))
+        return [(lugar, round(puntaje, 3)) for lugar, puntaje in candidatos[:limite]]
+
+    def resolver(self, texto, nivel=None, padre=None, umbral=UMBRAL):
+        """
+        Resuelve un texto al lugar más parecido. Los resultados se guardan
+        en memoria, así que repetir un texto cuesta una consulta a un diccionario.
+
+        Args:
+            texto (str): Nombre, tooltip o título del portal
+            nivel (str, opcional): 'departamento', 'provincia' o 'distrito'
+            padre (str, opcional): Ubigeo que debe contener al resultado
+            umbral (float): Puntaje mínimo de las coincidencias aproximadas
+
+        Returns:
+            Lugar: Lugar encontrado, o None si ninguno supera el umbral
+        """
+        llave = (texto, nivel, padre, umbral)
+        if llave not in self._resueltos:
+            encontrados = self.buscar(texto, nivel, padre, limite=1, umbral=umbral)
+            self._resueltos[llave] = encontrados[0][0] if encontrados else None
+        return self._resueltos[llave]
+
+    def ubigeo(self, texto, nivel=None, padre=None):
+        """
+        Returns:
+            str: Ubigeo del lugar más parecido al texto, o None
+        """
+        lugar = self.resolver(texto, nivel, padre)
+        return lugar.ubigeo if lugar else None
+
+    def coincide(self, nombre, texto, nivel=None, padre=None):
+        """
+        Indica si un texto del portal se refiere al lugar buscado. Reemplaza a
+        `nombre.lower() in texto.lower()`: compara los ubigeos candidatos de
+        ambos, así que un nombre no coincide con otro que lo contiene. Si el
+        texto no se resuelve a ningún lugar (p. ej. un título con más datos),
+        se busca el nombre normalizado como palabras completas del texto.
+
+        Args:
+            nombre (str): Nombre del lugar buscado
+            texto (str): Tooltip, título o etiqueta del portal
+            nivel (str, opcional): Nivel de ambos lugares
+            padre (str, opcional): Ubigeo que debe contener a ambos
+
+        Returns:
+            bool: True si algún ubigeo del nombre es también del texto
+        """
+        clave = nombre_de_texto(nombre)
+        if not clave:
+            return False
+        buscados = {lugar.ubigeo for lugar, _ in self.buscar(nombre, nivel, padre, limite=20)}
+        candidatos = self.buscar(texto, nivel, padre, limite=20)
+        if buscados and candidatos:
+            return any(lugar.ubigeo in buscados for lugar, _ in candidatos)
+        return re.search(rf"\b{re.escape(clave)}\b", normalizar_nombre(texto)) is not None
+
+    def hijos(self, ubigeo=None):
+        """
+        Args:
+            ubigeo (str, opcional): Ubigeo padre; None para los departamentos
+
+        Returns:
+            list: Lugares cuyo padre es el ubigeo, por código
+        """
+        return sorted((lugar for lugar in self.lugares.values() if lugar.padre == ubigeo),
+                      key=lambda lugar: lugar.ubigeo)
+
+    def ruta(self, ubigeo):
+        """
+        Returns:
+            list: Nombres desde el departamento hasta el lugar, p. ej. ['Lima', 'Huaura']
+        """
+        nombres = []
+        while ubigeo:
+            lugar = self.lugares[ubigeo]
+            nombres.insert(0, lugar.nombre)
+            ubigeo = lugar.padre
+        return nombres
+
+    def agregar_ubigeo(self, df, columna, nivel=None, columna_padre=None, destino='ubigeo'):
+        """
+        Añade a un DataFrame la columna con el ubigeo de cada nombre,
+        resolviendo una sola vez cada valor distinto.
+
+        Args:
+            df (DataFrame): Tabla con los nombres
+            columna (str): Columna con el nombre del lugar
+            nivel (str, opcional): Nivel de los lugares de la columna
+            columna_padre (str, opcional): Columna con el nombre del lugar padre
+                                           (p. ej. el departamento de una provincia)
+            destino (str): Nombre de la columna nueva
+
+        Returns:
+            DataFrame: Copia de la tabla con la columna añadida
+        """
+        df = df.copy()
+        if columna_padre is None:
+            codigos = {valor: self.ubigeo(valor, nivel) for valor in df[columna].dropna().unique()}
+            df[destino] = df[columna].map(codigos)
+            return df
+
+        nivel_padre = NIVELES[NIVELES.index(nivel) - 1] if nivel in NIVELES[1:] else None
+        pares = df[[columna_padre, columna]].drop_duplicates().itertuples(index=False, name=None)
+        codigos = {}
+        for valor_padre, valor in pares:
+            padre = self.ubigeo(valor_padre, nivel_padre)
+            codigos[(valor_padre, valor)] = self.ubigeo(valor, nivel, padre) if padre else None
+        df[destino] = [codigos.get(par) for par in zip(df[columna_padre], df[columna])]
+        return df
+
+
+_nomenclator = None
+
+
+def obtener_nomenclator():
+    """
+    Devuelve el nomenclátor del proceso (se carga la primera vez).
+
+    Returns:
+        Nomenclator: Ubigeos de Lista_departamentos.xlsx con su índice
+    """
+    global _nomenclator
+    if _nomenclator is None:
+        _nomenclator = Nomenclator(cargar_lugares(), ALIAS)
+    return _nomenclator
+
+
+def coincide(nombre, texto, nivel=None, padre=None):
+    """Nomenclator.coincide con el nomenclátor del proceso."""
+    return obtener_nomenclator().coincide(nombre, texto, nivel, padre)
@@ -0,0 +1,46 @@
+# normalizacion.py
+"""
+Normalización de nombres de regiones para comparar textos de tooltips,
+entradas del usuario y listas de referencia sin depender de mayúsculas,
+tildes, numeración ni espacios.
+"""
+
+import re
+import unicodedata
+
+
+def normalizar_nombre(texto):
+    """
+    Normaliza un nombre de región.
+
+    Ejemplo: "  1. Áncash " → "ancash"
+
+    Args:
+        texto (str): Nombre tal como aparece en la fuente
+
+    Returns:
+        str: Nombre en minúsculas, sin tildes, numeración ni signos
+    """
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'^\s*\d+\s*[.)-]\s*', '', texto)  # Numeración "1. Bellavista"
+    texto = re.sub(r'[^a-z0-9]+', ' ', texto)
+    return texto.strip()
+
+
+def nombre_de_tooltip(texto):
+    """
+    Extrae el nombre de la región de un tooltip (primera línea del texto).
+
+    Args:
+        texto (str): Texto completo del tooltip
+
+    Returns:
+        str: Nombre normalizado de la región
+    """
+    if not texto:
+        return ""
+    primera_linea = texto.strip().splitlines()[0]
+    return normalizar_nombre(primera_linea.split(':')[0])
@@ -0,0 +1,197 @@
+# raster_mapa.py
+"""
+Raster de etiquetas por vista del mapa.
+
+La geometría de las regiones en los mapas de departamentos y provincias es
+la misma para todos los cultivos; solo cambian los valores y los colores.
+Este módulo guarda el resultado de un escaneo como una matriz compacta de
+NumPy (id de región por celda) y la persiste comprimida por longitud de
+racha (run-length), identificada por la vista del mapa, el tamaño de la
+ventana y la resolución de la cuadrícula. Los escaneos posteriores para
+otros cultivos reutilizan el raster y pasan el cursor por un solo punto de
+cada región conocida.
+"""
+
+import json
+import re
+
+import numpy as np
+
+from estado import ruta_estado
+
+SIN_VISITAR = -1
+VACIO = 0
+
+
+class RasterEtiquetas:
+    """
+    Matriz (filas × columnas) con el id de región de cada punto de la cuadrícula.
+    -1 = punto no visitado, 0 = sin región, k > 0 = región `nombres[k - 1]`.
+    """
+
+    def __init__(self, filas, columnas):
+        """
+        Args:
+            filas (int): Número de filas de puntos
+            columnas (int): Número de columnas de puntos
+        """
+        self.etiquetas = np.full((filas, columnas), SIN_VISITAR, dtype=np.int16)
+        self.nombres = []
+        self._ids = {}
+
+    @property
+    def forma(self):
+        """Tupla (filas, columnas) del raster."""
+        return self.etiquetas.shape
+
+    @property
+    def visitados(self):
+        """Máscara booleana de los puntos visitados."""
+        return self.etiquetas != SIN_VISITAR
+
+    @property
+    def completo(self):
+        """True si se visitaron todos los puntos."""
+        return bool(self.visitados.all())
+
+    def id_region(self, nombre):
+        """
+        Devuelve el id de una región, asignándole uno nuevo si no existe.
+
+        Args:
+            nombre (str): Nombre de la región
+
+        Returns:
+            int: Id de la región (>= 1)
+        """
+        if nombre not in self._ids:
+            self.nombres.append(nombre)
+            self._ids[nombre] = len(self.nombres)
+        return self._ids[nombre]
+
+    def marcar(self, fila, columna, nombre=None):
+        """
+        Registra el resultado de visitar un punto.
+
+        Args:
+            fila (int): Fila del punto
+            columna (int): Columna del punto
+            nombre (str, opcional): Región encontrada, o None si no había ninguna
+        """
+        self.etiquetas[fila, columna] = self.id_region(nombre) if nombre else VACIO
+
+    def nombre_en(self, fila, columna):
+        """
+        Returns:
+            str: Región del punto, o None si no tiene (o no fue visitado)
+        """
+        valor = int(self.etiquetas[fila, columna])
+        return self.nombres[valor - 1] if valor > VACIO else None
+
+    def como_diccionario(self):
+        """
+        Returns:
+            dict: (fila, columna) → región o None, para los puntos visitados
+        """
+        filas, columnas = np.nonzero(self.visitados)
+        return {(int(f), int(c)): self.nombre_en(f, c) for f, c in zip(filas, columnas)}
+
+    def puntos_representativos(self):
+        """
+        Elige un punto por región: el punto etiquetado más cercano al centro
+        de masa de la región (queda dentro de la región aunque no sea convexa).
+
+        Returns:
+            dict: región → (fila, columna)
+        """
+        representativos = {}
+        filas, columnas = np.nonzero(self.etiquetas > VACIO)
+        valores = self.etiquetas[filas, columnas]
+
+        for id_region in np.unique(valores):
+            mascara = valores == id_region
+            f, c = filas[mascara], columnas[mascara]
+            distancia = (f - f.mean()) ** 2 + (c - c.mean()) ** 2
+            k = int(np.argmin(distancia))
+            representativos[self.nombres[id_region - 1]] = (int(f[k]), int(c[k]))
+
+        return representativos
+
+    def guardar(self, ruta):
+        """
+        Guarda el raster comprimido por longitud de racha.
+
+        Args:
+            ruta (str): Archivo .npz de destino
+        """
+        plano = self.etiquetas.ravel()
+        inicios = np.concatenate(([0], np.flatnonzero(np.diff(plano)) + 1))
+        longitudes = np.diff(np.concatenate((inicios, [plano.size])))
+
+        np.savez_compressed(
+            ruta,
+            forma=np.array(self.forma, dtype=np.int32),
+            valores=plano[inicios],
+            longitudes=longitudes.astype(np.int32),
+            nombres=np.array(json.dumps(self.nombres, ensure_ascii=False)),
+        )
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Carga un raster guardado con `guardar`.
+
+        Args:
+            ruta (str): Archivo .npz
+
+        Returns:
+            RasterEtiquetas: Raster reconstruido
+        """
+        with np.load(ruta) as datos:
+            filas, columnas = (int(v) for v in datos['forma'])
+            raster = cls(filas, columnas)
+            raster.etiquetas = np.repeat(datos['valores'], datos['longitudes']).astype(np.int16).reshape(filas, columnas)
+            for nombre in json.loads(str(datos['nombres'])):
+                raster.id_region(nombre)
+        return raster
+
+
+def clave_vista(vista, ancho, alto, filas, columnas):
+    """
+    Construye la clave de un raster: vista del mapa, tamaño de ventana y cuadrícula.
+
+    Args:
+        vista (str): Nivel del mapa, p. ej. 'departamento' o 'provincia/Lima'
+        ancho (int): Ancho de la ventana en píxeles
+        alto (int): Alto de la ventana en píxeles
+        filas (int): Filas de puntos
+        columnas (int): Columnas de puntos
+
+    Returns:
+        str: Clave apta para nombre de archivo
+    """
+    vista_segura = re.sub(r'[^\w-]+', '_', vista).strip('_')
+    return f"{vista_segura}_{int(ancho)}x{int(alto)}_{filas}x{columnas}"
+
+
+def ruta_raster(clave):
+    """Ruta del archivo de un raster dentro de la carpeta de estado."""
+    return ruta_estado('rasters', f"{clave}.npz")
+
+
+def cargar_raster(clave):
+    """
+    Carga el raster guardado para una clave.
+
+    Returns:
+        RasterEtiquetas: Raster guardado, o None si no existe
+    """
+    try:
+        return RasterEtiquetas.cargar(ruta_raster(clave))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def guardar_raster(clave, raster):
+    """Guarda el raster de una clave en la carpeta de estado."""
+    raster.guardar(ruta_raster(clave))
@@ -0,0 +1,251 @@
+# runtime_pagina.py
+"""
+Biblioteca de funciones auxiliares inyectada una vez en cada página.
+
+Los escaneos del mapa ejecutan miles de scripts, y cada `execute_script`
+enviaba el cuerpo completo del script (el de extraer_areas_habilitadas
+ocupa unos 2 KB) para que el motor de JavaScript de la página lo volviera
+a analizar. Aquí las funciones se definen una sola vez en
+`window.__siea` y las llamadas posteriores envían solo un script corto y
+constante con el nombre de la función y sus argumentos.
+
+La biblioteca lleva un número de versión. Cada llamada comprueba que
+`window.__siea` existe y tiene la versión esperada; si no (la página se
+recargó, se navegó a otra o se cambió el código), se inyecta de nuevo y se
+repite la llamada. En Chrome, además, se registra con
+`Page.addScriptToEvaluateOnNewDocument` para que cada documento nuevo la
+tenga desde el principio.
+
+Funciones disponibles (ver `llamar`):
+    hover(x, y, todos)       Eventos de ratón en (x, y); devuelve la región bajo el cursor
+    tooltip(selectores)      Texto del primer tooltip con contenido
+    area()                   Área activa bajo el cursor (tooltip, title, data-name o texto cercano)
+    etiquetaCercana(x, y, radio)  Texto de la etiqueta más cercana (índice por cubetas)
+    invalidarEtiquetas()     Descarta el índice de etiquetas
+    rects(elementos, selector)  Rectángulos [x_min, y_min, x_max, y_max]
+    centro(elemento)         Centro del elemento en la ventana (lo desplaza a la vista)
+    registrar()              Empieza a registrar los mousemove reales y su región
+    movimientos()            Devuelve y vacía los movimientos registrados [x, y, región]
+"""
+
+import weakref
+
+from trazas import contar
+
+# Cambiar al modificar _JS_RUNTIME: las páginas con otra versión la reciben de nuevo
+VERSION = 3
+
+_JS_RUNTIME = """
+(function () {
+    if (window.__siea && window.__siea.v === %(version)d) return;
+    var S = {v: %(version)d};
+
+    // Región de Highcharts (element.point) de un elemento o de sus ancestros
+    function region(elemento) {
+        var objetivo = elemento;
+        while (objetivo && !objetivo.point) objetivo = objetivo.parentNode;
+        if (!objetivo || !objetivo.point) return null;
+        var punto = objetivo.point;
+        return String(punto.name != null ? punto.name : (punto.id != null ? punto.id : punto.index));
+    }
+
+    S.hover = function (x, y, todos) {
+        var elemento = document.elementFromPoint(x, y);
+        if (!elemento) return null;
+        var tipos = todos ? ['mousemove', 'mouseover', 'mouseenter'] : ['mousemove'];
+        for (var i = 0; i < tipos.length; i++) {
+            elemento.dispatchEvent(new MouseEvent(tipos[i], {
+                view: window, bubbles: true, cancelable: true, clientX: x, clientY: y
+            }));
+        }
+        return region(elemento);
+    };
+
+    S.tooltip = function (selectores) {
+        for (var i = 0; i < selectores.length; i++) {
+            var elementos = document.querySelectorAll(selectores[i]);
+            for (var j = 0; j < elementos.length; j++) {
+                var texto = (elementos[j].textContent || '').trim();
+                if (texto) return texto;
+            }
+        }
+        return null;
+    };
+
+    S.area = function () {
+        // Buscar tooltips visibles
+        var tooltips = document.querySelectorAll('.highcharts-tooltip, .tooltip, [class*="tooltip"]');
+        for (var i = 0; i < tooltips.length; i++) {
+            var tooltip = tooltips[i];
+            if (tooltip.style.visibility !== 'hidden' && tooltip.style.display !== 'none') {
+                return {texto: tooltip.textContent.trim(), tipo: 'tooltip'};
+            }
+        }
+
+        // Buscar elementos con hover activo
+        var elementosHover = document.querySelectorAll(':hover');
+        for (var k = 0; k < elementosHover.length; k++) {
+            var elem = elementosHover[k];
+            var etiqueta = elem.tagName.toLowerCase();
+            if (etiqueta !== 'path' && etiqueta !== 'polygon') continue;
+
+            var title = elem.querySelector('title');
+            if (title) return {texto: title.textContent.trim(), tipo: 'title'};
+
+            var dataName = elem.getAttribute('data-name');
+            if (dataName) return {texto: dataName, tipo: 'data-name'};
+
+            // Buscar la etiqueta más cercana en el índice
+            var bbox = elem.getBBox();
+            var texto = S.etiquetaCercana(bbox.x + bbox.width / 2, bbox.y + bbox.height / 2, RADIO_ETIQUETA);
+            if (texto) return {texto: texto, tipo: 'texto-cercano'};
+        }
+        return null;
+    };
+
+    // Índice de etiquetas: centros de los <text> del SVG en cubetas de
+    // RADIO_ETIQUETA × RADIO_ETIQUETA. Se construye una vez por dibujo del
+    // mapa (getBBox una sola vez por etiqueta) y una búsqueda solo mira las
+    // 3 × 3 cubetas vecinas. Se invalida al redibujar un gráfico o si cambia
+    // el número de etiquetas.
+    var RADIO_ETIQUETA = 50;
+    var textosSvg = document.getElementsByTagName('text');  // Colección viva
+    var indice = null;
+    var vigilando = false;
+
+    function invalidar() { indice = null; }
+
+    function vigilarRedibujos() {
+        if (vigilando || !window.Highcharts || !Highcharts.addEvent || !Highcharts.Chart) return;
+        Highcharts.addEvent(Highcharts.Chart, 'redraw', invalidar);
+        vigilando = true;
+    }
+
+    function construirIndice() {
+        vigilarRedibujos();
+        var cubetas = new Map();
+        for (var i = 0; i < textosSvg.length; i++) {
+            var texto = (textosSvg[i].textContent || '').trim();
+            if (!texto || !textosSvg[i].getBBox) continue;
+            var caja = textosSvg[i].getBBox();
+            var x = caja.x + caja.width / 2, y = caja.y + caja.height / 2;
+            var clave = Math.floor(x / RADIO_ETIQUETA) + ',' + Math.floor(y / RADIO_ETIQUETA);
+            if (!cubetas.has(clave)) cubetas.set(clave, []);
+            cubetas.get(clave).push([x, y, texto]);
+        }
+        indice = {cubetas: cubetas, etiquetas: textosSvg.length};
+    }
+
+    S.etiquetaCercana = function (x, y, radio) {
+        if (!indice || indice.etiquetas !== textosSvg.length) construirIndice();
+        radio = Math.min(radio || RADIO_ETIQUETA, RADIO_ETIQUETA);
+        var cx = Math.floor(x / RADIO_ETIQUETA), cy = Math.floor(y / RADIO_ETIQUETA);
+        var mejor = null, distancia = radio;
+        for (var dx = -1; dx <= 1; dx++) {
+            for (var dy = -1; dy <= 1; dy++) {
+                var cubeta = indice.cubetas.get((cx + dx) + ',' + (cy + dy));
+                if (!cubeta) continue;
+                for (var k = 0; k < cubeta.length; k++) {
+                    var d = Math.sqrt(Math.pow(cubeta[k][0] - x, 2) + Math.pow(cubeta[k][1] - y, 2));
+                    if (d < distancia) { distancia = d; mejor = cubeta[k][2]; }
+                }
+            }
+        }
+        return mejor;
+    };
+
+    S.invalidarEtiquetas = invalidar;
+
+    // Centro de un elemento en la ventana (lo desplaza a la vista si hace falta)
+    S.centro = function (elemento) {
+        var r = elemento.getBoundingClientRect();
+        if (r.top < 0 || r.left < 0 || r.bottom > window.innerHeight || r.right > window.innerWidth) {
+            elemento.scrollIntoView({block: 'center', inline: 'center'});
+            r = elemento.getBoundingClientRect();
+        }
+        return [r.left + r.width / 2, r.top + r.height / 2];
+    };
+
+    // Registro de los mousemove reales (isTrusted) con la región bajo el cursor,
+    // para leer de una vez el resultado de un lote de movimientos
+    var movimientos = null;
+    var registrando = false;
+
+    S.registrar = function () {
+        movimientos = [];
+        if (registrando) return;
+        document.addEventListener('mousemove', function (e) {
+            if (movimientos && e.isTrusted) movimientos.push([e.clientX, e.clientY, region(e.target)]);
+        }, true);
+        registrando = true;
+    };
+
+    S.movimientos = function () {
+        var registrados = movimientos || [];
+        movimientos = null;
+        return registrados;
+    };
+
+    S.rects = function (elementos, selector) {
+        return Array.from(elementos || document.querySelectorAll(selector), function (e) {
+            var r = e.getBoundingClientRect();
+            return [r.left, r.top, r.right, r.bottom];
+        });
+    };
+
+    window.__siea = S;
+})();
+""" % {'version': VERSION}
+
+# Script corto y constante de cada llamada: [1, resultado], o [0] si falta la biblioteca
+_JS_LLAMADA = (
+    "var s = window.__siea; if (!s || s.v !== %d) return [0];"
+    " return [1, s[arguments[0]].apply(null, Array.prototype.slice.call(arguments, 1))];" % VERSION
+)
+
+# Drivers en los que ya se registró la biblioteca para los documentos nuevos
+_REGISTRADOS = weakref.WeakSet()
+
+
+def instalar(driver):
+    """
+    Inyecta la biblioteca en la página actual y, en Chrome, la registra para
+    todos los documentos que se abran después.
+
+    Args:
+        driver: WebDriver de Selenium
+    """
+    if driver not in _REGISTRADOS and hasattr(driver, 'execute_cdp_cmd'):
+        try:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _JS_RUNTIME})
+        except Exception as e:
+            from tiempos import es_fatal
+
+            if es_fatal(e):
+                raise
+            # Sin CDP (otro navegador o un servidor remoto): se reinyecta al llamar
+        _REGISTRADOS.add(driver)
+    driver.execute_script(_JS_RUNTIME)
+    contar('siea_runtime_inyecciones')
+
+
+def llamar(driver, funcion, *argumentos):
+    """
+    Llama a una función de la biblioteca de la página, inyectándola antes
+    si falta o tiene otra versión.
+
+    Args:
+        driver: WebDriver de Selenium
+        funcion (str): Nombre de la función en `window.__siea`
+        *argumentos: Argumentos de la función (serializables o WebElements)
+
+    Returns:
+        Resultado de la función
+    """
+    respuesta = driver.execute_script(_JS_LLAMADA, funcion, *argumentos)
+    if not respuesta or not respuesta[0]:
+        instalar(driver)
+        respuesta = driver.execute_script(_JS_LLAMADA, funcion, *argumentos)
+        if not respuesta or not respuesta[0]:
+            raise RuntimeError("No se pudo inyectar la biblioteca auxiliar en la página")
+    return respuesta[1]
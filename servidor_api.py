@@ -0,0 +1,527 @@
+# servidor_api.py
+"""
+API HTTP de solo lectura sobre los resultados guardados (CSV de `crawl` y
+de `cola exportar`), hecha solo con la librería estándar.
+
+Los equipos que usan los datos leían los CSV y xlsx directamente, cada uno
+con su propio análisis. El servidor los carga una vez y sirve JSON:
+
+    GET /cultivos                              Cultivos con datos
+    GET /regiones[?cultivo=]                   Regiones (con su ubigeo) y sus cultivos
+    GET /calendario?cultivo=[&region=][&mes=]  Filas mensuales de porcentaje y tm
+    GET /resumen[?cultivo=][&region=]          Cuadros de resumen
+    GET /estado                                Archivos cargados y caché
+    GET /metricas                              Métricas en formato Prometheus
+
+`region` admite el nombre (sin importar tildes ni mayúsculas) o el ubigeo
+(ver nomenclator.py).
+
+Las respuestas de todas las consultas por cultivo y región se calculan al
+cargar los datos: el JSON se serializa y se comprime con gzip una sola vez,
+y cada respuesta lleva un ETag (hash del contenido) para que los clientes
+hagan GET condicionales (If-None-Match → 304 sin cuerpo). Las demás
+consultas (p. ej. con `mes`) se calculan al pedirlas, y una caché LRU en
+memoria guarda las más pedidas por su URL exacta, junto con las
+precalculadas, para no volver a analizar la URL.
+
+Los CSV se vuelven a cargar solos si cambian (se revisan cada pocos
+segundos). La recarga corre en un hilo aparte: las filas se agrupan en una
+sola pasada por cultivo y región, las respuestas se construyen desde esos
+grupos y el conjunto nuevo reemplaza al anterior en una sola asignación.
+Cambian los ETag de lo que cambió, y la caché se indexa por número de carga
+para que no sobreviva ninguna respuesta del conjunto anterior.
+"""
+
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from normalizacion import normalizar_nombre
+from tiempos import reportar_error
+from trazas import contar, obtener_trazador
+
+# Columnas posibles del nombre de la región, en orden de preferencia (como en validacion.py)
+COLUMNAS_REGION = ('region', 'nombre', 'provincia', 'departamento')
+
+# Respuesta ya serializada: cuerpo JSON, cuerpo comprimido y ETag
+Respuesta = namedtuple('Respuesta', ['estado', 'cuerpo', 'comprimido', 'etag'])
+
+
+def crear_respuesta(datos, estado=200):
+    """
+    Serializa y comprime una respuesta una sola vez.
+
+    Args:
+        datos: Contenido serializable a JSON
+        estado (int): Código HTTP
+
+    Returns:
+        Respuesta: Cuerpo en JSON UTF-8, comprimido con gzip y su ETag
+    """
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+    return Respuesta(estado, cuerpo, gzip.compress(cuerpo, compresslevel=6, mtime=0), etag)
+
+
+def _valor(texto):
+    """Convierte un valor de CSV en número cuando lo es ('' → None)."""
+    if texto is None or texto == '':
+        return None
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+class CacheLRU:
+    """
+    Caché de respuestas por URL con expulsión del menos usado, segura entre hilos.
+    """
+
+    def __init__(self, capacidad=1024):
+        """
+        Args:
+            capacidad (int): Número máximo de URL guardadas
+        """
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._bloqueo = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """
+        Returns:
+            Respuesta: Respuesta guardada, o None
+        """
+        with self._bloqueo:
+            respuesta = self._datos.get(clave)
+            if respuesta is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return respuesta
+
+    def guardar(self, clave, respuesta):
+        """Guarda una respuesta y expulsa la menos usada si se supera la capacidad."""
+        with self._bloqueo:
+            self._datos[clave] = respuesta
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def vaciar(self):
+        with self._bloqueo:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class ConjuntoDatos:
+    """
+    Resultados de una carga de los CSV: filas, grupos por cultivo y región y
+    respuestas precalculadas. No se modifica después de crearse; al recargar
+    se construye otro y se reemplaza en una sola asignación.
+    """
+
+    def __init__(self, calendario, resumen, firma, generacion):
+        """
+        Args:
+            calendario (list): Filas de los CSV de calendario (con 'ubigeo')
+            resumen (list): Filas de los CSV de resumen (con 'ubigeo')
+            firma (list): Nombre, tamaño y fecha de cada CSV leído
+            generacion (int): Número de carga, parte de la clave de la caché
+        """
+        self.calendario = calendario
+        self.resumen = resumen
+        self.firma = firma
+        self.generacion = generacion
+        self.cargado = time.time()
+
+        # Normalizar una vez por nombre distinto, no por fila en cada consulta
+        self._normalizados = {texto: normalizar_nombre(texto) for fila in calendario + resumen
+                              for texto in (fila['cultivo'], fila['region'], fila.get('mes')) if texto}
+
+        # Filas agrupadas en una sola pasada por (tabla, cultivo, región), donde
+        # cultivo y región pueden ser None (todas) y la región es el nombre
+        # normalizado o el ubigeo. Las filas conservan el orden de los CSV.
+        self._grupos = {}
+        for tabla, filas in (('calendario', calendario), ('resumen', resumen)):
+            for fila in filas:
+                regiones = {None, self._norma(fila['region']), fila['ubigeo']}
+                for cultivo in (self._norma(fila['cultivo']), None):
+                    for region in regiones:
+                        self._grupos.setdefault((tabla, cultivo, region), []).append(fila)
+
+        self.precalculadas = self._precalcular()
+
+    def _norma(self, texto):
+        """Nombre normalizado (de la tabla calculada al cargar si está)."""
+        normalizado = self._normalizados.get(texto)
+        return normalizado if normalizado is not None else normalizar_nombre(texto)
+
+    def filas(self, tabla, cultivo=None, region=None):
+        """
+        Args:
+            tabla (str): 'calendario' o 'resumen'
+            cultivo (str, opcional): Cultivo normalizado
+            region (str, opcional): Región normalizada o ubigeo
+
+        Returns:
+            list: Filas de la tabla que cumplen los filtros
+        """
+        return self._grupos.get((tabla, cultivo, region), [])
+
+    def consultar(self, ruta, parametros):
+        """
+        Calcula la respuesta de una consulta a partir de los grupos.
+
+        Args:
+            ruta (str): '/cultivos', '/regiones', '/calendario' o '/resumen'
+            parametros (dict): Parámetros normalizados (cultivo, region, mes)
+
+        Returns:
+            Datos serializables, o None si la ruta no existe
+        """
+        cultivo = parametros.get('cultivo')
+        region = parametros.get('region')
+
+        if ruta == '/cultivos':
+            conteo = {}
+            for fila in self.calendario + self.resumen:
+                conteo.setdefault(fila['cultivo'], set()).add(fila['region'])
+            return [{'cultivo': c, 'regiones': len(r)} for c, r in sorted(conteo.items())]
+
+        if ruta == '/regiones':
+            regiones = {}
+            for fila in self.filas('calendario', cultivo, region) + self.filas('resumen', cultivo, region):
+                entrada = regiones.setdefault(fila['region'], {'region': fila['region'],
+                                                               'ubigeo': fila['ubigeo'], 'cultivos': set()})
+                entrada['cultivos'].add(fila['cultivo'])
+            return [{**entrada, 'cultivos': sorted(entrada['cultivos'])}
+                    for _, entrada in sorted(regiones.items(), key=lambda par: self._norma(par[0]))]
+
+        if ruta == '/calendario':
+            mes = parametros.get('mes')
+            return [fila for fila in self.filas('calendario', cultivo, region)
+                    if mes is None or self._norma(fila['mes'])[:3] == mes[:3]]
+
+        if ruta == '/resumen':
+            return self.filas('resumen', cultivo, region)
+
+        return None
+
+    def _precalcular(self):
+        """Respuestas de todas las consultas por cultivo y por cultivo y región."""
+        respuestas = {}
+
+        def agregar(ruta, **parametros):
+            clave = (ruta, tuple(sorted(parametros.items())))
+            respuestas[clave] = crear_respuesta(self.consultar(ruta, parametros))
+
+        agregar('/cultivos')
+        agregar('/regiones')
+        agregar('/resumen')
+        pares = {(cultivo, region) for _, cultivo, region in self._grupos if cultivo is not None}
+        for cultivo, region in pares:
+            if region is None:
+                agregar('/regiones', cultivo=cultivo)
+                agregar('/calendario', cultivo=cultivo)
+                agregar('/resumen', cultivo=cultivo)
+            else:
+                agregar('/calendario', cultivo=cultivo, region=region)
+                agregar('/resumen', cultivo=cultivo, region=region)
+        return respuestas
+
+
+class DatosAPI:
+    """
+    Resultados cargados de una carpeta de CSV. El conjunto vigente está en
+    `self.actual`; las recargas se hacen en un hilo aparte y lo reemplazan
+    de una vez, así que una petición nunca espera a que se lean los CSV.
+    """
+
+    def __init__(self, directorio, intervalo_revision=5.0, capacidad_cache=1024):
+        """
+        Args:
+            directorio (str): Carpeta con calendario*.csv y resumen*.csv
+            intervalo_revision (float): Segundos entre revisiones de cambios en los CSV
+            capacidad_cache (int): URL guardadas en la caché LRU
+        """
+        self.directorio = directorio
+        self.intervalo_revision = intervalo_revision
+        self.cache = CacheLRU(capacidad_cache)
+
+        self._bloqueo = threading.Lock()
+        self._bloqueo_revision = threading.Lock()
+        self._recargando = False
+        self._ultima_revision = time.monotonic()
+        self._generacion = 0
+        self.actual = None
+        self.cargar()
+
+    # --- Carga ---------------------------------------------------------
+
+    def _archivos(self):
+        patrones = ('calendario*.csv', 'resumen*.csv')
+        return sorted(ruta for patron in patrones
+                      for ruta in glob.glob(os.path.join(self.directorio, patron)))
+
+    def _firma_actual(self):
+        """Nombre, tamaño y fecha de modificación de cada CSV."""
+        firma = []
+        for ruta in self._archivos():
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            firma.append((os.path.basename(ruta), info.st_size, info.st_mtime))
+        return firma
+
+    def revisar(self):
+        """
+        Si los CSV cambiaron, los vuelve a cargar en un hilo aparte (como mucho
+        una revisión por intervalo y una recarga a la vez). Mientras tanto se
+        sigue respondiendo con el conjunto anterior.
+        """
+        with self._bloqueo_revision:
+            ahora = time.monotonic()
+            if self._recargando or ahora - self._ultima_revision < self.intervalo_revision:
+                return
+            self._ultima_revision = ahora
+            if self._firma_actual() == self.actual.firma:
+                return
+            self._recargando = True
+        threading.Thread(target=self._recargar, name='recarga-api', daemon=True).start()
+
+    def _recargar(self):
+        """Recarga de fondo: un error deja el conjunto anterior y se reintenta en la próxima revisión."""
+        try:
+            self.cargar()
+        except (OSError, ValueError, csv.Error) as e:
+            reportar_error(e, f"recargar los CSV de {self.directorio}")
+        finally:
+            self._recargando = False
+
+    def cargar(self):
+        """Lee los CSV, asigna ubigeos, precalcula las respuestas y reemplaza el conjunto vigente."""
+        with self._bloqueo:
+            firma = self._firma_actual()
+            calendario, resumen = [], []
+            for nombre, _, _ in firma:
+                with open(os.path.join(self.directorio, nombre), newline='', encoding='utf-8') as f:
+                    lector = csv.DictReader(f)
+                    columnas = lector.fieldnames or []
+                    if 'mes' in columnas:
+                        destino = calendario
+                    elif 'produccion_tm' in columnas:
+                        destino = resumen
+                    else:
+                        print(f"Aviso: {nombre} no es un CSV de calendario ni de resumen")
+                        continue
+                    columna = next((c for c in COLUMNAS_REGION if c in columnas), None)
+                    for fila in lector:
+                        registro = {clave: _valor(valor) if clave not in ('cultivo', columna, 'mes') else valor
+                                    for clave, valor in fila.items()}
+                        registro['region'] = (fila.get(columna) or '').strip()
+                        registro['cultivo'] = (fila.get('cultivo') or '').strip()
+                        destino.append(registro)
+
+            self._asignar_ubigeos(calendario + resumen)
+            self._generacion += 1
+            conjunto = ConjuntoDatos(calendario, resumen, firma, self._generacion)
+            # Una sola asignación: cada petición usa el conjunto que leyó al
+            # empezar, y la caché se indexa por generación para que una
+            # respuesta del conjunto anterior no sobreviva a la recarga
+            self.actual = conjunto
+            self.cache.vaciar()
+
+        contar('siea_api_recargas')
+        print(f"Datos cargados de {self.directorio}: {len(conjunto.calendario)} filas de calendario, "
+              f"{len(conjunto.resumen)} de resumen, {len(conjunto.precalculadas)} respuestas precalculadas")
+
+    def _asignar_ubigeos(self, filas):
+        """Añade el ubigeo de cada región (None si no está en el nomenclátor)."""
+        try:
+            from nomenclator import obtener_nomenclator
+
+            nomenclator = obtener_nomenclator()
+        except (OSError, ImportError):
+            nomenclator = None
+        ubigeos = {}
+        for fila in filas:
+            region = fila['region']
+            if region not in ubigeos:
+                ubigeos[region] = nomenclator.ubigeo(region) if nomenclator else None
+            fila['ubigeo'] = ubigeos[region]
+
+    # --- Consultas -----------------------------------------------------
+
+    def consultar(self, ruta, parametros):
+        """ConjuntoDatos.consultar sobre el conjunto vigente."""
+        return self.actual.consultar(ruta, parametros)
+
+    def estado(self):
+        """Datos de /estado (se calculan en cada petición)."""
+        actual = self.actual
+        return {
+            'directorio': self.directorio,
+            'archivos': [nombre for nombre, _, _ in actual.firma],
+            'cargado': actual.cargado,
+            'generacion': actual.generacion,
+            'recargando': self._recargando,
+            'filas_calendario': len(actual.calendario),
+            'filas_resumen': len(actual.resumen),
+            'precalculadas': len(actual.precalculadas),
+            'cache': {'entradas': len(self.cache), 'capacidad': self.cache.capacidad,
+                      'aciertos': self.cache.aciertos, 'fallos': self.cache.fallos},
+        }
+
+    def responder(self, url):
+        """
+        Devuelve la respuesta de una URL: de la caché LRU, de las
+        precalculadas o calculándola.
+
+        Args:
+            url (str): Ruta con la consulta, p. ej. '/calendario?cultivo=Papa'
+
+        Returns:
+            Respuesta: Respuesta lista para enviar
+        """
+        self.revisar()
+        actual = self.actual
+        clave_cache = (actual.generacion, url)
+        respuesta = self.cache.obtener(clave_cache)
+        if respuesta is not None:
+            contar('siea_cache', tipo='api', resultado='acierto')
+            return respuesta
+        contar('siea_cache', tipo='api', resultado='fallo')
+
+        partes = urlsplit(url)
+        ruta = partes.path.rstrip('/') or '/'
+        parametros = {clave: normalizar_nombre(valor) if clave != 'region' or not valor.isdigit() else valor
+                      for clave, valor in parse_qsl(partes.query) if valor}
+
+        desconocidos = set(parametros) - {'cultivo', 'region', 'mes'}
+        if desconocidos:
+            return crear_respuesta({'error': f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}"}, 400)
+        if ruta == '/calendario' and 'cultivo' not in parametros:
+            return crear_respuesta({'error': "Falta el parámetro cultivo"}, 400)
+
+        clave = (ruta, tuple(sorted(parametros.items())))
+        respuesta = actual.precalculadas.get(clave)
+        if respuesta is None:
+            datos = actual.consultar(ruta, parametros)
+            if datos is None:
+                return crear_respuesta({'error': f"Ruta desconocida: {ruta}",
+                                        'rutas': ['/cultivos', '/regiones', '/calendario', '/resumen',
+                                                  '/estado', '/metricas']}, 404)
+            respuesta = crear_respuesta(datos)
+        self.cache.guardar(clave_cache, respuesta)
+        return respuesta
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """
+    Atiende GET y HEAD con conexiones persistentes (HTTP/1.1).
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'siea-api'
+    # Cabeceras y cuerpo se escriben por separado: sin TCP_NODELAY, Nagle y el
+    # ACK retardado del cliente añaden ~40 ms a cada respuesta con cuerpo
+    disable_nagle_algorithm = True
+    datos = None  # DatosAPI, asignado por crear_servidor
+
+    def do_GET(self):
+        self._atender(con_cuerpo=True)
+
+    def do_HEAD(self):
+        self._atender(con_cuerpo=False)
+
+    def _atender(self, con_cuerpo):
+        inicio = time.perf_counter()
+        ruta = urlsplit(self.path).path.rstrip('/') or '/'
+        if ruta == '/estado':
+            respuesta = crear_respuesta(self.datos.estado())
+        elif ruta == '/metricas':
+            respuesta = None
+            self._enviar_texto(obtener_trazador().texto_prometheus(), con_cuerpo)
+        else:
+            respuesta = self.datos.responder(self.path)
+
+        if respuesta is not None:
+            self._enviar(respuesta, con_cuerpo)
+        obtener_trazador().observar('siea_api_latencia_segundos', time.perf_counter() - inicio, ruta=ruta)
+
+    def _enviar(self, respuesta, con_cuerpo):
+        """Envía una respuesta JSON: 304 si el ETag coincide, gzip si el cliente lo acepta."""
+        etiquetas = [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]
+        if respuesta.estado == 200 and (respuesta.etag in etiquetas or '*' in etiquetas):
+            self.send_response(304)
+            self.send_header('ETag', respuesta.etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            contar('siea_api_peticiones', estado=304)
+            return
+
+        comprimir = 'gzip' in self.headers.get('Accept-Encoding', '')
+        cuerpo = respuesta.comprimido if comprimir else respuesta.cuerpo
+        self.send_response(respuesta.estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if comprimir:
+            self.send_header('Content-Encoding', 'gzip')
+        if respuesta.estado == 200:
+            self.send_header('ETag', respuesta.etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if con_cuerpo:
+            self.wfile.write(cuerpo)
+        contar('siea_api_peticiones', estado=respuesta.estado)
+
+    def _enviar_texto(self, texto, con_cuerpo):
+        cuerpo = texto.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        if con_cuerpo:
+            self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *argumentos):
+        # Las peticiones se cuentan en las métricas en lugar de imprimir una línea por petición
+        pass
+
+
+def crear_servidor(directorio, host='127.0.0.1', puerto=8000, capacidad_cache=1024, intervalo_revision=5.0):
+    """
+    Crea el servidor (sin iniciarlo) con los datos de una carpeta ya cargados.
+
+    Args:
+        directorio (str): Carpeta con los CSV de resultados
+        host (str): Dirección en la que escuchar
+        puerto (int): Puerto (0 = uno libre)
+        capacidad_cache (int): URL guardadas en la caché LRU
+        intervalo_revision (float): Segundos entre revisiones de cambios en los CSV
+
+    Returns:
+        ThreadingHTTPServer: Servidor listo para `serve_forever`
+    """
+    datos = DatosAPI(directorio, intervalo_revision, capacidad_cache)
+    manejador = type('ManejadorSIEA', (ManejadorAPI,), {'datos': datos})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    servidor.datos = datos
+    return servidor
@@ -0,0 +1,399 @@
+# supervisor.py
+"""
+Supervisor de salud del navegador para recorridos largos.
+
+En sesiones de varias horas Chrome va acumulando memoria al entrar y salir
+de los mapas, y un `execute_script` colgado detiene todo el recorrido. El
+supervisor envuelve al driver y:
+
+- mide la latencia de cada comando de WebDriver y la memoria (RSS) de
+  chromedriver y de todos los procesos de Chrome;
+- recicla el navegador tras un número de tareas o al superar un umbral de
+  memoria;
+- si un comando no responde en `limite_comando` segundos, mata el navegador
+  desde un hilo vigilante, lo vuelve a abrir y restaura el cultivo y las
+  regiones en las que se había entrado, para que la tarea en curso se
+  reintente desde el mismo estado.
+"""
+
+import threading
+import time
+from collections import deque
+
+from tiempos import PlazoVencido, es_fatal, reportar_error
+from trazas import contar
+
+# Latencias guardadas para las estadísticas (últimos comandos)
+MAX_LATENCIAS = 2000
+
+
+class SupervisorNavegador:
+    """
+    Mantiene un driver sano y lo recrea cuando hace falta.
+    """
+
+    def __init__(self, cultivo=None, ruta=None, headless=False, max_tareas=50,
+                 max_memoria_mb=3000, limite_comando=90, intervalo_vigilancia=1.0):
+        """
+        Args:
+            cultivo (str, opcional): Cultivo a seleccionar al abrir el portal
+            ruta (list, opcional): Regiones en las que entrar tras seleccionar el cultivo
+            headless (bool): Ejecutar Chrome sin interfaz
+            max_tareas (int): Tareas tras las que se recicla el navegador (0 = nunca)
+            max_memoria_mb (float): Memoria total (MB) a partir de la que se recicla
+            limite_comando (float): Segundos tras los que un comando se considera colgado
+            intervalo_vigilancia (float): Cada cuántos segundos revisa el vigilante
+        """
+        self.cultivo = cultivo
+        self.ruta = list(ruta or [])
+        self.headless = headless
+        self.max_tareas = max_tareas
+        self.max_memoria_mb = max_memoria_mb
+        self.limite_comando = limite_comando
+        self.intervalo_vigilancia = intervalo_vigilancia
+
+        self.driver = None
+        self.tareas = 0
+        self.tareas_totales = 0
+        self.reinicios = 0
+        self.latencias = deque(maxlen=MAX_LATENCIAS)
+
+        self._comando_desde = None
+        self._estancado = False
+        self._detener = threading.Event()
+        self._vigilante = None
+
+    # --- Ciclo de vida -------------------------------------------------
+
+    def iniciar(self):
+        """
+        Abre un navegador nuevo y lo deja en el estado guardado
+        (portal abierto, cultivo seleccionado y regiones de la ruta).
+
+        Returns:
+            WebDriver: Driver listo para usar
+        """
+        from navegador import crear_driver, abrir_calendario, seleccionar_cultivo, entrar_region
+        from nomenclator import NIVELES
+
+        self.driver = crear_driver(headless=self.headless)
+        self._instrumentar(self.driver)
+        self._estancado = False
+        self.tareas = 0
+
+        if self._vigilante is None or not self._vigilante.is_alive():
+            self._detener.clear()
+            self._vigilante = threading.Thread(target=self._vigilar, name='vigilante-navegador', daemon=True)
+            self._vigilante.start()
+
+        abrir_calendario(self.driver)
+        if self.cultivo:
+            from catalogo_cultivos import cultivo_actual
+
+            seleccionar_cultivo(self.driver, self.cultivo)
+            # Guardar el nombre del cultivo tal como aparece en el portal
+            self.cultivo = cultivo_actual(self.driver) or self.cultivo
+        for i, region in enumerate(self.ruta):
+            entrar_region(self.driver, region, NIVELES[i] if i < len(NIVELES) else None)
+
+        return self.driver
+
+    def cerrar(self):
+        """Detiene el vigilante y cierra el navegador."""
+        self._detener.set()
+        self._cerrar_driver()
+
+    def reiniciar(self, motivo):
+        """
+        Cierra (o mata) el navegador actual y abre uno nuevo con el mismo estado.
+
+        Args:
+            motivo (str): Razón del reinicio, para el registro
+
+        Returns:
+            WebDriver: Driver nuevo
+        """
+        print(f"Reiniciando el navegador ({motivo}) tras {self.tareas} tareas")
+        self.reinicios += 1
+        contar('siea_reinicios_navegador', motivo=motivo.split()[0])
+        self._cerrar_driver()
+        return self.iniciar()
+
+    def _cerrar_driver(self):
+        """Cierra el driver; si no responde, mata sus procesos."""
+        if self.driver is None:
+            return
+        procesos = self._procesos()
+        try:
+            if not self._estancado:
+                self.driver.quit()
+        except Exception as e:
+            # Un quit fallido puede dejar chromedriver huérfano: se informa y
+            # sus procesos se matan igual (abajo). Un error fatal (sesión ya
+            # perdida) se informa sin relanzarlo: el cierre sigue siendo el objetivo.
+            tipo = reportar_error(e, "cerrar el navegador", relanzar_fatal=False)
+            contar('siea_errores_cierre_navegador', error=tipo)
+        finally:
+            self._matar(procesos)
+            self.driver = None
+            self._comando_desde = None
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+    # --- Estado --------------------------------------------------------
+
+    def cambiar_cultivo(self, cultivo):
+        """
+        Selecciona otro cultivo desde el mapa nacional, sin recargar la página,
+        y lo registra para restaurarlo tras un reinicio. No hace nada si ya es
+        el actual.
+
+        Args:
+            cultivo (str): Nombre del cultivo
+
+        Returns:
+            str: Cultivo tal como aparece en el portal
+        """
+        from catalogo_cultivos import cambiar_cultivo
+        from navegador import abrir_calendario, seleccionar_cultivo, regresar
+        from normalizacion import normalizar_nombre
+        from tiempos import reportar_error
+
+        if normalizar_nombre(cultivo) == normalizar_nombre(self.cultivo) and not self.ruta:
+            return self.cultivo
+        if self.driver is None:
+            self.cultivo, self.ruta = cultivo, []
+            return self.cultivo
+
+        try:
+            for _ in self.ruta:
+                regresar(self.driver)
+            self.ruta = []
+            self.cultivo = cambiar_cultivo(self.driver, cultivo)
+        except ValueError:
+            raise
+        except Exception as e:
+            # Respaldo: recargar el portal y escribir el cultivo en el buscador
+            reportar_error(e, f"cambiar al cultivo {cultivo} sin recargar")
+            self.cultivo, self.ruta = cultivo, []
+            abrir_calendario(self.driver)
+            seleccionar_cultivo(self.driver, cultivo)
+        return self.cultivo
+
+    def entrar(self, region):
+        """
+        Entra en una región y la añade a la ruta que se restaura tras un reinicio.
+
+        Returns:
+            bool: True si se entró en la región
+        """
+        from navegador import entrar_region
+        from nomenclator import NIVELES
+
+        # La ruta parte del mapa nacional: departamento, provincia, distrito
+        nivel = NIVELES[len(self.ruta)] if len(self.ruta) < len(NIVELES) else None
+        if entrar_region(self.driver, region, nivel):
+            self.ruta.append(region)
+            return True
+        return False
+
+    def regresar(self):
+        """Regresa al nivel anterior y lo quita de la ruta guardada."""
+        from navegador import regresar
+
+        regresar(self.driver)
+        if self.ruta:
+            self.ruta.pop()
+
+    # --- Ejecución de tareas -------------------------------------------
+
+    def ejecutar(self, funcion, *args, intentos=2, **kwargs):
+        """
+        Ejecuta una tarea con el driver actual: `funcion(driver, *args, **kwargs)`.
+        Si el navegador se colgó o se perdió la sesión, lo reinicia y repite la
+        tarea desde el estado restaurado.
+
+        Args:
+            funcion (callable): Tarea que recibe el driver como primer argumento
+            intentos (int): Ejecuciones máximas de la tarea
+            *args, **kwargs: Argumentos adicionales de la tarea
+
+        Returns:
+            Resultado de la tarea
+        """
+        if self.driver is None:
+            self.iniciar()
+
+        for intento in range(intentos):
+            ultimo = intento == intentos - 1
+            try:
+                resultado = funcion(self.driver, *args, **kwargs)
+            except Exception as e:
+                if not self._necesita_reinicio(e) or ultimo:
+                    raise
+                motivo = 'comando colgado' if self._estancado else f'sesión perdida: {type(e).__name__}'
+                self.reiniciar(motivo)
+                continue
+
+            # Una tarea que ignora sus errores puede terminar "bien" aunque el
+            # vigilante haya matado el navegador: su resultado no es fiable
+            if self._estancado:
+                self.reiniciar('comando colgado')
+                if not ultimo:
+                    continue
+                return resultado
+
+            self.tarea_terminada()
+            return resultado
+
+    def tarea_terminada(self):
+        """
+        Cuenta una tarea terminada y recicla el navegador si alcanzó el número
+        máximo de tareas o el umbral de memoria.
+        """
+        self.tareas += 1
+        self.tareas_totales += 1
+        if self.max_tareas and self.tareas >= self.max_tareas:
+            self.reiniciar('límite de tareas')
+            return
+
+        memoria = self.memoria_mb()
+        if memoria is not None and memoria >= self.max_memoria_mb:
+            self.reiniciar(f'memoria {memoria:.0f} MB')
+
+    def _necesita_reinicio(self, error):
+        """Indica si un error se debe a un navegador colgado, muerto o desconectado."""
+        if self._estancado:
+            return True
+        if isinstance(error, PlazoVencido):
+            return False
+        return es_fatal(error) or not self.vivo()
+
+    def vivo(self):
+        """True si el proceso de chromedriver sigue en ejecución."""
+        import psutil
+
+        proceso = self._proceso_driver()
+        if proceso is None:
+            return self.driver is not None
+        try:
+            return proceso.is_running() and proceso.status() != psutil.STATUS_ZOMBIE
+        except psutil.Error:
+            return False
+
+    # --- Medición ------------------------------------------------------
+
+    def _instrumentar(self, driver):
+        """
+        Envuelve `driver.execute`, por donde pasan todos los comandos de
+        WebDriver, para medir su latencia y avisar al vigilante.
+        """
+        ejecutar_original = driver.execute
+
+        def execute_medido(comando, params=None):
+            inicio = time.monotonic()
+            self._comando_desde = inicio
+            try:
+                return ejecutar_original(comando, params)
+            finally:
+                self._comando_desde = None
+                self.latencias.append((comando, time.monotonic() - inicio))
+
+        driver.execute = execute_medido
+
+    def _proceso_driver(self):
+        """Proceso de chromedriver (None si el driver es remoto o no existe)."""
+        import psutil
+
+        servicio = getattr(self.driver, 'service', None)
+        proceso = getattr(servicio, 'process', None)
+        if proceso is None:
+            return None
+        try:
+            return psutil.Process(proceso.pid)
+        except psutil.Error:
+            return None
+
+    def _procesos(self):
+        """chromedriver y todos los procesos de Chrome que cuelgan de él."""
+        import psutil
+
+        raiz = self._proceso_driver()
+        if raiz is None:
+            return []
+        try:
+            return [raiz] + raiz.children(recursive=True)
+        except psutil.Error:
+            return [raiz]
+
+    def memoria_mb(self):
+        """
+        Returns:
+            float: RSS total de chromedriver y Chrome en MB, o None si no se puede medir
+        """
+        import psutil
+
+        procesos = self._procesos()
+        if not procesos:
+            return None
+        total = 0
+        for proceso in procesos:
+            try:
+                total += proceso.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Tareas, reinicios, memoria y latencias (mediana, p95 y máximo en ms)
+        """
+        import numpy as np
+
+        datos = {
+            'tareas': self.tareas_totales,
+            'reinicios': self.reinicios,
+            'memoria_mb': self.memoria_mb(),
+            'comandos': len(self.latencias),
+        }
+        if self.latencias:
+            tiempos = np.array([t for _, t in self.latencias]) * 1000
+            datos.update({
+                'latencia_mediana_ms': float(np.median(tiempos)),
+                'latencia_p95_ms': float(np.percentile(tiempos, 95)),
+                'latencia_max_ms': float(tiempos.max()),
+            })
+        return datos
+
+    # --- Vigilancia ----------------------------------------------------
+
+    def _vigilar(self):
+        """Hilo vigilante: mata el navegador si un comando supera el límite."""
+        while not self._detener.wait(self.intervalo_vigilancia):
+            desde = self._comando_desde
+            if desde is None or self._estancado:
+                continue
+            if time.monotonic() - desde > self.limite_comando:
+                print(f"Comando sin respuesta tras {self.limite_comando} s; matando el navegador")
+                self._estancado = True
+                # Matar los procesos hace que el comando bloqueado falle de inmediato
+                self._matar(self._procesos())
+
+    @staticmethod
+    def _matar(procesos):
+        """Mata una lista de procesos ignorando los que ya terminaron."""
+        import psutil
+
+        for proceso in reversed(procesos):
+            try:
+                proceso.kill()
+            except psutil.Error:
+                continue
+        psutil.wait_procs(procesos, timeout=5)
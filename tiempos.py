@@ -0,0 +1,325 @@
+# tiempos.py
+"""
+Política de tiempos compartida: plazos por tarea, esperas acotadas,
+reintentos con backoff exponencial y clasificación de errores.
+
+Cada tarea (por ejemplo, extraer un departamento) se ejecuta dentro de
+`with tarea(segundos):`. Las esperas (`dormir`, `esperar_hasta`) toman solo
+lo que queda del plazo, de modo que la latencia de una tarea no puede
+superar su plazo por acumulación de esperas fijas. Fuera de una tarea las
+esperas se comportan como antes (sin límite global).
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from trazas import contar
+
+# Esperas por defecto (segundos); son máximos, el plazo de la tarea puede acortarlas
+ESPERAS = {
+    'carga_pagina': 20,      # Elementos del portal (select2, botones)
+    'elemento': 10,          # Elementos de la página tras una acción
+    'carga_mapa': 10,        # Primer path del mapa o barras del gráfico
+    'estabilizar_mapa': 2,   # Animación del mapa tras cargar o regresar
+    'tooltip': 0.7,          # Aparición del tooltip tras el hover
+    'tooltip_grafico': 0.5,  # Tooltip de una barra del gráfico de calendario
+    'tras_click': 1.5,       # Actualización de la página tras un clic
+    'tooltip_selector': 0.5, # Espera por cada selector de tooltip
+}
+
+# Excepciones que suelen resolverse al reintentar
+ERRORES_TRANSITORIOS = {
+    'TimeoutException',
+    'StaleElementReferenceException',
+    'ElementClickInterceptedException',
+    'ElementNotInteractableException',
+    'MoveTargetOutOfBoundsException',
+    'NoSuchElementException',
+    'JavascriptException',
+    'ConnectionError',
+    'ConnectionResetError',
+    'TimeoutError',
+}
+
+# Excepciones que no se resuelven al reintentar (sesión perdida, datos mal formados)
+ERRORES_PERMANENTES = {
+    'InvalidSessionIdException',
+    'NoSuchWindowException',
+    'InvalidArgumentException',
+    'InvalidSelectorException',
+    'PlazoVencido',
+    'ValueError',
+    'KeyError',
+    'TypeError',
+}
+
+# Errores tras los cuales no tiene sentido seguir con la tarea
+ERRORES_FATALES = {
+    'PlazoVencido',
+    'InvalidSessionIdException',
+    'NoSuchWindowException',
+}
+
+_local = threading.local()
+
+
+class PlazoVencido(TimeoutError):
+    """Se agotó el plazo global de la tarea."""
+
+
+class Plazo:
+    """
+    Plazo global de una tarea.
+    """
+
+    def __init__(self, segundos=None):
+        """
+        Args:
+            segundos (float, opcional): Duración máxima. Si es None, no hay límite
+        """
+        self.segundos = segundos
+        self.limite = None if segundos is None else time.monotonic() + segundos
+
+    def restante(self):
+        """
+        Returns:
+            float: Segundos que quedan (infinito si no hay límite)
+        """
+        if self.limite is None:
+            return float('inf')
+        return max(0.0, self.limite - time.monotonic())
+
+    @property
+    def vencido(self):
+        """True si ya no queda tiempo."""
+        return self.restante() <= 0
+
+    def acotar(self, segundos):
+        """
+        Recorta una espera a lo que queda del plazo.
+
+        Args:
+            segundos (float): Espera deseada
+
+        Returns:
+            float: Espera permitida
+        """
+        return min(segundos, self.restante())
+
+    def verificar(self):
+        """Lanza PlazoVencido si ya no queda tiempo."""
+        if self.vencido:
+            raise PlazoVencido(f"Se agotó el plazo de {self.segundos} s")
+
+
+_SIN_PLAZO = Plazo()
+
+
+def plazo_actual():
+    """
+    Returns:
+        Plazo: Plazo de la tarea en curso en este hilo (sin límite si no hay)
+    """
+    pila = getattr(_local, 'plazos', None)
+    return pila[-1] if pila else _SIN_PLAZO
+
+
+@contextmanager
+def tarea(segundos=None):
+    """
+    Ejecuta un bloque con un plazo global. Un plazo anidado nunca excede al
+    plazo que lo contiene.
+
+    Args:
+        segundos (float, opcional): Duración máxima de la tarea
+
+    Yields:
+        Plazo: Plazo de la tarea
+    """
+    limite = plazo_actual().restante()
+    if segundos is not None:
+        limite = min(limite, segundos)
+    with en_plazo(Plazo(None if limite == float('inf') else limite)) as plazo:
+        yield plazo
+
+
+@contextmanager
+def en_plazo(plazo):
+    """
+    Ejecuta un bloque con un plazo ya creado. El plazo de `tarea` es propio
+    de cada hilo: los hilos que trabajan para una tarea (p. ej. los de un
+    ThreadPoolExecutor) deben volver a entrar en el plazo que se leyó con
+    plazo_actual() antes de crearlos.
+
+    Args:
+        plazo (Plazo): Plazo a aplicar en este hilo
+
+    Yields:
+        Plazo: El mismo plazo
+    """
+    pila = getattr(_local, 'plazos', None)
+    if pila is None:
+        pila = _local.plazos = []
+    pila.append(plazo)
+    try:
+        yield plazo
+    finally:
+        pila.pop()
+
+
+def dormir(segundos):
+    """
+    Espera como time.sleep, pero sin superar el plazo de la tarea en curso.
+
+    Args:
+        segundos (float): Espera deseada
+
+    Raises:
+        PlazoVencido: Si el plazo ya se había agotado
+    """
+    plazo = plazo_actual()
+    plazo.verificar()
+    espera = plazo.acotar(segundos)
+    if espera > 0:
+        time.sleep(espera)
+
+
+def esperar_hasta(driver, condicion, maximo=ESPERAS['carga_mapa']):
+    """
+    WebDriverWait acotado al plazo de la tarea en curso.
+
+    Args:
+        driver: WebDriver de Selenium
+        condicion: Condición de expected_conditions
+        maximo (float): Espera máxima deseada
+
+    Returns:
+        Resultado de la condición
+
+    Raises:
+        PlazoVencido: Si el plazo ya se había agotado
+        TimeoutException: Si la condición no se cumplió a tiempo
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    plazo = plazo_actual()
+    plazo.verificar()
+    return WebDriverWait(driver, plazo.acotar(maximo)).until(condicion)
+
+
+def clasificar_error(error):
+    """
+    Clasifica una excepción como transitoria o permanente según su clase.
+
+    Args:
+        error (Exception): Excepción capturada
+
+    Returns:
+        str: 'transitorio' o 'permanente'
+    """
+    nombres = {clase.__name__ for clase in type(error).__mro__}
+    if nombres & ERRORES_PERMANENTES:
+        return 'permanente'
+    if nombres & ERRORES_TRANSITORIOS:
+        return 'transitorio'
+
+    # WebDriverException genérica: la sesión cerrada no se recupera
+    mensaje = str(error).lower()
+    if 'WebDriverException' in nombres:
+        if 'disconnected' in mensaje or 'session deleted' in mensaje or 'no such window' in mensaje:
+            return 'permanente'
+        return 'transitorio'
+    return 'permanente'
+
+
+def es_fatal(error):
+    """
+    Indica si un error impide continuar con la tarea (plazo agotado o
+    sesión del navegador perdida), aunque se esté recorriendo una lista.
+
+    Args:
+        error (Exception): Excepción capturada
+
+    Returns:
+        bool: True si el error es fatal
+    """
+    nombres = {clase.__name__ for clase in type(error).__mro__}
+    if nombres & ERRORES_FATALES:
+        return True
+    mensaje = str(error).lower()
+    return 'WebDriverException' in nombres and ('disconnected' in mensaje or 'session deleted' in mensaje)
+
+
+def reportar_error(error, contexto, relanzar_fatal=True):
+    """
+    Muestra un error clasificado en lugar de ignorarlo en silencio.
+    Los errores fatales se vuelven a lanzar para que la tarea termine.
+
+    Args:
+        error (Exception): Excepción capturada
+        contexto (str): Qué se estaba haciendo
+        relanzar_fatal (bool): False para solo informar también los errores
+                               fatales (p. ej. al cerrar un navegador ya perdido)
+
+    Returns:
+        str: Clasificación del error ('fatal' si es fatal y no se relanzó)
+
+    Raises:
+        El mismo error si es fatal (ver es_fatal) y relanzar_fatal es True
+    """
+    tipo = clasificar_error(error)
+    mensaje = str(error).strip().splitlines()[0] if str(error).strip() else type(error).__name__
+    fatal = es_fatal(error)
+    print(f"[{tipo}{', fatal' if fatal else ''}] {contexto}: {mensaje}")
+    if fatal and relanzar_fatal:
+        raise error
+    return 'fatal' if fatal else tipo
+
+
+def espera_backoff(intento, base=0.5, tope=8.0):
+    """
+    Espera para el reintento número `intento` con backoff exponencial
+    acotado y jitter completo.
+
+    Args:
+        intento (int): Número de intento fallido (0 = primero)
+        base (float): Espera base
+        tope (float): Espera máxima
+
+    Returns:
+        float: Segundos a esperar
+    """
+    return random.uniform(0, min(tope, base * (2 ** intento)))
+
+
+def reintentar(funcion, intentos=3, base=0.5, tope=8.0, descripcion="operación"):
+    """
+    Ejecuta una función reintentando solo los errores transitorios.
+
+    Args:
+        funcion (callable): Función sin argumentos
+        intentos (int): Número máximo de intentos
+        base (float): Espera base del backoff
+        tope (float): Espera máxima entre intentos
+        descripcion (str): Texto para los mensajes
+
+    Returns:
+        Resultado de la función
+
+    Raises:
+        La última excepción si es permanente, se agotan los intentos o el plazo
+    """
+    for intento in range(intentos):
+        try:
+            return funcion()
+        except Exception as e:
+            tipo = reportar_error(e, f"{descripcion} (intento {intento + 1}/{intentos})")
+            if tipo == 'permanente' or intento == intentos - 1:
+                raise
+            espera = espera_backoff(intento, base, tope)
+            if plazo_actual().restante() <= espera:
+                raise
+            contar('siea_reintentos')
+            dormir(espera)
@@ -3,21 +3,30 @@
 Librería para extraer tooltips de mapas web usando Selenium.
 """
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import ImageGrab
-import cv2
 import csv
 
+from runtime_pagina import llamar
+from tiempos import ESPERAS, dormir, esperar_hasta, es_fatal
+from trazas import span, contar, evento, progreso
+
+
+def _importar_visualizacion():
+    """
+    Importa las librerías de visualización solo cuando se piden gráficos,
+    para no cargar matplotlib, cv2 y PIL en cada escaneo.
+    """
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from PIL import ImageGrab
+    import cv2
+    return plt, np, ImageGrab, cv2
+
 def visualizar_puntos_mapa(x_min, y_min, x_max, y_max, filas, columnas):
     """
     Visualiza los puntos donde se posicionará el cursor en el mapa
     """
+    plt, np, ImageGrab, cv2 = _importar_visualizacion()
+    
     # Tomar screenshot de la pantalla
     screenshot = ImageGrab.grab()
     screenshot = np.array(screenshot)
@@ -51,27 +60,24 @@ def visualizar_puntos_mapa(x_min, y_min, x_max, y_max, filas, columnas):
     return puntos
 
 def simular_hover(driver, x, y):
-    """Función para simular hover en una posición específica"""
-    driver.execute_script(f"""
-        var elemento = document.elementFromPoint({x}, {y});
-        if (elemento) {{
-            ['mousemove', 'mouseover', 'mouseenter'].forEach(function(eventType) {{
-                var evento = new MouseEvent(eventType, {{
-                    view: window, bubbles: true, cancelable: true,
-                    clientX: {x}, clientY: {y}
-                }});
-                elemento.dispatchEvent(evento);
-            }});
-        }}
-    """)
+    """
+    Función para simular hover en una posición específica (MouseEvent
+    sintético: mueve y devuelve la región en un solo comando, ver entrada_cdp.py)
+    
+    Returns:
+        str: Región de Highcharts bajo el cursor, o None si no hay ninguna
+    """
+    return llamar(driver, 'hover', x, y, True)
 
-def generar_mapa_resultados(x_min, y_min, x_max, y_max, filas, columnas, mapa_resultados, puntos_visitados):
+def generar_mapa_resultados(x_min, y_min, x_max, y_max, filas, columnas, raster):
     """
     Genera una visualización de los resultados obtenidos
     
     Args:
-        puntos_visitados: conjunto de tuplas (fila, columna) que indica puntos donde se posicionó el cursor
+        raster: RasterEtiquetas con la región encontrada en cada punto y los puntos visitados
     """
+    plt, np, ImageGrab, cv2 = _importar_visualizacion()
+    
     # Tomar screenshot para usar como fondo
     screenshot = ImageGrab.grab()
     screenshot = np.array(screenshot)
@@ -97,10 +103,10 @@ def generar_mapa_resultados(x_min, y_min, x_max, y_max, filas, columnas, mapa_re
             y = int(y_min + fila * alto_celda)
             
             # Obtener el tooltip para esta posición
-            tooltip = mapa_resultados.get((fila, columna))
+            tooltip = raster.nombre_en(fila, columna)
             
             # Verificar si el punto fue visitado (cursor pasó por ahí)
-            punto_visitado = (fila, columna) in puntos_visitados
+            punto_visitado = raster.visitados[fila, columna]
             
             # Color del punto según si se encontró un tooltip y si fue visitado
             if tooltip:
@@ -153,8 +159,77 @@ def generar_mapa_resultados(x_min, y_min, x_max, y_max, filas, columnas, mapa_re
     
     return imagen_resultado
 
-def scrape_tooltips_mapa(driver, x_min, y_min, x_max, y_max, filas=20, columnas=20, 
-                         mostrar_visualizacion=True, tiempo_espera=1.0):
+# Lista de selectores comunes para tooltips
+TOOLTIP_SELECTORS = [
+    ".highcharts-tooltip",  # Selector del código original
+    "[role='tooltip']",     # Común en muchos mapas
+    ".tooltip",             # Clase común
+    ".mapTooltip",          # Otra clase común
+    ".map-tooltip"          # Variante con guión
+]
+
+def leer_tooltip(driver, tooltip_selectors=TOOLTIP_SELECTORS):
+    """
+    Devuelve el texto del primer tooltip con contenido entre los selectores dados.
+    
+    Returns:
+        str: Texto del tooltip, o None si no hay ninguno visible
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    
+    for selector in tooltip_selectors:
+        try:
+            tooltip = esperar_hasta(driver, EC.presence_of_element_located(
+                (By.CSS_SELECTOR, selector)), ESPERAS['tooltip_selector'])
+            tooltip_text = tooltip.text.strip()
+            if tooltip_text:  # Si encontramos texto, salimos del bucle
+                return tooltip_text
+        except Exception as e:
+            if es_fatal(e):
+                raise
+            continue
+    return None
+
+def reutilizar_raster(driver, raster, x_min, y_min, ancho_celda, alto_celda, tiempo_espera=1.0):
+    """
+    Visita un solo punto por cada región conocida de un raster guardado.
+    
+    Args:
+        driver: WebDriver de Selenium inicializado
+        raster: RasterEtiquetas de la misma vista, ventana y cuadrícula
+        x_min, y_min: Esquina superior izquierda del área
+        ancho_celda, alto_celda: Tamaño de cada celda
+        tiempo_espera: Tiempo de espera por punto
+        
+    Returns:
+        set: Tooltips encontrados, o None si alguna región ya no coincide
+             (la geometría cambió y hay que escanear de nuevo)
+    """
+    tooltips = set()
+    representativos = raster.puntos_representativos()
+    print(f"Reutilizando raster guardado: {len(representativos)} regiones, un punto por región")
+    
+    for nombre, (fila, columna) in representativos.items():
+        x = int(x_min + columna * ancho_celda)
+        y = int(y_min + fila * alto_celda)
+        simular_hover(driver, x, y)
+        dormir(tiempo_espera)
+        
+        tooltip_text = leer_tooltip(driver)
+        if not tooltip_text or tooltip_text.splitlines()[0].strip() != nombre:
+            print(f"La región '{nombre}' no coincide en ({fila},{columna}); se escaneará de nuevo")
+            return None
+        
+        tooltips.add(tooltip_text)
+        evento('encontrado', metodo='raster', celda=[fila, columna], texto=tooltip_text)
+    
+    return tooltips
+
+def scrape_tooltips_mapa(driver, x_min=None, y_min=None, x_max=None, y_max=None, filas=None, columnas=None, 
+                         mostrar_visualizacion=True, tiempo_espera=None,
+                         esperados=None, posiciones_esperadas=None, vista=None, nivel=None,
+                         espera_adaptativa=True, reanudar=True):
     """
     Función para extraer nombres de elementos desde tooltips en mapas web.
     
@@ -164,26 +239,72 @@ def scrape_tooltips_mapa(driver, x_min, y_min, x_max, y_max, filas=20, columnas=
         y_min: Coordenada Y mínima del área a analizar
         x_max: Coordenada X máxima del área a analizar
         y_max: Coordenada Y máxima del área a analizar
-        filas: Número de filas de la cuadrícula (default: 20)
-        columnas: Número de columnas de la cuadrícula (default: 20)
+               (en píxeles CSS de la ventana; si falta alguna, se detecta la zona
+               del mapa en la página, ver zonas.py)
+        filas: Número de filas de la cuadrícula (default: calibrado para el nivel, o 20)
+        columnas: Número de columnas de la cuadrícula (default: calibrado para el nivel, o 20)
         mostrar_visualizacion: Si es True, muestra visualizaciones (default: True)
-        tiempo_espera: Tiempo en segundos para esperar a que aparezca el tooltip (default: 1.0)
+        tiempo_espera: Tiempo en segundos para esperar a que aparezca el tooltip
+                       (default: calibrado para el nivel, o 1.0)
+        esperados: Nombres que deberían aparecer en el mapa (opcional). Si se indican,
+                   los puntos se visitan en orden de cobertura y el escaneo termina
+                   al encontrarlos todos (ver cobertura.py)
+        posiciones_esperadas: nombre normalizado → (x, y) aproximado de cada nombre
+                              esperado (opcional)
+        vista: Nombre de la vista del mapa, p. ej. 'departamento' o 'provincia/Lima'
+               (opcional). Si se indica, el raster de etiquetas se guarda y los
+               escaneos siguientes de la misma vista y ventana lo reutilizan
+               pasando por un solo punto de cada región (ver raster_mapa.py)
+        nivel: Nivel del mapa cuyos parámetros calibrados se usan para lo que no se
+               indique (ver autoajuste.py; default: 'departamento')
+        espera_adaptativa: Si es True, tiempo_espera es solo el límite inicial: en cada
+                           punto se espera lo justo a que aparezca el tooltip y el límite
+                           se ajusta a la latencia observada (ver latencia.py)
+        reanudar: Si es True, los puntos visitados se anotan en un diario en disco y,
+                  si un escaneo con los mismos parámetros se interrumpió, se continúa
+                  donde se quedó (ver diario_escaneo.py)
         
     Returns:
         tuple: (set de tooltips únicos, diccionario con posiciones y tooltips)
     """
+    from autoajuste import completar_parametros
+    from zonas import zona_del_mapa
+    
+    if None in (x_min, y_min, x_max, y_max):
+        zona = zona_del_mapa(driver)
+        x_min, y_min, x_max, y_max = zona['x_min'], zona['y_min'], zona['x_max'], zona['y_max']
+    
+    filas, columnas, tiempo_espera = completar_parametros(
+        nivel, x_max - x_min, y_max - y_min, filas, columnas, tiempo_espera, por_defecto=(20, 20, 1.0))
+    
+    with span('escanear', metodo='tooltips', vista=vista, puntos=(filas + 1) * (columnas + 1)) as atributos:
+        tooltips, posiciones = _scrape_tooltips_mapa(
+            driver, x_min, y_min, x_max, y_max, filas, columnas, mostrar_visualizacion,
+            tiempo_espera, esperados, posiciones_esperadas, vista, espera_adaptativa, reanudar
+        )
+        atributos['encontrados'] = len(tooltips)
+        contar('siea_regiones_encontradas', len(tooltips), metodo='tooltips')
+        return tooltips, posiciones
+
+def _scrape_tooltips_mapa(driver, x_min, y_min, x_max, y_max, filas, columnas,
+                          mostrar_visualizacion, tiempo_espera, esperados,
+                          posiciones_esperadas, vista, espera_adaptativa, reanudar):
+    """Implementación de scrape_tooltips_mapa (ver su documentación)."""
+    from latencia import EsperaAdaptativa, leer_texto_tooltip, TOOLTIP, FIJA
+    from raster_mapa import RasterEtiquetas, clave_vista, cargar_raster, guardar_raster
+    from zonas import a_pantalla
+    
     # Conjunto para almacenar tooltips encontrados (elimina duplicados automáticamente)
     tooltips_encontrados = set()
     
-    # Mapeo para guardar qué tooltip se encontró en cada posición
-    mapa_resultados = {}
-    
-    # Conjunto para registrar qué puntos fueron visitados por el cursor
-    puntos_visitados = set()
+    # Raster con la región encontrada en cada punto (-1 = no visitado)
+    raster = RasterEtiquetas(filas + 1, columnas + 1)
     
-    # Visualizar puntos si se solicita
+    # Visualizar puntos si se solicita (sobre una captura de pantalla, en píxeles físicos)
     if mostrar_visualizacion:
-        visualizar_puntos_mapa(x_min, y_min, x_max, y_max, filas, columnas)
+        pantalla = a_pantalla(driver, {'x_min': x_min, 'y_min': y_min, 'x_max': x_max, 'y_max': y_max})
+        visualizar_puntos_mapa(pantalla['x_min'], pantalla['y_min'], pantalla['x_max'], pantalla['y_max'],
+                               filas, columnas)
     
     # Calcular tamaño de cada celda
     ancho_celda = (x_max - x_min) / columnas
@@ -197,80 +318,158 @@ def scrape_tooltips_mapa(driver, x_min, y_min, x_max, y_max, filas=20, columnas=
             y = int(y_min + fila * alto_celda)
             puntos.append((x, y, fila, columna))
     
+    # Reutilizar el raster de esta vista si ya se escaneó antes
+    clave = None
+    reutilizado = False
+    if vista:
+        ancho, alto = driver.execute_script("return [window.innerWidth, window.innerHeight];")
+        clave = clave_vista(vista, ancho, alto, filas + 1, columnas + 1)
+        guardado = cargar_raster(clave)
+        if guardado is not None:
+            encontrados = reutilizar_raster(driver, guardado, x_min, y_min, ancho_celda, alto_celda, tiempo_espera)
+            contar('siea_cache', tipo='raster', resultado='acierto' if encontrados is not None else 'fallo')
+            if encontrados is not None:
+                tooltips_encontrados = encontrados
+                raster = guardado
+                reutilizado = True
+                puntos = []
+    
+    # Con nombres esperados, visitar los puntos en orden de cobertura
+    plan = None
+    if esperados and not reutilizado:
+        from cobertura import PlanCobertura
+        
+        plan = PlanCobertura({(fila, columna): (x, y) for x, y, fila, columna in puntos},
+                             esperados, posiciones_esperadas)
+        
+        def recorrido_cobertura():
+            while True:
+                celda = plan.siguiente()
+                if celda is None:
+                    return
+                fila, columna = celda
+                yield (int(x_min + columna * ancho_celda), int(y_min + fila * alto_celda), fila, columna)
+        
+        puntos = recorrido_cobertura()
+    
+    # Diario de puntos visitados: si un escaneo anterior con los mismos
+    # parámetros se interrumpió, se continúa donde se quedó
+    diario = None
+    if reanudar and not reutilizado:
+        from diario_escaneo import DiarioEscaneo
+        
+        ancho, alto = driver.execute_script("return [window.innerWidth, window.innerHeight];")
+        diario = DiarioEscaneo('tooltips', {
+            'url': driver.current_url, 'vista': vista, 'ventana': [ancho, alto],
+            'zona': [x_min, y_min, x_max, y_max], 'filas': filas, 'columnas': columnas,
+        })
+        for (fila, columna), texto in diario.puntos.items():
+            raster.marcar(fila, columna, texto.splitlines()[0].strip() if texto else None)
+            if texto:
+                tooltips_encontrados.add(texto)
+            if plan is not None:
+                plan.marcar_visitada((fila, columna))
+                if texto:
+                    plan.registrar(texto)
+        if plan is None:
+            puntos = [punto for punto in puntos if not diario.visitado(punto[2:])]
+    
     # Variable para llevar un seguimiento del tooltip anterior
     ultimo_tooltip = None
     
-    print("Iniciando captura de tooltips...")
+    # Límite de espera que se adapta a la latencia del tooltip
+    adaptativa = EsperaAdaptativa(inicial=tiempo_espera) if espera_adaptativa else None
     
-    # Lista de selectores comunes para tooltips
-    tooltip_selectors = [
-        ".highcharts-tooltip",  # Selector del código original
-        "[role='tooltip']",     # Común en muchos mapas
-        ".tooltip",             # Clase común
-        ".mapTooltip",          # Otra clase común
-        ".map-tooltip"          # Variante con guión
-    ]
+    if not reutilizado:
+        print("Iniciando captura de tooltips...")
     
-    # Para cada punto de la cuadrícula
-    for x, y, fila, columna in puntos:
-        try:
-            # Marcar este punto como visitado
-            puntos_visitados.add((fila, columna))
-            
-            # Simular hover en la posición actual
-            simular_hover(driver, x, y)
-            
-            # Esperar a que aparezca el tooltip
-            time.sleep(tiempo_espera)
-            
-            # Intentar obtener el tooltip con los diferentes selectores
-            tooltip_text = None
-            
-            for selector in tooltip_selectors:
-                try:
-                    tooltip = WebDriverWait(driver, 0.5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    tooltip_text = tooltip.text.strip()
-                    if tooltip_text:  # Si encontramos texto, salimos del bucle
-                        break
-                except Exception:
-                    continue
-            
-            # Verificar si se encontró un tooltip válido
-            if tooltip_text and tooltip_text != ultimo_tooltip:
-                # Actualizar el tooltip más reciente
-                ultimo_tooltip = tooltip_text
-                
-                # Limpieza básica del texto
-                cleaned_text = tooltip_text.strip()
+    # Para cada punto de la cuadrícula (el avance se registra de forma muestreada)
+    total_puntos = (filas + 1) * (columnas + 1)
+    try:
+        for visitados, (x, y, fila, columna) in enumerate(puntos, len(diario or ()) + 1):
+            try:
+                if adaptativa is not None:
+                    # Hover y espera hasta que el tooltip muestre la región del punto
+                    resultado = adaptativa.sondear(lambda: simular_hover(driver, x, y),
+                                                   lambda: leer_texto_tooltip(driver, TOOLTIP_SELECTORS))
+                    tooltip_text = leer_tooltip(driver) if resultado in (TOOLTIP, FIJA) else None
+                else:
+                    # Simular hover en la posición actual
+                    simular_hover(driver, x, y)
+                    
+                    # Esperar a que aparezca el tooltip
+                    dormir(tiempo_espera)
+                    
+                    # Intentar obtener el tooltip con los diferentes selectores
+                    tooltip_text = leer_tooltip(driver)
                 
-                # Guardar el tooltip y su posición
-                mapa_resultados[(fila, columna)] = cleaned_text
-                
-                # Agregar al conjunto si es nuevo
-                tooltips_encontrados.add(cleaned_text)
-                
-                print(f"Encontrado en ({fila},{columna}): {cleaned_text}")
-            else:
-                # No es un tooltip válido o es repetido, marcar como None
-                mapa_resultados[(fila, columna)] = None
+                if tooltip_text:
+                    # Limpieza básica del texto
+                    cleaned_text = tooltip_text.strip()
+                    
+                    # Guardar la región de este punto (la primera línea es el nombre)
+                    raster.marcar(fila, columna, cleaned_text.splitlines()[0].strip())
+                    
+                    # Solo informar si cambió respecto al tooltip anterior
+                    if cleaned_text != ultimo_tooltip:
+                        ultimo_tooltip = cleaned_text
                         
-        except Exception as e:
-            print(f"Error al procesar punto ({fila},{columna}): {e}")
-            # Error al procesar el punto, marcar como None
-            mapa_resultados[(fila, columna)] = None
-            # Resetear el último tooltip para evitar arrastrar valores
-            ultimo_tooltip = None
+                        # Agregar al conjunto si es nuevo
+                        tooltips_encontrados.add(cleaned_text)
+                        
+                        if plan is not None:
+                            plan.registrar(cleaned_text)
+                        
+                        evento('encontrado', metodo='tooltips', celda=[fila, columna], texto=cleaned_text)
+                else:
+                    # No hay tooltip en este punto
+                    raster.marcar(fila, columna, None)
+                    
+                # Anotar el punto en el diario (los puntos con error se repiten al reanudar)
+                if diario is not None:
+                    diario.anotar((fila, columna), tooltip_text.strip() if tooltip_text else None)
+                            
+            except Exception as e:
+                if es_fatal(e):
+                    raise
+                print(f"Error al procesar punto ({fila},{columna}): {e}")
+                contar('siea_errores', etapa='escanear', error=type(e).__name__)
+                # Error al procesar el punto, marcar sin región
+                raster.marcar(fila, columna, None)
+                # Resetear el último tooltip para evitar arrastrar valores
+                ultimo_tooltip = None
+        
+            progreso('escanear.tooltips', visitados, total_puntos, encontrados=len(tooltips_encontrados))
+    finally:
+        # Llevar al disco los puntos anotados aunque el navegador se haya caído
+        if diario is not None:
+            diario.cerrar()
+    
+    # Guardar el raster si el escaneo cubrió la vista completa
+    if clave and not reutilizado and (raster.completo or (plan is not None and plan.completo)):
+        guardar_raster(clave, raster)
+        print(f"Raster de etiquetas guardado para la vista '{vista}'")
     
     # Generar mapa visual de resultados
     if mostrar_visualizacion:
-        generar_mapa_resultados(x_min, y_min, x_max, y_max, filas, columnas, mapa_resultados, puntos_visitados)
+        generar_mapa_resultados(pantalla['x_min'], pantalla['y_min'], pantalla['x_max'], pantalla['y_max'],
+                                filas, columnas, raster)
     
     # Imprimir resumen final
     print("\n===== RESUMEN FINAL =====")
     print(f"Total de tooltips encontrados: {len(tooltips_encontrados)}")
     
+    if adaptativa is not None and not reutilizado:
+        resumen = adaptativa.resumen()
+        evento('espera_adaptativa', metodo='tooltips', **resumen)
+        print(f"Espera adaptativa: límite final {resumen['limite']} s, "
+              f"{resumen['fallos']} fallos por latencia ({resumen['recuperados']} recuperados)")
+    
+    if plan is not None:
+        from cobertura import imprimir_informe
+        
+        imprimir_informe(plan.informe())
+    
     print("\nLista de tooltips encontrados:")
     for i, tooltip in enumerate(sorted(tooltips_encontrados), 1):
         print(f"{i}. {tooltip}")
@@ -284,4 +483,8 @@ def scrape_tooltips_mapa(driver, x_min, y_min, x_max, y_max, filas=20, columnas=
     
     print("\nLos resultados han sido guardados en 'tooltips_encontrados.csv'")
     
-    return tooltips_encontrados, mapa_resultados
\ No newline at end of file
+    # Escaneo completo y resultados guardados: ya no hay nada que reanudar
+    if diario is not None:
+        diario.terminar()
+    
+    return tooltips_encontrados, raster.como_diccionario()
\ No newline at end of file
@@ -0,0 +1,381 @@
+# trazas.py
+"""
+Trazas por etapa y métricas del recorrido.
+
+Cada etapa del proceso se mide con un span:
+
+    with span('extraer', tipo='grafico') as atributos:
+        ...
+        atributos['meses'] = 12
+
+Etapas: navegar, bajar (entrar a una región o regresar), escanear, extraer,
+normalizar y guardar. Cada span termina como una línea JSON en
+`.siea/trazas/<ejecución>.jsonl` (con su duración, su span padre y sus
+atributos) y en un histograma de duraciones por etapa. Los contadores
+(regiones encontradas, reintentos, aciertos de caché, errores) y los
+histogramas se exportan en formato de texto de Prometheus a
+`.siea/metricas/siea_<pid>.prom` (o a la carpeta de SIEA_METRICAS, para el
+textfile collector de node_exporter): un archivo por proceso, con la
+etiqueta `proceso`, para que los trabajadores de la cola no se pisen. El
+archivo se reescribe cada `intervalo_exportacion` segundos mientras la
+ejecución avanza y se borra al cerrar, para que el collector no siga
+exportando series de procesos terminados; la primera exportación borra
+también los archivos de procesos que ya no existen (p. ej. si se mataron).
+
+En los bucles por celda se usa `progreso`, que emite un evento y una línea
+en pantalla como mucho cada `intervalo_progreso` segundos en lugar de
+imprimir cada celda.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from estado import DIRECTORIO_ESTADO, guardar_json
+
+ETAPAS = ('navegar', 'bajar', 'escanear', 'extraer', 'normalizar', 'guardar')
+
+# Límites (segundos) de los buckets del histograma de duraciones
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float('inf'))
+
+
+def _etiquetas(etiquetas):
+    """Clave ordenada e inmutable de un conjunto de etiquetas."""
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _formato_etiquetas(etiquetas, extra=()):
+    """Etiquetas en formato Prometheus: {a="1",b="2"}."""
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for k, v in pares)
+    return '{' + texto + '}'
+
+
+class Trazador:
+    """
+    Registra spans, eventos y métricas de una ejecución.
+    """
+
+    def __init__(self, directorio=None, ruta_metricas=None, id_ejecucion=None,
+                 intervalo_progreso=2.0, tamano_buffer=200, intervalo_exportacion=15.0):
+        """
+        Args:
+            directorio (str, opcional): Carpeta de las trazas JSONL (por defecto `.siea/trazas`)
+            ruta_metricas (str, opcional): Archivo .prom (por defecto SIEA_METRICAS o
+                                           `.siea/metricas`, archivo siea_<pid>.prom)
+            id_ejecucion (str, opcional): Identificador de la ejecución
+            intervalo_progreso (float): Segundos mínimos entre eventos de progreso
+            tamano_buffer (int): Eventos en memoria antes de escribir al archivo
+            intervalo_exportacion (float): Segundos mínimos entre exportaciones de
+                                           las métricas durante la ejecución
+        """
+        self.id_ejecucion = id_ejecucion or f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        directorio = directorio or os.path.join(DIRECTORIO_ESTADO, 'trazas')
+        carpeta_metricas = os.environ.get('SIEA_METRICAS', os.path.join(DIRECTORIO_ESTADO, 'metricas'))
+        self.ruta_trazas = os.path.join(directorio, f"{self.id_ejecucion}.jsonl")
+        self.ruta_metricas = ruta_metricas or os.path.join(carpeta_metricas, f"siea_{os.getpid()}.prom")
+        self.intervalo_progreso = intervalo_progreso
+        self.tamano_buffer = tamano_buffer
+        self.intervalo_exportacion = intervalo_exportacion
+        self._etiquetas_proceso = (('proceso', str(os.getpid())),)
+
+        self._buffer = []
+        self._bloqueo = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._ultimo_progreso = {}
+        self._ultima_exportacion = time.monotonic()
+        self._limpiado = False
+        self._cerrado = False
+
+        self.contadores = {}   # (nombre, etiquetas) → valor
+        self.histogramas = {}  # (nombre, etiquetas) → [conteos por bucket, suma, total]
+
+    # --- Spans ---------------------------------------------------------
+
+    @contextmanager
+    def span(self, etapa, **atributos):
+        """
+        Mide un bloque como span de una etapa.
+
+        Args:
+            etapa (str): Una de ETAPAS (u otro nombre)
+            **atributos: Atributos del span; el bloque puede añadir más
+
+        Yields:
+            dict: Atributos del span (modificables dentro del bloque)
+        """
+        pila = getattr(self._local, 'pila', None)
+        if pila is None:
+            pila = self._local.pila = []
+        id_span = next(self._ids)
+        padre = pila[-1] if pila else None
+        pila.append(id_span)
+
+        inicio = time.time()
+        reloj = time.perf_counter()
+        estado = 'ok'
+        try:
+            yield atributos
+        except BaseException as e:
+            estado = type(e).__name__
+            raise
+        finally:
+            duracion = time.perf_counter() - reloj
+            pila.pop()
+            self.observar('siea_etapa_duracion_segundos', duracion, etapa=etapa)
+            if estado != 'ok':
+                self.contar('siea_errores', etapa=etapa, error=estado)
+            self.evento('span', id=id_span, padre=padre, etapa=etapa, inicio=inicio,
+                        duracion=round(duracion, 6), estado=estado, atributos=atributos)
+
+    def span_actual(self):
+        """
+        Returns:
+            int: Id del span abierto en este hilo, o None
+        """
+        pila = getattr(self._local, 'pila', None)
+        return pila[-1] if pila else None
+
+    @contextmanager
+    def dentro_de(self, id_span):
+        """
+        Hace que los spans abiertos en este hilo cuelguen de un span de otro
+        hilo (la pila de spans es propia de cada hilo).
+
+        Args:
+            id_span (int): Span padre (ver span_actual); None no cambia nada
+        """
+        if id_span is None:
+            yield
+            return
+        anterior = getattr(self._local, 'pila', None)
+        self._local.pila = [id_span]
+        try:
+            yield
+        finally:
+            self._local.pila = anterior
+
+    # --- Métricas ------------------------------------------------------
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        """Suma `valor` a un contador con etiquetas."""
+        clave = (nombre, _etiquetas(etiquetas))
+        with self._bloqueo:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        """Añade una observación a un histograma con etiquetas."""
+        clave = (nombre, _etiquetas(etiquetas))
+        with self._bloqueo:
+            histograma = self.histogramas.setdefault(clave, [[0] * len(BUCKETS), 0.0, 0])
+            for i, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    histograma[0][i] += 1
+                    break
+            histograma[1] += valor
+            histograma[2] += 1
+
+    # --- Eventos -------------------------------------------------------
+
+    def evento(self, nombre_evento, **datos):
+        """Añade un evento a la traza JSONL (se escribe por lotes)."""
+        linea = json.dumps({'evento': nombre_evento, 'ejecucion': self.id_ejecucion, 't': time.time(), **datos},
+                           ensure_ascii=False, default=str)
+        ahora = time.monotonic()
+        with self._bloqueo:
+            self._buffer.append(linea)
+            lleno = len(self._buffer) >= self.tamano_buffer
+            exportar = not self._cerrado and ahora - self._ultima_exportacion >= self.intervalo_exportacion
+            if exportar:
+                self._ultima_exportacion = ahora
+        if lleno:
+            self.vaciar()
+        if exportar:
+            # Métricas al día para el textfile collector durante recorridos largos
+            self.exportar_prometheus()
+
+    def progreso(self, nombre, actual, total=None, mostrar=True, **atributos):
+        """
+        Evento de progreso muestreado: se registra (y se muestra) como mucho
+        una vez cada `intervalo_progreso` segundos, y siempre al terminar.
+
+        Args:
+            nombre (str): Bucle que avanza (p. ej. 'escanear.cuadricula')
+            actual (int): Elementos procesados
+            total (int, opcional): Elementos totales
+            mostrar (bool): Imprimir también una línea de progreso
+            **atributos: Datos adicionales (p. ej. encontrados)
+        """
+        ahora = time.monotonic()
+        final = total is not None and actual >= total
+        if not final and ahora - self._ultimo_progreso.get(nombre, 0) < self.intervalo_progreso:
+            return
+        self._ultimo_progreso[nombre] = ahora
+
+        self.evento('progreso', nombre=nombre, actual=actual, total=total, **atributos)
+        if mostrar:
+            avance = f"{actual}/{total}" if total else str(actual)
+            extras = ''.join(f", {k}: {v}" for k, v in atributos.items())
+            print(f"[{nombre}] {avance}{extras}")
+
+    # --- Escritura -----------------------------------------------------
+
+    def vaciar(self):
+        """Escribe los eventos pendientes al archivo JSONL."""
+        with self._bloqueo:
+            lineas, self._buffer = self._buffer, []
+        if not lineas:
+            return
+        os.makedirs(os.path.dirname(self.ruta_trazas), exist_ok=True)
+        with open(self.ruta_trazas, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lineas) + '\n')
+
+    def texto_prometheus(self):
+        """
+        Returns:
+            str: Contadores e histogramas en formato de texto de Prometheus
+        """
+        with self._bloqueo:
+            contadores = dict(self.contadores)
+            histogramas = {k: (list(v[0]), v[1], v[2]) for k, v in self.histogramas.items()}
+
+        proceso = self._etiquetas_proceso
+        lineas = []
+        for nombre in sorted({n for n, _ in contadores}):
+            lineas.append(f"# TYPE {nombre}_total counter")
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}_total{_formato_etiquetas(etiquetas, proceso)} {valor}")
+
+        for nombre in sorted({n for n, _ in histogramas}):
+            lineas.append(f"# TYPE {nombre} histogram")
+            for (n, etiquetas), (conteos, suma, total) in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                acumulado = 0
+                for limite, conteo in zip(BUCKETS, conteos):
+                    acumulado += conteo
+                    le = '+Inf' if limite == float('inf') else f"{limite:g}"
+                    lineas.append(f"{nombre}_bucket{_formato_etiquetas(etiquetas, proceso + (('le', le),))} {acumulado}")
+                lineas.append(f"{nombre}_sum{_formato_etiquetas(etiquetas, proceso)} {suma:.6f}")
+                lineas.append(f"{nombre}_count{_formato_etiquetas(etiquetas, proceso)} {total}")
+
+        return '\n'.join(lineas) + '\n'
+
+    def exportar_prometheus(self):
+        """Escribe las métricas al archivo .prom de forma atómica."""
+        os.makedirs(os.path.dirname(self.ruta_metricas), exist_ok=True)
+        if not self._limpiado:
+            self._limpiado = True
+            _borrar_metricas_huerfanas(os.path.dirname(self.ruta_metricas))
+        temporal = f"{self.ruta_metricas}.{os.getpid()}_{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, self.ruta_metricas)
+
+    def resumen_etapas(self):
+        """
+        Returns:
+            dict: etapa → {'spans', 'segundos'} a partir de los histogramas
+        """
+        with self._bloqueo:
+            return {
+                dict(etiquetas).get('etapa'): {'spans': total, 'segundos': round(suma, 3)}
+                for (nombre, etiquetas), (_, suma, total) in self.histogramas.items()
+                if nombre == 'siea_etapa_duracion_segundos'
+            }
+
+    def cerrar(self):
+        """
+        Escribe la traza pendiente, borra el archivo de métricas del proceso
+        (lo que mide la ejecución queda en el resumen por etapa) y guarda el
+        resumen por etapa.
+        """
+        self._cerrado = True
+        self.vaciar()
+        try:
+            os.remove(self.ruta_metricas)
+        except FileNotFoundError:
+            pass
+        guardar_json(os.path.splitext(self.ruta_trazas)[0] + '_resumen.json', self.resumen_etapas())
+
+
+def _borrar_metricas_huerfanas(carpeta):
+    """Borra los siea_<pid>.prom de procesos que ya no existen."""
+    import glob
+    import psutil
+
+    for ruta in glob.glob(os.path.join(carpeta, 'siea_*.prom')):
+        pid = os.path.basename(ruta)[len('siea_'):-len('.prom')]
+        if pid.isdigit() and not psutil.pid_exists(int(pid)):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+_trazador = None
+
+
+def obtener_trazador():
+    """
+    Devuelve el trazador del proceso (se crea la primera vez).
+
+    Returns:
+        Trazador: Trazador de la ejecución
+    """
+    global _trazador
+    if _trazador is None:
+        _trazador = Trazador()
+    return _trazador
+
+
+def cerrar_trazador():
+    """
+    Cierra el trazador del proceso si llegó a crearse.
+
+    Returns:
+        Trazador: Trazador cerrado, o None si no se usó
+    """
+    global _trazador
+    trazador, _trazador = _trazador, None
+    if trazador is not None:
+        trazador.cerrar()
+    return trazador
+
+
+def span(etapa, **atributos):
+    """Span de una etapa en el trazador del proceso (ver Trazador.span)."""
+    return obtener_trazador().span(etapa, **atributos)
+
+
+def span_actual():
+    """Id del span abierto en este hilo en el trazador del proceso (ver Trazador.span_actual)."""
+    return obtener_trazador().span_actual()
+
+
+def dentro_de(id_span):
+    """Spans de este hilo como hijos de `id_span` (ver Trazador.dentro_de)."""
+    return obtener_trazador().dentro_de(id_span)
+
+
+def contar(nombre, valor=1, **etiquetas):
+    """Suma a un contador del trazador del proceso."""
+    obtener_trazador().contar(nombre, valor, **etiquetas)
+
+
+def progreso(nombre, actual, total=None, mostrar=True, **atributos):
+    """Evento de progreso muestreado en el trazador del proceso."""
+    obtener_trazador().progreso(nombre, actual, total, mostrar, **atributos)
+
+
+def evento(nombre_evento, **datos):
+    """Evento libre en la traza del proceso."""
+    obtener_trazador().evento(nombre_evento, **datos)
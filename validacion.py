@@ -0,0 +1,306 @@
+# validacion.py
+"""
+Validación de consistencia de los datos extraídos y cola de re-extracción.
+
+Los extractores tienen respaldos que pueden devolver valores equivocados
+sin fallar (el script de distritos toma "los últimos 4 valores", el
+análisis del HTML toma `all_numbers[-8:-4]`, y extrae_mes descarta las
+barras cuyo tooltip no se pudo leer). Aquí se comprueba que los datos
+cuadran entre sí, con operaciones vectorizadas de pandas sobre todas las
+regiones a la vez:
+
+- valor_faltante:     meses del calendario sin porcentaje o sin tm
+- suma_porcentajes:   los porcentajes mensuales de una región suman ~100
+- suma_tm:            las tm mensuales suman la producción del resumen
+- produccion:         superficie × rendimiento ≈ producción
+- suma_participacion: la participación de las regiones hijas suma ~100
+- suma_hijos:         la producción de las hijas suma la del padre
+
+Las dos últimas reglas son de grupo: si un grupo no cuadra, se marcan las
+hijas que además fallan otra regla o, si ninguna falla, todas las hijas.
+Los registros marcados se reabren en la cola de tareas (cola_tareas.py)
+con `forzar` activado, para volver a extraer solo esas páginas sin
+repetir el recorrido completo.
+"""
+
+import json
+
+from normalizacion import normalizar_nombre
+
+# Tolerancias de las comprobaciones (el portal redondea los valores que muestra)
+TOLERANCIAS = {
+    'porcentaje': 1.0,              # Puntos porcentuales sobre 100
+    'tm_relativa': 0.01,            # Fracción de la producción
+    'tm_absoluta': 1.0,             # tm
+    'produccion_relativa': 0.03,    # Fracción de la producción
+    'redondeo_rendimiento': 0.005,  # t/ha (rendimiento mostrado con dos decimales)
+    'participacion': 1.0,           # Puntos porcentuales sobre 100
+}
+
+REGLAS = ('valor_faltante', 'suma_porcentajes', 'suma_tm', 'produccion', 'suma_participacion', 'suma_hijos')
+REGLAS_GRUPO = ('suma_participacion', 'suma_hijos')
+
+COLUMNAS_FALLOS = ['cultivo', 'region', 'regla', 'valor', 'esperado', 'diferencia', 'grupo']
+
+# Columna con el nombre de la región, de la más específica a la más general
+_COLUMNAS_REGION = ('region', 'nombre', 'provincia', 'departamento')
+
+
+def _tabla(datos):
+    """
+    Convierte filas (DataFrame o lista de diccionarios) en un DataFrame con
+    las columnas `region`, `_cultivo` y `_region` (nombres normalizados).
+    """
+    import pandas as pd
+
+    df = datos.copy() if isinstance(datos, pd.DataFrame) else pd.DataFrame(list(datos or []))
+    if df.empty:
+        return df
+    columna = next((c for c in _COLUMNAS_REGION if c in df.columns), None)
+    if columna is None or 'cultivo' not in df.columns:
+        raise ValueError(f"Faltan las columnas cultivo y región en {list(df.columns)}")
+
+    df['region'] = df[columna].astype(str).str.strip()
+    df['cultivo'] = df['cultivo'].astype(str).str.strip()
+    # Normalizar una vez por nombre distinto, no por fila
+    df['_cultivo'] = df['cultivo'].map({c: normalizar_nombre(c) for c in df['cultivo'].unique()})
+    df['_region'] = df['region'].map({r: normalizar_nombre(r) for r in df['region'].unique()})
+    return df
+
+
+def _fallos(df, regla, valor, esperado, mascara, grupo=None):
+    """Filas de fallos de una regla para las filas de `df` marcadas en `mascara`."""
+    import pandas as pd
+
+    mascara = mascara.fillna(False).astype(bool)
+    return pd.DataFrame({
+        'cultivo': df.loc[mascara, 'cultivo'],
+        'region': df.loc[mascara, 'region'],
+        'regla': regla,
+        'valor': valor[mascara],
+        'esperado': esperado[mascara] if hasattr(esperado, 'index') else esperado,
+        'diferencia': (valor - esperado)[mascara],
+        'grupo': grupo[mascara] if grupo is not None else None,
+        '_cultivo': df.loc[mascara, '_cultivo'],
+        '_region': df.loc[mascara, '_region'],
+    })
+
+
+def _validar_calendario(calendario, resumen, tolerancias):
+    """Reglas valor_faltante, suma_porcentajes y suma_tm."""
+    import pandas as pd
+
+    cal = calendario.assign(
+        porcentaje=pd.to_numeric(calendario['porcentaje'], errors='coerce'),
+        tm=pd.to_numeric(calendario['tm'], errors='coerce'),
+    )
+    cal['faltante'] = cal[['porcentaje', 'tm']].isna().any(axis=1)
+    regiones = cal.groupby(['_cultivo', '_region'], sort=False).agg(
+        cultivo=('cultivo', 'first'), region=('region', 'first'),
+        porcentaje=('porcentaje', 'sum'), tm=('tm', 'sum'), faltantes=('faltante', 'sum'),
+    ).reset_index()
+
+    fallos = [
+        _fallos(regiones, 'valor_faltante', regiones['faltantes'].astype(float), 0.0, regiones['faltantes'] > 0),
+        _fallos(regiones, 'suma_porcentajes', regiones['porcentaje'], 100.0,
+                (regiones['porcentaje'] - 100.0).abs() > tolerancias['porcentaje']),
+    ]
+
+    if not resumen.empty:
+        produccion = resumen[['_cultivo', '_region', 'produccion_tm']]
+        con_resumen = regiones.merge(produccion, on=['_cultivo', '_region'], how='inner')
+        margen = (tolerancias['tm_relativa'] * con_resumen['produccion_tm']).clip(lower=tolerancias['tm_absoluta'])
+        fallos.append(_fallos(con_resumen, 'suma_tm', con_resumen['tm'], con_resumen['produccion_tm'],
+                              (con_resumen['tm'] - con_resumen['produccion_tm']).abs() > margen))
+    return fallos
+
+
+def _validar_resumen(resumen, tolerancias, completo):
+    """Reglas produccion, suma_participacion y suma_hijos."""
+    s, r, p = resumen['superficie_ha'], resumen['rendimiento_tha'], resumen['produccion_tm']
+    estimada = s * r
+    margen = tolerancias['produccion_relativa'] * p + s * tolerancias['redondeo_rendimiento']
+    fallos = [_fallos(resumen, 'produccion', estimada, p, (estimada - p).abs() > margen)]
+
+    # Grupos de hermanas: mismo cultivo y mismo padre ('' = nivel nacional)
+    hijas = resumen[resumen['_padre'] != resumen['_region']]
+    grupos = hijas.groupby(['_cultivo', '_padre'], sort=False).agg(
+        participacion=('participacion_porcentaje', 'sum'), produccion=('produccion_tm', 'sum'),
+    )
+    padres = resumen.set_index(['_cultivo', '_region'])['produccion_tm']
+    padres = padres[~padres.index.duplicated(keep='last')]
+    grupos['produccion_padre'] = padres.reindex(grupos.index).to_numpy()
+
+    tolerancia = tolerancias['participacion']
+    exceso = grupos['participacion'] > 100.0 + tolerancia
+    defecto = (grupos['participacion'] < 100.0 - tolerancia) if completo else False
+    grupos['falla_participacion'] = exceso | defecto
+    grupos['falla_hijos'] = ((grupos['produccion'] - grupos['produccion_padre']).abs()
+                             > tolerancias['produccion_relativa'] * grupos['produccion_padre'])
+
+    # Repartir el resultado de cada grupo entre sus hijas
+    por_hija = hijas.join(grupos, on=['_cultivo', '_padre'])
+    fallos.append(_fallos(por_hija, 'suma_participacion', por_hija['participacion'], 100.0,
+                          por_hija['falla_participacion'], por_hija['padre']))
+    fallos.append(_fallos(por_hija, 'suma_hijos', por_hija['produccion'], por_hija['produccion_padre'],
+                          por_hija['falla_hijos'], por_hija['padre']))
+    return fallos
+
+
+def validar(calendario=None, resumen=None, completo=False, tolerancias=None):
+    """
+    Comprueba la consistencia de las filas de calendario y de resumen.
+
+    Args:
+        calendario: Filas de calendario (departamento o region, cultivo, mes, porcentaje, tm)
+        resumen: Filas de resumen (provincia, nombre o region, cultivo, superficie_ha,
+                 rendimiento_tha, produccion_tm, participacion_porcentaje y, opcionalmente,
+                 padre; sin padre, las regiones se consideran hijas del nivel nacional)
+        completo (bool): Las filas de resumen incluyen todas las hijas de cada
+                         padre, así que su participación debe sumar 100
+        tolerancias (dict, opcional): Valores que reemplazan los de TOLERANCIAS
+
+    Returns:
+        pandas.DataFrame: Un fallo por fila, con las columnas COLUMNAS_FALLOS
+    """
+    import pandas as pd
+
+    tolerancias = {**TOLERANCIAS, **(tolerancias or {})}
+    cal = _tabla(calendario)
+    res = _tabla(resumen)
+
+    if not res.empty:
+        for columna in ('superficie_ha', 'rendimiento_tha', 'produccion_tm', 'participacion_porcentaje'):
+            res[columna] = pd.to_numeric(res[columna], errors='coerce') if columna in res else float('nan')
+        res['padre'] = res['padre'].fillna('').astype(str).str.strip() if 'padre' in res else ''
+        res['_padre'] = res['padre'].map(normalizar_nombre)
+        # Si una región se extrajo varias veces, vale la última extracción
+        res = res.drop_duplicates(['_cultivo', '_region'], keep='last').reset_index(drop=True)
+
+    fallos = []
+    if not cal.empty:
+        fallos.extend(_validar_calendario(cal, res, tolerancias))
+    if not res.empty:
+        fallos.extend(_validar_resumen(res, tolerancias, completo))
+
+    fallos = [f for f in fallos if not f.empty]
+    if not fallos:
+        return pd.DataFrame(columns=COLUMNAS_FALLOS)
+    # Ordenar por nombre normalizado: los fallos del calendario (con el nombre
+    # usado al recorrer) quedan antes que los del resumen de la misma región
+    return (pd.concat(fallos, ignore_index=True)
+            .sort_values(['_cultivo', '_region'], kind='stable')[COLUMNAS_FALLOS].reset_index(drop=True))
+
+
+def registros_a_reextraer(fallos):
+    """
+    Elige los registros (cultivo, región) que hay que volver a extraer.
+
+    En las reglas de grupo solo se eligen las hijas que además fallan otra
+    regla; si ninguna falla, todas las hijas del grupo.
+
+    Args:
+        fallos (pandas.DataFrame): Resultado de validar
+
+    Returns:
+        list: Diccionarios {'cultivo', 'region', 'reglas'}
+    """
+    if fallos.empty:
+        return []
+
+    claves = list(zip(fallos['cultivo'].map(normalizar_nombre), fallos['region'].map(normalizar_nombre)))
+    fallos = fallos.assign(_clave=claves)
+    de_grupo = fallos['regla'].isin(REGLAS_GRUPO)
+    individuales = set(fallos.loc[~de_grupo, '_clave'])
+
+    grupales = fallos[de_grupo].copy()
+    grupales['sospechosa'] = grupales['_clave'].isin(individuales)
+    hay_sospechosas = grupales.groupby(['cultivo', 'grupo', 'regla'])['sospechosa'].transform('any')
+    elegidos = fallos[~de_grupo | fallos.index.isin(grupales.index[grupales['sospechosa'] | ~hay_sospechosas])]
+
+    registros = []
+    for _, filas in elegidos.groupby('_clave', sort=False):
+        registros.append({
+            'cultivo': filas['cultivo'].iloc[0],
+            'region': filas['region'].iloc[0],
+            'reglas': sorted(set(filas['regla'])),
+        })
+    return registros
+
+
+def encolar_reextraccion(registros, cola=None, max_intentos=5):
+    """
+    Reabre en la cola de tareas los registros que no pasaron la validación.
+
+    La clave de cada tarea es la misma que usa `siea cola encolar` para el
+    par cultivo/departamento, así que una tarea ya hecha vuelve a
+    pendiente en lugar de duplicarse. La carga lleva `forzar` para que el
+    trabajador extraiga la página aunque su huella no haya cambiado.
+
+    Args:
+        registros (list): Resultado de registros_a_reextraer
+        cola (ColaTareas, opcional): Cola; por defecto `.siea/cola.sqlite`
+        max_intentos (int): Intentos antes de pasar a tareas muertas
+
+    Returns:
+        int: Tareas añadidas o reabiertas
+    """
+    from cola_tareas import ColaTareas
+
+    cola = cola or ColaTareas()
+    cargas = [{'cultivo': r['cultivo'], 'departamento': r['region'], 'forzar': True,
+               'motivo': ','.join(r['reglas'])} for r in registros]
+
+    def clave(carga):
+        return json.dumps({'cultivo': carga['cultivo'], 'departamento': carga['departamento']},
+                          sort_keys=True, ensure_ascii=False)
+
+    return cola.reabrir_varias(cargas, clave=clave, max_intentos=max_intentos)
+
+
+def cargar_csv(rutas):
+    """
+    Lee CSV de calendario y de resumen y los separa por sus columnas.
+
+    Args:
+        rutas (list): Rutas de los CSV (calendario_*.csv, resumen_*.csv, ...)
+
+    Returns:
+        tuple: (DataFrame de calendario, DataFrame de resumen)
+    """
+    import pandas as pd
+
+    calendarios, resumenes = [], []
+    for ruta in rutas:
+        df = pd.read_csv(ruta)
+        if 'mes' in df.columns:
+            calendarios.append(df)
+        elif 'produccion_tm' in df.columns:
+            resumenes.append(df)
+        else:
+            print(f"Aviso: {ruta} no es un CSV de calendario ni de resumen")
+    return (pd.concat(calendarios, ignore_index=True) if calendarios else pd.DataFrame(),
+            pd.concat(resumenes, ignore_index=True) if resumenes else pd.DataFrame())
+
+
+def imprimir_informe(fallos, registros=None, maximo=20):
+    """
+    Muestra los fallos por regla y los primeros registros a re-extraer.
+
+    Args:
+        fallos (pandas.DataFrame): Resultado de validar
+        registros (list, opcional): Resultado de registros_a_reextraer
+        maximo (int): Fallos que se muestran como mucho
+    """
+    if fallos.empty:
+        print("Validación: todos los registros son consistentes")
+        return
+
+    conteo = fallos['regla'].value_counts()
+    print("Validación: " + ', '.join(f"{regla} {conteo[regla]}" for regla in REGLAS if regla in conteo))
+    for fila in fallos.head(maximo).itertuples(index=False):
+        print(f"- [{fila.regla}] {fila.cultivo} / {fila.region}: {fila.valor:,.2f} (esperado {fila.esperado:,.2f})")
+    if len(fallos) > maximo:
+        print(f"  ... y {len(fallos) - maximo} fallos más")
+    if registros is not None:
+        print(f"{len(registros)} registros para volver a extraer")
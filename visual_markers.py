@@ -1,4 +1,4 @@
-def visualizar_mapa_grid(driver, x_min=150, y_min=200, x_max=500, y_max=650, grid_size=10):
+def visualizar_mapa_grid(driver, x_min=None, y_min=None, x_max=None, y_max=None, grid_size=10):
     """
     Visualiza un área rectangular azul y una cuadrícula de puntos rojos en el mapa.
     
@@ -8,8 +8,15 @@ def visualizar_mapa_grid(driver, x_min=150, y_min=200, x_max=500, y_max=650, gri
         y_min: Coordenada Y mínima del área
         x_max: Coordenada X máxima del área
         y_max: Coordenada Y máxima del área
+               (si falta alguna, se detecta la zona del mapa, ver zonas.py)
         grid_size: Número de divisiones en cada eje
     """
+    if None in (x_min, y_min, x_max, y_max):
+        from zonas import zona_del_mapa
+        
+        zona = zona_del_mapa(driver)
+        x_min, y_min, x_max, y_max = zona['x_min'], zona['y_min'], zona['x_max'], zona['y_max']
+    
     print(f"Visualizando área: X({x_min}-{x_max}), Y({y_min}-{y_max}) con cuadrícula {grid_size}x{grid_size}")
     
     # Calcular dimensiones de cada celda
@@ -62,4 +69,4 @@ def visualizar_mapa_grid(driver, x_min=150, y_min=200, x_max=500, y_max=650, gri
 # Ejemplo de uso
 if __name__ == "__main__":
     print("Este script debe ser importado y usado con un driver válido de Selenium.")
-    print("Ejemplo: visualizar_mapa_grid(driver, 150, 200, 500, 650, 10)")
\ No newline at end of file
+    print("Ejemplo: visualizar_mapa_grid(driver, grid_size=10)")
\ No newline at end of file
@@ -0,0 +1,292 @@
+# zonas.py
+"""
+Detección de la zona del mapa a escanear.
+
+Las cajas fijas en píxeles (ZONE_A, los valores por defecto de
+visualizar_mapa_grid) solo valen para un tamaño de ventana y una escala de
+pantalla concretos. Aquí la zona se calcula en la página:
+
+1. la unión de los rectángulos de las regiones de la serie de mapa,
+2. recortada al área de dibujo del gráfico (plotLeft/plotTop/plotWidth/plotHeight),
+3. recortada a la ventana visible.
+
+Si no hay regiones, se usa el área de dibujo; si no hay gráfico de mapa,
+la unión de los `path.highcharts-point`. Las coordenadas son píxeles CSS
+relativos a la ventana, los mismos que usan `elementFromPoint` y los
+eventos de ratón simulados. Para dibujar sobre una captura de pantalla
+(ImageGrab, en píxeles físicos) se convierten con `a_pantalla`, que aplica
+devicePixelRatio y la posición de la ventana.
+
+Para filtrar elementos por zona, los rectángulos de todos los candidatos se
+leen con un solo script (`leer_rectangulos`) y se filtran con máscaras de
+NumPy contra una o varias zonas con nombre (`indices_en_zonas`).
+"""
+
+import math
+
+from trazas import evento
+
+# Rectángulos de la serie de mapa y área de dibujo del gráfico (píxeles CSS de la ventana)
+_JS_ZONA_MAPA = """
+    const desplazar = arguments[0];
+    let grafico = null, regiones = null;
+    function unir(r) {
+        if (!(r.width > 0 && r.height > 0)) return;
+        if (!regiones) {
+            regiones = {x0: r.left, y0: r.top, x1: r.right, y1: r.bottom};
+            return;
+        }
+        regiones.x0 = Math.min(regiones.x0, r.left);
+        regiones.y0 = Math.min(regiones.y0, r.top);
+        regiones.x1 = Math.max(regiones.x1, r.right);
+        regiones.y1 = Math.max(regiones.y1, r.bottom);
+    }
+    for (const chart of (window.Highcharts ? Highcharts.charts : [])) {
+        if (!chart || !chart.series || !chart.series.some(s => s.type === 'map')) continue;
+        if (desplazar) chart.container.scrollIntoView({block: 'center', inline: 'center'});
+        const c = chart.container.getBoundingClientRect();
+        grafico = {x0: c.left + chart.plotLeft, y0: c.top + chart.plotTop,
+                   x1: c.left + chart.plotLeft + chart.plotWidth, y1: c.top + chart.plotTop + chart.plotHeight};
+        for (const serie of chart.series) {
+            if (serie.type !== 'map' || serie.visible === false) continue;
+            for (const p of (serie.points || [])) {
+                if (p.graphic && p.graphic.element) unir(p.graphic.element.getBoundingClientRect());
+            }
+        }
+        break;
+    }
+    if (!grafico && !regiones) {
+        document.querySelectorAll('path.highcharts-point').forEach(e => unir(e.getBoundingClientRect()));
+    }
+    return {grafico: grafico, regiones: regiones,
+            ventana: {ancho: window.innerWidth, alto: window.innerHeight}};
+"""
+
+# Zonas con nombre (la zona 'A', si no se registra, es ZONE_A de zone_a_utils.py)
+ZONAS = {}
+
+# Escala y posición de la ventana en la pantalla
+_JS_VENTANA = """
+    return {dpr: window.devicePixelRatio || 1, x: window.screenX, y: window.screenY,
+            borde_x: window.outerWidth - window.innerWidth,
+            borde_y: window.outerHeight - window.innerHeight};
+"""
+
+
+def registrar_zona(nombre, zona):
+    """
+    Registra (o reemplaza) una zona con nombre.
+
+    Args:
+        nombre (str): Nombre de la zona
+        zona (dict): x_min, y_min, x_max, y_max
+
+    Returns:
+        dict: Copia registrada de la zona
+    """
+    ZONAS[nombre] = {k: zona[k] for k in ('x_min', 'y_min', 'x_max', 'y_max')}
+    return ZONAS[nombre]
+
+
+def obtener_zona(nombre):
+    """
+    Returns:
+        dict: Zona registrada con ese nombre
+
+    Raises:
+        KeyError: Si no hay ninguna zona con ese nombre
+    """
+    if nombre in ZONAS:
+        return ZONAS[nombre]
+    if nombre == 'A':
+        import zone_a_utils
+
+        return zone_a_utils.ZONE_A
+    raise KeyError(f"Zona desconocida: {nombre}")
+
+
+def leer_rectangulos(driver, elementos=None, selector=None):
+    """
+    Lee los rectángulos de muchos elementos con un solo script.
+
+    Args:
+        driver: WebDriver de Selenium
+        elementos (list, opcional): WebElements cuyos rectángulos leer
+        selector (str, opcional): Selector CSS de los elementos (si no se dan elementos)
+
+    Returns:
+        numpy.ndarray: Matriz (n, 4) con x_min, y_min, x_max, y_max en píxeles CSS de la ventana
+    """
+    import numpy as np
+
+    if elementos is not None and len(elementos) == 0:
+        return np.empty((0, 4))
+    from runtime_pagina import llamar
+
+    filas = llamar(driver, 'rects', list(elementos) if elementos is not None else None, selector)
+    return np.asarray(filas or [], dtype=float).reshape(-1, 4)
+
+
+def indices_en_zonas(rectangulos, zonas, criterio='centro'):
+    """
+    Índices de los rectángulos que caen en cada zona, con una sola operación
+    vectorizada para todas las zonas.
+
+    Args:
+        rectangulos (numpy.ndarray): Matriz (n, 4) de leer_rectangulos
+        zonas: Nombre de zona, lista de nombres o dict nombre → zona
+        criterio (str): 'centro' (el centro está en la zona), 'dentro' (el
+                        rectángulo entero) o 'solapa' (alguna parte)
+
+    Returns:
+        dict: nombre de zona → numpy.ndarray con los índices de los rectángulos
+    """
+    import numpy as np
+
+    if isinstance(zonas, str):
+        zonas = [zonas]
+    if not isinstance(zonas, dict):
+        zonas = {nombre: obtener_zona(nombre) for nombre in zonas}
+    nombres = list(zonas)
+    limites = np.array([[zonas[n]['x_min'], zonas[n]['y_min'], zonas[n]['x_max'], zonas[n]['y_max']]
+                        for n in nombres], dtype=float).reshape(-1, 4)
+
+    r = np.asarray(rectangulos, dtype=float).reshape(-1, 4)
+    # Matrices (zonas, rectángulos) por difusión
+    z = limites[:, None, :]
+    if criterio == 'centro':
+        cx = (r[:, 0] + r[:, 2]) / 2
+        cy = (r[:, 1] + r[:, 3]) / 2
+        mascara = (z[..., 0] <= cx) & (cx <= z[..., 2]) & (z[..., 1] <= cy) & (cy <= z[..., 3])
+    elif criterio == 'dentro':
+        mascara = ((z[..., 0] <= r[:, 0]) & (r[:, 2] <= z[..., 2])
+                   & (z[..., 1] <= r[:, 1]) & (r[:, 3] <= z[..., 3]))
+    elif criterio == 'solapa':
+        mascara = ((r[:, 0] <= z[..., 2]) & (z[..., 0] <= r[:, 2])
+                   & (r[:, 1] <= z[..., 3]) & (z[..., 1] <= r[:, 3]))
+    else:
+        raise ValueError(f"Criterio desconocido: {criterio}")
+
+    # Los elementos sin tamaño (ocultos o fuera del documento) no están en ninguna zona
+    mascara &= (r[:, 2] > r[:, 0]) | (r[:, 3] > r[:, 1])
+    return {nombre: np.flatnonzero(fila) for nombre, fila in zip(nombres, mascara)}
+
+
+def filtrar_en_zona(driver, elementos, zona='A', criterio='centro'):
+    """
+    Filtra elementos por zona con una sola lectura de rectángulos.
+
+    Args:
+        driver: WebDriver de Selenium
+        elementos (list): WebElements candidatos
+        zona: Nombre de una zona registrada o dict x_min, y_min, x_max, y_max
+        criterio (str): Ver indices_en_zonas
+
+    Returns:
+        list: Elementos que están en la zona, en el orden original
+    """
+    zonas = {'zona': zona} if isinstance(zona, dict) else [zona]
+    indices = next(iter(indices_en_zonas(leer_rectangulos(driver, elementos), zonas, criterio).values()))
+    return [elementos[i] for i in indices]
+
+
+def _intersectar(a, b):
+    """Intersección de dos cajas {x0, y0, x1, y1} (None si no se solapan)."""
+    caja = {'x0': max(a['x0'], b['x0']), 'y0': max(a['y0'], b['y0']),
+            'x1': min(a['x1'], b['x1']), 'y1': min(a['y1'], b['y1'])}
+    return caja if caja['x1'] > caja['x0'] and caja['y1'] > caja['y0'] else None
+
+
+def detectar_zona(driver, margen=0, desplazar=True):
+    """
+    Calcula la zona que ocupa el mapa en la ventana.
+
+    Args:
+        driver: WebDriver con el mapa cargado
+        margen (int): Píxeles que se añaden (o quitan, si es negativo) en cada borde
+        desplazar (bool): Desplazar la página para que el mapa quede centrado en la ventana
+
+    Returns:
+        dict: x_min, y_min, x_max, y_max en píxeles CSS de la ventana, o None si
+              no se encontró el mapa
+    """
+    datos = driver.execute_script(_JS_ZONA_MAPA, desplazar) or {}
+    grafico, regiones = datos.get('grafico'), datos.get('regiones')
+
+    caja, origen = regiones or grafico, 'regiones' if regiones else 'grafico'
+    if regiones and grafico:
+        # Las regiones pueden salirse del área de dibujo si el mapa tiene zoom
+        caja = _intersectar(regiones, grafico) or grafico
+    if caja is None:
+        return None
+
+    ventana = datos['ventana']
+    caja = _intersectar(
+        {k: v + (margen if k in ('x1', 'y1') else -margen) for k, v in caja.items()},
+        {'x0': 0, 'y0': 0, 'x1': ventana['ancho'] - 1, 'y1': ventana['alto'] - 1}
+    )
+    if caja is None:
+        return None
+
+    zona = {'x_min': int(math.ceil(caja['x0'])), 'y_min': int(math.ceil(caja['y0'])),
+            'x_max': int(math.floor(caja['x1'])), 'y_max': int(math.floor(caja['y1']))}
+    evento('zona_detectada', origen=origen, zona=zona, ventana=ventana)
+    return zona
+
+
+def zona_del_mapa(driver, zona=None):
+    """
+    Zona a escanear: la indicada, la detectada en la página o, si no se
+    puede detectar, ZONE_A de zone_a_utils.py.
+
+    Args:
+        driver: WebDriver con el mapa cargado
+        zona (dict, opcional): Zona indicada por el usuario
+
+    Returns:
+        dict: x_min, y_min, x_max, y_max
+    """
+    from tiempos import reportar_error
+
+    if zona:
+        return zona
+    try:
+        detectada = detectar_zona(driver)
+    except Exception as e:
+        reportar_error(e, "detectar la zona del mapa")
+        detectada = None
+    if detectada:
+        print(f"Zona del mapa detectada: X({detectada['x_min']}-{detectada['x_max']}), "
+              f"Y({detectada['y_min']}-{detectada['y_max']})")
+        return detectada
+
+    import zone_a_utils
+
+    print("No se pudo detectar la zona del mapa; se usa ZONE_A")
+    return dict(zone_a_utils.ZONE_A)
+
+
+def a_pantalla(driver, zona):
+    """
+    Convierte una zona en píxeles CSS de la ventana a píxeles físicos de la
+    pantalla (para dibujar sobre una captura de ImageGrab). La posición del
+    área de contenido se estima a partir de los bordes de la ventana.
+
+    Args:
+        driver: WebDriver de Selenium
+        zona (dict): x_min, y_min, x_max, y_max en píxeles CSS
+
+    Returns:
+        dict: La misma zona en píxeles de la pantalla
+    """
+    ventana = driver.execute_script(_JS_VENTANA)
+    escala = ventana['dpr']
+    # Los bordes laterales son simétricos; el resto del borde vertical está arriba
+    origen_x = ventana['x'] + ventana['borde_x'] / 2
+    origen_y = ventana['y'] + ventana['borde_y'] - ventana['borde_x'] / 2
+    return {
+        'x_min': int(round((origen_x + zona['x_min']) * escala)),
+        'y_min': int(round((origen_y + zona['y_min']) * escala)),
+        'x_max': int(round((origen_x + zona['x_max']) * escala)),
+        'y_max': int(round((origen_y + zona['y_max']) * escala)),
+    }
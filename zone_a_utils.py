@@ -5,8 +5,6 @@ Este módulo define las coordenadas de la zona y proporciona funciones
 para determinar si un elemento web se encuentra dentro de ella.
 """
 
-from selenium.webdriver.remote.webelement import WebElement
-
 # Definir las coordenadas de la zona A
 # Estas coordenadas pueden ajustarse según sea necesario para diferentes páginas
 ZONE_A = {
@@ -47,6 +45,8 @@ def is_element_in_zone_a(element):
 def filter_elements_in_zone_a(elements):
     """
     Filtra una lista de elementos y devuelve solo aquellos que están en la zona A.
+    Los rectángulos se leen con un solo script y se filtran con NumPy
+    (ver zonas.filtrar_en_zona).
     
     Args:
         elements (list): Lista de elementos web de Selenium
@@ -54,7 +54,12 @@ def filter_elements_in_zone_a(elements):
     Returns:
         list: Lista filtrada de elementos dentro de la zona A
     """
-    return [elem for elem in elements if is_element_in_zone_a(elem)]
+    from zonas import filtrar_en_zona
+    
+    if not elements:
+        return []
+    # Todos los WebElement guardan su driver en .parent
+    return filtrar_en_zona(elements[0].parent, elements, ZONE_A)
 
 def set_zone_coordinates(x_min, y_min, x_max, y_max):
     """
@@ -67,6 +72,8 @@ def set_zone_coordinates(x_min, y_min, x_max, y_max):
         x_max (int): Coordenada X máxima
         y_max (int): Coordenada Y máxima
     """
+    from zonas import registrar_zona
+    
     global ZONE_A
     ZONE_A = {
         'x_min': x_min,
@@ -74,4 +81,6 @@ def set_zone_coordinates(x_min, y_min, x_max, y_max):
         'x_max': x_max,
         'y_max': y_max
     }
+    # Mantener la zona con nombre 'A' de zonas.py
+    registrar_zona('A', ZONE_A)
     return ZONE_A
\ No newline at end of file